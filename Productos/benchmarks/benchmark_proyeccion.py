@@ -0,0 +1,96 @@
+"""Benchmark de lectura: cadena de tres mapeadores vs proyección directa a JSON
+
+Compara el costo de CPU por fila de convertir un registro de productos_view al
+formato JSON externo usando:
+
+  1. MapeadorProductoConsulta.dto_a_entidad -> MapeadorProducto.entidad_a_dto
+     -> MapeadorProductoDTOJson.dto_a_externo (camino anterior)
+  2. ProyeccionProductoJson.fila_a_externo sobre la tupla de columnas (camino nuevo)
+
+No requiere base de datos: los registros se construyen en memoria.
+
+Uso:
+    python benchmarks/benchmark_proyeccion.py [--filas 20000] [--repeticiones 5]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from modulos.producto.infraestructura.dto_postgres import ProductoConsulta
+from modulos.producto.infraestructura.mapeadores import MapeadorProductoConsulta
+from modulos.producto.infraestructura.proyecciones import ProyeccionProductoJson
+from modulos.producto.aplicacion.mapeadores import MapeadorProducto, MapeadorProductoDTOJson
+
+
+def generar_datos(cantidad: int):
+    tipo_producto_id = uuid.uuid4()
+    modelos, filas = [], []
+    for i in range(cantidad):
+        valores = dict(
+            id=uuid.uuid4(),
+            nombre=f"Producto {i}",
+            descripcion=f"Descripción del producto {i}",
+            precio=Decimal('2500.50'),
+            stock=i % 500,
+            marca="Genfar",
+            lote=f"LOT{i:06d}",
+            tipo_producto_id=tipo_producto_id
+        )
+        modelos.append(ProductoConsulta(
+            tipo_producto_nombre="Medicamentos",
+            tipo_producto_descripcion="Productos farmacéuticos",
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            **valores
+        ))
+        filas.append(tuple(valores.values()))
+    return modelos, filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=20000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    modelos, filas = generar_datos(args.filas)
+
+    mapeador_consulta = MapeadorProductoConsulta()
+    mapeador = MapeadorProducto()
+    mapeador_json = MapeadorProductoDTOJson()
+    proyeccion = ProyeccionProductoJson()
+
+    def cadena_mapeadores():
+        return [mapeador_json.dto_a_externo(mapeador.entidad_a_dto(mapeador_consulta.dto_a_entidad(m))) for m in modelos]
+
+    def proyeccion_directa():
+        return [proyeccion.fila_a_externo(f) for f in filas]
+
+    # Ambos caminos deben producir exactamente el mismo JSON externo
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert cadena_mapeadores() == proyeccion_directa(), "Las salidas de ambos caminos difieren"
+
+    # dto_a_entidad imprime cada fila; se descarta la salida para medir solo CPU
+    with contextlib.redirect_stdout(io.StringIO()):
+        tiempo_mapeadores = min(timeit.repeat(cadena_mapeadores, number=1, repeat=args.repeticiones))
+    tiempo_proyeccion = min(timeit.repeat(proyeccion_directa, number=1, repeat=args.repeticiones))
+
+    por_fila_mapeadores = tiempo_mapeadores / args.filas * 1e6
+    por_fila_proyeccion = tiempo_proyeccion / args.filas * 1e6
+    print(f"Filas: {args.filas} (mejor de {args.repeticiones} repeticiones)")
+    print(f"  Cadena de mapeadores: {por_fila_mapeadores:8.2f} µs/fila")
+    print(f"  Proyección directa:   {por_fila_proyeccion:8.2f} µs/fila")
+    print(f"  Reducción:            {(1 - por_fila_proyeccion / por_fila_mapeadores) * 100:7.1f} % ({por_fila_mapeadores / por_fila_proyeccion:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -17,13 +17,13 @@ def importar_modelos_postgres():
     try:
         from modulos.producto.infraestructura.dto_postgres import (
             # Modelos de comandos
-            TipoProductoComando, ProductoComando,
+            TipoProductoComando, ProductoComando, EventoOutbox, ReservaStock, EventoProcesado,
             # Modelos de consultas
-            ProductoConsulta, TipoProductoConsulta
+            ProductoConsulta, TipoProductoConsulta, ProyeccionCheckpoint
         )
         logger.info("✅ Modelos PostgreSQL importados correctamente")
-        logger.info("   �� Modelos de comandos: TipoProductoComando, ProductoComando")
-        logger.info("   �� Modelos de consultas: ProductoConsulta, TipoProductoConsulta")
+        logger.info("   �� Modelos de comandos: TipoProductoComando, ProductoComando, EventoOutbox, ReservaStock, EventoProcesado")
+        logger.info("   �� Modelos de consultas: ProductoConsulta, TipoProductoConsulta, ProyeccionCheckpoint")
     except Exception as e:
         logger.error(f"❌ Error importando modelos PostgreSQL: {e}")
         raise
@@ -43,14 +43,30 @@ def inicializar_sistema_eventos(app):
         despachador_eventos.registrar_publicador(publicador)
         print(f"✅ Publicador registrado. Total publicadores: {len(despachador_eventos._publicadores)}")
         publicador.crear_topics()
+        app.extensions['publicador_pubsub'] = publicador
+        
+        # Relay del outbox: publica los eventos guardados junto con las escrituras
+        from seedwork.infraestructura.outbox import RelayOutbox
+        from modulos.producto.infraestructura.dto_postgres import EventoOutbox
+        from config.config.db_postgres import db
+        relay_outbox = RelayOutbox(app, db, EventoOutbox, publicador)
+        relay_outbox.iniciar()
+        app.extensions['relay_outbox'] = relay_outbox
+        
+        # Registro de eventos procesados: las reentregas de Pub/Sub no vuelven a ejecutar los manejadores
+        from seedwork.infraestructura.eventos_procesados import RegistroEventosProcesados
+        from modulos.producto.infraestructura.dto_postgres import EventoProcesado
+        registro_procesados = RegistroEventosProcesados(db, EventoProcesado)
+        registro_procesados.iniciar_purga(app)
         
         # Crear y configurar el consumidor Pub/Sub
         print("Creando consumidor Pub/Sub...")
-        consumidor = ConsumidorPubSub(app=app)
+        consumidor = ConsumidorPubSub(app=app, registro_procesados=registro_procesados)
         print("Creando suscripciones...")
         consumidor.crear_suscripciones()
         print("Iniciando escucha de eventos...")
         consumidor.iniciar_escucha()
+        app.extensions['consumidor_pubsub'] = consumidor
         
         logger.info("Sistema de eventos inicializado correctamente")
         print("✅ Sistema de eventos inicializado correctamente")
@@ -69,7 +85,7 @@ def create_app(configuracion=None):
         app.url_map.strict_slashes = False
 
         # Inicializar bases de datos PostgreSQL
-        from config.config.db_postgres import init_databases, create_all_tables
+        from config.config.db_postgres import init_databases, create_all_tables, iniciar_sync_consultas, registrar_comandos_cli
         
         init_databases(app)
         importar_modelos_postgres()
@@ -78,11 +94,24 @@ def create_app(configuracion=None):
             create_all_tables(app)
             logger.info("✅ Bases de datos PostgreSQL inicializadas")
 
+        # Reconstruir la base de consultas sin bloquear el arranque
+        iniciar_sync_consultas(app)
+        registrar_comandos_cli(app)
+
         # Inicializar sistema de eventos
         inicializar_sistema_eventos(app)
         
+        # Conciliar periódicamente los contadores de productos por tipo
+        from modulos.producto.infraestructura.conciliacion import iniciar_conciliacion_periodica
+        iniciar_conciliacion_periodica(app)
+
+        # Devolver al inventario el stock de las reservas vencidas
+        from modulos.producto.infraestructura.expiracion_reservas import iniciar_expiracion_reservas
+        iniciar_expiracion_reservas(app)
+
         # Importar handlers de eventos para registrarlos
         import modulos.producto.aplicacion.event_handlers.pedido_creado_handler
+        import modulos.producto.aplicacion.event_handlers.producto_stock_actualizado_handler
 
         # Importa Blueprints
         from . import producto
@@ -99,12 +128,19 @@ def create_app(configuracion=None):
 
         @app.route("/health")
         def health():
+            from modulos.producto.infraestructura.cache import cache_productos
+            from config.config.db_postgres import estado_sync
             return {
                 "status": "up",
                 "database": "postgresql",
                 "mode": "cqrs",
                 "commands_db": "productos_commands",
-                "queries_db": "productos_queries"
+                "queries_db": "productos_queries",
+                "cache_productos": cache_productos.estadisticas(),
+                "sync_consultas": estado_sync,
+                "publicador_pubsub": app.extensions['publicador_pubsub'].estadisticas() if 'publicador_pubsub' in app.extensions else None,
+                "outbox": app.extensions['relay_outbox'].estadisticas() if 'relay_outbox' in app.extensions else None,
+                "consumidor_pubsub": app.extensions['consumidor_pubsub'].estadisticas() if 'consumidor_pubsub' in app.extensions else None
             }
 
         logger.info("✅ Aplicación Flask configurada correctamente con PostgreSQL CQRS")
@@ -2,14 +2,24 @@ import seedwork.presentacion.api as api
 import json
 #from modulos.producto.aplicacion.servicios import ServicioProducto
 from modulos.producto.aplicacion.mapeadores import MapeadorProductoDTOJson, MapeadorTipoProductoDTOJson, MapeadorProducto, MapeadorTipoProducto  
-from flask import request, Response, Blueprint
+from flask import request, Response, Blueprint, stream_with_context
 from modulos.producto.aplicacion.comandos.crear_producto import CrearProducto
 from modulos.producto.aplicacion.comandos.crear_tipo_producto import CrearTipoProducto
+from modulos.producto.aplicacion.comandos.crear_productos_masivo import CrearProductosMasivo, TAMANO_LOTE_POR_DEFECTO
+from modulos.producto.aplicacion.comandos.reservar_stock import ReservarStock, ConfirmarReserva, LiberarReserva
+from modulos.producto.dominio.excepciones import StockInsuficienteExcepcion, ReservaNoEncontradaExcepcion, ReservaNoActivaExcepcion
 from seedwork.aplicacion.comandos import ejecutar_comando
 from modulos.producto.aplicacion.consultas.obtener_todos_los_productos import ObtenerTodosLosProductosConsulta
 from seedwork.aplicacion.consultas import ejecutar_consulta
 from modulos.producto.aplicacion.consultas.obtener_todos_los_tipo_productos import ObtenerTodosLosTiposDeProductoConsulta
 from modulos.producto.aplicacion.consultas.obtener_producto_por_id import ObtenerProductoPorIdConsulta
+from modulos.producto.aplicacion.consultas.obtener_version_tipos_productos import ObtenerVersionTiposDeProductoConsulta
+from modulos.producto.aplicacion.consultas.exportar_productos import ExportarProductosConsulta
+from modulos.producto.aplicacion.consultas.obtener_productos_por_ids import ObtenerProductosPorIdsConsulta
+from modulos.producto.aplicacion.consultas.obtener_productos_paginados import ObtenerProductosPaginadosConsulta, LIMITE_POR_DEFECTO
+import uuid
+import csv
+import io
 
 import logging
 logging.basicConfig(level=logging.DEBUG)
@@ -53,45 +63,211 @@ def crear_producto_comando():
     except Exception as e:
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
 
-# Query obtener todos los productos
+def _leer_filas_carga_masiva(formato: str):
+    """Lee el cuerpo de la petición fila a fila sin materializar el archivo completo y entrega pares
+    (número de línea, fila). Una línea NDJSON que no es un objeto JSON se entrega como el error que produjo,
+    para que se reporte como fila rechazada sin detener la carga."""
+    texto = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        lector = csv.DictReader(texto)
+        for fila in lector:
+            yield lector.line_num, fila
+    else:
+        for numero_linea, linea in enumerate(texto, start=1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield numero_linea, ValueError(f"JSON inválido: {e}")
+                continue
+            if not isinstance(fila, dict):
+                fila = ValueError("La línea debe ser un objeto JSON")
+            yield numero_linea, fila
+
+# Comando carga masiva de productos desde CSV o NDJSON
+@bp.route('/masivo', methods=['POST'])
+def crear_productos_masivo():
+    try:
+        formato = request.args.get('formato') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+        if formato not in ('csv', 'ndjson'):
+            raise ValueError("El formato debe ser 'csv' o 'ndjson'")
+        tamano_lote = _entero_opcional('tamano_lote')
+
+        comando = CrearProductosMasivo(
+            filas=_leer_filas_carga_masiva(formato),
+            tamano_lote=tamano_lote if tamano_lote is not None else TAMANO_LOTE_POR_DEFECTO
+        )
+        resumen = ejecutar_comando(comando)
+        return Response(json.dumps(resumen), status=200, mimetype='application/json')
+    except Exception as e:
+        logger.error(f"Error en la carga masiva de productos: {e}")
+        return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
+PARAMETROS_PAGINACION = ('limite', 'cursor', 'tipo_producto_id', 'marca', 'nombre', 'stock_min', 'stock_max')
+
+def _entero_opcional(nombre: str):
+    valor = request.args.get(nombre)
+    if valor is None or valor == '':
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"El parámetro {nombre} debe ser un entero")
+
+def obtener_productos_paginados():
+    tipo_producto_id = request.args.get('tipo_producto_id')
+    limite = _entero_opcional('limite')
+    consulta = ObtenerProductosPaginadosConsulta(
+        limite=limite if limite is not None else LIMITE_POR_DEFECTO,
+        cursor=request.args.get('cursor') or None,
+        tipo_producto_id=uuid.UUID(tipo_producto_id) if tipo_producto_id else None,
+        marca=request.args.get('marca') or None,
+        nombre=request.args.get('nombre') or None,
+        stock_min=_entero_opcional('stock_min'),
+        stock_max=_entero_opcional('stock_max')
+    )
+    resultado = ejecutar_consulta(consulta)
+
+    # La proyección ya entrega los productos en formato externo
+    return Response(json.dumps({
+        'productos': resultado.resultado['productos'],
+        'siguiente_cursor': resultado.resultado['siguiente_cursor'],
+        'limite': consulta.limite
+    }), status=200, mimetype='application/json')
+
+def obtener_productos_por_ids(ids: list):
+    if not isinstance(ids, list):
+        raise ValueError("ids debe ser una lista de identificadores")
+    consulta = ObtenerProductosPorIdsConsulta(ids=[uuid.UUID(str(id)) for id in ids])
+    resultado = ejecutar_consulta(consulta)
+    return Response(json.dumps(resultado.resultado), status=200, mimetype='application/json')
+
+# Query obtener todos los productos (en lote si se envía ids, paginado si se envían parámetros de paginación o filtros)
 @bp.route('/', methods=['GET'])
 def obtener_todos_los_productos():
     try:
+        if 'ids' in request.args:
+            ids = [id.strip() for id in request.args.get('ids', '').split(',') if id.strip()]
+            return obtener_productos_por_ids(ids)
+
+        if any(parametro in request.args for parametro in PARAMETROS_PAGINACION):
+            return obtener_productos_paginados()
+
         consulta = ObtenerTodosLosProductosConsulta()
         resultado = ejecutar_consulta(consulta)
         
-        # Convertir las entidades de dominio a DTOs
-        mapeador = MapeadorProducto()
-        productos_dto = [mapeador.entidad_a_dto(producto) for producto in resultado.resultado]
-        
-        # Convertir DTOs a formato JSON externo
-        mapeador_json = MapeadorProductoDTOJson()
-        productos_json = [mapeador_json.dto_a_externo(producto_dto) for producto_dto in productos_dto]
-        
-        return json.dumps(productos_json)
+        # La proyección de consultas ya entrega los productos en formato JSON externo
+        return json.dumps(resultado.resultado)
     except Exception as e:
         logger.error(f"Error al obtener todos los productos: {e}")
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
 
+# Query obtener productos en lote: {"ids": [...]} -> {"productos": {id: producto}, "no_encontrados": [...]}
+@bp.route('/batch', methods=['POST'])
+def obtener_productos_batch():
+    try:
+        cuerpo = request.get_json(silent=True) or {}
+        return obtener_productos_por_ids(cuerpo.get('ids', []))
+    except Exception as e:
+        logger.error(f"Error al obtener productos en lote: {e}")
+        return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
+# Query exportar el catálogo completo en streaming (NDJSON o arreglo JSON)
+@bp.route('/exportar', methods=['GET'])
+def exportar_productos():
+    try:
+        formato = request.args.get('formato', 'ndjson')
+        if formato not in ('ndjson', 'json'):
+            raise ValueError("El formato debe ser 'ndjson' o 'json'")
+
+        resultado = ejecutar_consulta(ExportarProductosConsulta())
+
+        def generar():
+            try:
+                if formato == 'json':
+                    yield '['
+                for indice, producto in enumerate(resultado.resultado):
+                    producto_json = json.dumps(producto)
+                    if formato == 'json':
+                        yield producto_json if indice == 0 else ',' + producto_json
+                    else:
+                        yield producto_json + '\n'
+                if formato == 'json':
+                    yield ']'
+            except Exception as e:
+                # El código de estado ya fue enviado; solo queda cortar la respuesta
+                logger.error(f"Error exportando productos: {e}")
+
+        mimetype = 'application/x-ndjson' if formato == 'ndjson' else 'application/json'
+        return Response(stream_with_context(generar()), status=200, mimetype=mimetype)
+    except Exception as e:
+        logger.error(f"Error al exportar productos: {e}")
+        return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
 # Query obtener producto por id
+def _respuesta_error_reserva(e: Exception) -> Response:
+    """Traduce los errores de reservas a códigos HTTP: 409 conflicto de stock o estado, 404 reserva inexistente"""
+    if isinstance(e, StockInsuficienteExcepcion):
+        cuerpo = dict(error=str(e), producto_id=str(e.producto_id), disponible=e.disponible, solicitado=e.solicitado)
+        return Response(json.dumps(cuerpo), status=409, mimetype='application/json')
+    if isinstance(e, ReservaNoActivaExcepcion):
+        return Response(json.dumps(dict(error=str(e), estado=e.estado)), status=409, mimetype='application/json')
+    if isinstance(e, ReservaNoEncontradaExcepcion):
+        return Response(json.dumps(dict(error=str(e))), status=404, mimetype='application/json')
+    return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
+# Comando reservar el stock de un pedido completo
+@bp.route('/reservas', methods=['POST'])
+def reservar_stock():
+    try:
+        cuerpo = request.get_json(silent=True) or {}
+        comando = ReservarStock(
+            items=cuerpo.get('items') or [],
+            pedido_id=uuid.UUID(cuerpo['pedido_id']) if cuerpo.get('pedido_id') else None,
+            ttl_segundos=int(cuerpo['ttl_segundos']) if cuerpo.get('ttl_segundos') is not None else None
+        )
+        reserva = ejecutar_comando(comando)
+        return Response(json.dumps(reserva), status=201, mimetype='application/json')
+    except Exception as e:
+        logger.warning(f"Reserva de stock rechazada: {e}")
+        return _respuesta_error_reserva(e)
+
+# Comando confirmar una reserva (el stock queda descontado)
+@bp.route('/reservas/<reserva_id>/confirmar', methods=['POST'])
+def confirmar_reserva(reserva_id):
+    try:
+        resultado = ejecutar_comando(ConfirmarReserva(reserva_id=uuid.UUID(reserva_id)))
+        return Response(json.dumps(resultado), status=200, mimetype='application/json')
+    except Exception as e:
+        return _respuesta_error_reserva(e)
+
+# Comando liberar una reserva (el stock se repone)
+@bp.route('/reservas/<reserva_id>/liberar', methods=['POST'])
+def liberar_reserva(reserva_id):
+    try:
+        resultado = ejecutar_comando(LiberarReserva(reserva_id=uuid.UUID(reserva_id)))
+        return Response(json.dumps(resultado), status=200, mimetype='application/json')
+    except Exception as e:
+        return _respuesta_error_reserva(e)
+
 @bp.route('/<id>', methods=['GET'])
 def obtener_producto_por_id(id):
     try:
-        consulta = ObtenerProductoPorIdConsulta(id)
+        consulta = ObtenerProductoPorIdConsulta(uuid.UUID(id))
         resultado = ejecutar_consulta(consulta)
         
         if not resultado.resultado:
             return Response(json.dumps(dict(error="Producto no encontrado")), status=404, mimetype='application/json')
         
-        # Convertir la entidad de dominio a DTO primero
-        mapeador = MapeadorProducto()
-        producto_dto = mapeador.entidad_a_dto(resultado.resultado)
-        
-        # Convertir DTO a formato JSON externo
-        mapeador_json = MapeadorProductoDTOJson()
-        producto_json = mapeador_json.dto_a_externo(producto_dto)
-        
-        return Response(json.dumps(producto_json), status=200, mimetype='application/json')
+        producto = resultado.resultado
+        etag = api.etag_fuerte(id, producto.ultima_modificacion or producto.json)
+        if api.es_no_modificado(etag, producto.ultima_modificacion):
+            return api.respuesta_no_modificado(etag, producto.ultima_modificacion)
+
+        # El resultado ya viene serializado desde el cache de productos
+        respuesta = Response(producto.json, status=200, mimetype='application/json')
+        return api.agregar_cabeceras_validacion(respuesta, etag, producto.ultima_modificacion)
     except Exception as e:
         logger.error(f"Error al obtener producto por id: {e}")
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
@@ -131,6 +307,12 @@ def crear_tipo_producto_comando():
 @bp.route('/tipo-producto', methods=['GET'])
 def obtener_todos_los_tipos_de_producto():
     try:
+        # Validar primero con un agregado barato (max(updated_at) + count) antes de cargar filas
+        version = ejecutar_consulta(ObtenerVersionTiposDeProductoConsulta()).resultado
+        etag = api.etag_fuerte('tipos-producto', version['cantidad'], version['ultima_modificacion'])
+        if api.es_no_modificado(etag, version['ultima_modificacion']):
+            return api.respuesta_no_modificado(etag, version['ultima_modificacion'])
+
         consulta = ObtenerTodosLosTiposDeProductoConsulta()
         resultado = ejecutar_consulta(consulta)
 
@@ -138,6 +320,7 @@ def obtener_todos_los_tipos_de_producto():
         tipos_productos_dto = [mapeador.entidad_a_dto(tipo_producto) for tipo_producto in resultado.resultado]
         mapeador_json = MapeadorTipoProductoDTOJson()
         tipos_productos_json = [mapeador_json.dto_a_externo(tipo_producto_dto) for tipo_producto_dto in tipos_productos_dto]
-        return json.dumps(tipos_productos_json)
+        respuesta = Response(json.dumps(tipos_productos_json), status=200, mimetype='application/json')
+        return api.agregar_cabeceras_validacion(respuesta, etag, version['ultima_modificacion'])
     except Exception as e:
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
@@ -1,6 +1,11 @@
 # src/config/config/db_postgres.py
 from flask_sqlalchemy import SQLAlchemy
 from flask import Flask
+from sqlalchemy.dialects.postgresql import insert as insert_postgres
+from datetime import datetime, timedelta
+import threading
+import time
+import click
 import os
 
 # Una sola instancia de SQLAlchemy para manejar múltiples bases de datos
@@ -46,87 +51,290 @@ def create_all_tables(app: Flask):
             # Crear tablas para modelos de comandos
             TipoProductoComando.__table__.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
             ProductoComando.__table__.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
+            # Los índices nuevos no se crean con la tabla si esta ya existía
+            for indice in ProductoComando.__table__.indexes:
+                indice.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
+            from modulos.producto.infraestructura.dto_postgres import EventoOutbox, ReservaStock, EventoProcesado
+            EventoOutbox.__table__.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
+            ReservaStock.__table__.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
+            for indice in ReservaStock.__table__.indexes:
+                indice.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
+            EventoProcesado.__table__.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
             
             print("[INFO] Creando tablas de consultas...")
             # Importar modelos de consultas para asegurar que estén registrados
-            from modulos.producto.infraestructura.dto_postgres import TipoProductoConsulta, ProductoConsulta
+            from modulos.producto.infraestructura.dto_postgres import TipoProductoConsulta, ProductoConsulta, ProyeccionCheckpoint
             
             # Crear tablas para modelos de consultas
             TipoProductoConsulta.__table__.create(bind=db.get_engine(bind_key='queries'), checkfirst=True)
             ProductoConsulta.__table__.create(bind=db.get_engine(bind_key='queries'), checkfirst=True)
+            # create con checkfirst no agrega índices nuevos a una tabla existente
+            for indice in ProductoConsulta.__table__.indexes:
+                indice.create(bind=db.get_engine(bind_key='queries'), checkfirst=True)
+            ProyeccionCheckpoint.__table__.create(bind=db.get_engine(bind_key='queries'), checkfirst=True)
             
             print("[INFO] Todas las tablas creadas exitosamente")
             
-            # Sincronizar datos iniciales de comandos a consultas
-            sync_commands_to_queries()
-            
         except Exception as e:
             print(f"[ERROR] Error creando tablas: {e}")
             raise
 
-def sync_commands_to_queries():
-    """Sincroniza datos de la base de comandos a la base de consultas"""
+# Estado de la última sincronización de la base de consultas (expuesto en /health)
+estado_sync = {'estado': 'pendiente', 'modo': None, 'productos_copiados': 0, 'productos_total': None,
+               'inicio': None, 'fin': None, 'error': None, 'checkpoint': None}
+
+CHECKPOINT_TIPOS = 'tipos_productos'
+CHECKPOINT_PRODUCTOS = 'productos'
+
+def sync_commands_to_queries(tamano_lote: int = None, completa: bool = False):
+    """Sincroniza la base de consultas desde la de comandos. Por defecto solo copia las filas cambiadas
+    desde la última marca de agua (O(delta)); con completa=True la reconstruye desde cero."""
+    tamano_lote = tamano_lote or int(os.getenv('SYNC_TAMANO_LOTE', '5000'))
+    estado_sync.update(estado='en_progreso', modo='completa' if completa else 'incremental', productos_copiados=0,
+                       productos_total=None, inicio=datetime.now().isoformat(), fin=None, error=None)
     try:
-        print("[INFO] Sincronizando datos de comandos a consultas...")
-        
-        # Importar modelos
-        from modulos.producto.infraestructura.dto_postgres import (
-            TipoProductoComando, ProductoComando,
-            TipoProductoConsulta, ProductoConsulta
-        )
-        
-        # Limpiar datos existentes en consultas
-        ProductoConsulta.query.delete()
-        TipoProductoConsulta.query.delete()
-        
-        # Copiar tipos de producto de comandos a consultas
-        tipos_comando = TipoProductoComando.query.all()
-        for tipo_comando in tipos_comando:
-            tipo_consulta = TipoProductoConsulta(
-                id=tipo_comando.id,
-                nombre=tipo_comando.nombre,
-                descripcion=tipo_comando.descripcion,
-                created_at=tipo_comando.created_at,
-                updated_at=tipo_comando.updated_at,
-                cantidad_productos=0  # Se calculará después
-            )
-            db.session.add(tipo_consulta)
-        
-        # Copiar productos de comandos a consultas (denormalizados)
-        productos_comando = ProductoComando.query.all()
-        for producto_comando in productos_comando:
-            # Buscar el tipo de producto correspondiente
-            tipo_producto = TipoProductoComando.query.filter_by(id=producto_comando.tipo_producto_id).first()
-            
-            producto_consulta = ProductoConsulta(
-                id=producto_comando.id,
-                nombre=producto_comando.nombre,
-                descripcion=producto_comando.descripcion,
-                precio=producto_comando.precio,
-                stock=producto_comando.stock,
-                marca=producto_comando.marca,
-                lote=producto_comando.lote,
-                tipo_producto_id=producto_comando.tipo_producto_id,
-                tipo_producto_nombre=tipo_producto.nombre if tipo_producto else "Desconocido",
-                tipo_producto_descripcion=tipo_producto.descripcion if tipo_producto else "Desconocido",
-                created_at=producto_comando.created_at,
-                updated_at=producto_comando.updated_at
-            )
-            db.session.add(producto_consulta)
-        
-        # Calcular cantidad de productos por tipo
-        for tipo_consulta in TipoProductoConsulta.query.all():
-            cantidad = ProductoConsulta.query.filter_by(tipo_producto_id=tipo_consulta.id).count()
-            tipo_consulta.cantidad_productos = cantidad
-        
-        db.session.commit()
-        print("[INFO] Datos sincronizados exitosamente")
-        
+        if completa:
+            _reconstruir_consultas(tamano_lote)
+        else:
+            _sincronizar_incremental(tamano_lote)
+        estado_sync.update(estado='completado', fin=datetime.now().isoformat())
     except Exception as e:
         print(f"[ERROR] Error sincronizando datos: {e}")
         db.session.rollback()
+        estado_sync.update(estado='error', fin=datetime.now().isoformat(), error=str(e))
         # No bajar la aplicación si la sincronización falla
 
+def _reconstruir_consultas(tamano_lote: int):
+    """Reconstrucción completa con operaciones por conjuntos: tipos y conteos con un GROUP BY,
+    y productos con un join leído por lotes e insertado en bloque"""
+    from modulos.producto.infraestructura.dto_postgres import (
+        TipoProductoComando, ProductoComando,
+        TipoProductoConsulta, ProductoConsulta
+    )
+    from modulos.producto.infraestructura.cache import cache_productos
+    print("[INFO] Reconstruyendo la base de consultas desde comandos...")
+    
+    # Cantidad de productos por tipo con un solo GROUP BY en la base de comandos
+    conteos = dict(
+        db.session.query(ProductoComando.tipo_producto_id, db.func.count(ProductoComando.id))
+        .group_by(ProductoComando.tipo_producto_id)
+        .all()
+    )
+    estado_sync['productos_total'] = sum(conteos.values())
+    tipos = db.session.execute(_select_tipos_comando()).all()
+    
+    # Todo se hace en una transacción de consultas: los lectores ven la versión anterior hasta el commit
+    db.session.execute(db.delete(ProductoConsulta))
+    db.session.execute(db.delete(TipoProductoConsulta))
+    if tipos:
+        db.session.execute(db.insert(TipoProductoConsulta), [
+            dict(_fila_tipo_consulta(fila), cantidad_productos=conteos.get(fila[0], 0)) for fila in tipos
+        ])
+    
+    # Productos denormalizados: el join se lee con un cursor del lado del servidor, lote por lote
+    marca_productos = None
+    filas = db.session.execute(_select_productos_comando().execution_options(yield_per=tamano_lote))
+    for lote in filas.partitions():
+        db.session.execute(db.insert(ProductoConsulta), [_fila_producto_consulta(fila) for fila in lote])
+        marca_productos = _marca_maxima(lote, marca_productos)
+        estado_sync['productos_copiados'] += len(lote)
+        print(f"[INFO] Sincronización: {estado_sync['productos_copiados']}/{estado_sync['productos_total']} productos copiados")
+    
+    # La reconstrucción deja las marcas de agua al día para que el siguiente arranque sea incremental
+    _guardar_checkpoint(CHECKPOINT_TIPOS, _marca_maxima(tipos))
+    _guardar_checkpoint(CHECKPOINT_PRODUCTOS, marca_productos)
+    db.session.commit()
+    cache_productos.limpiar()
+    print(f"[INFO] Datos sincronizados exitosamente: {len(tipos)} tipos, {estado_sync['productos_copiados']} productos")
+
+def _sincronizar_incremental(tamano_lote: int):
+    """Copia a consultas solo los tipos y productos con (updated_at, id) mayor a la marca de agua guardada,
+    con upserts; la marca avanza en la misma transacción que cada lote copiado. Un upsert no pisa una fila
+    de consultas con updated_at más reciente (por ejemplo, stock proyectado después de leer el lote).
+
+    Los tipos eliminados en comandos se eliminan de consultas comparando todos los ids (la tabla es pequeña).
+    Los productos eliminados no dejan rastro en el delta: los elimina de consultas el repositorio al
+    borrarlos, y si esa proyección falló solo la sincronización completa los repara."""
+    from modulos.producto.infraestructura.dto_postgres import (
+        TipoProductoComando, ProductoComando,
+        TipoProductoConsulta, ProductoConsulta
+    )
+    from modulos.producto.infraestructura.conciliacion import conciliar_cantidad_productos
+    from modulos.producto.infraestructura.cache import invalidar_producto
+    # Se relee una ventana hacia atrás para no perder filas de transacciones que confirmaron tarde
+    margen = timedelta(seconds=float(os.getenv('SYNC_MARGEN_SEGUNDOS', '5')))
+    
+    # 1. Tipos de producto (tabla pequeña): upsert de los cambiados y propagación del nombre a sus productos
+    marca = _leer_checkpoint(CHECKPOINT_TIPOS)
+    consulta = _select_tipos_comando()
+    if marca:
+        consulta = consulta.where(TipoProductoComando.updated_at >= marca[0] - margen)
+    tipos = db.session.execute(consulta).all()
+    if tipos:
+        upsert = insert_postgres(TipoProductoConsulta).values([
+            dict(_fila_tipo_consulta(fila), cantidad_productos=0) for fila in tipos
+        ])
+        db.session.execute(upsert.on_conflict_do_update(
+            index_elements=[TipoProductoConsulta.id],
+            set_={columna: upsert.excluded[columna] for columna in ('nombre', 'descripcion', 'created_at', 'updated_at')},
+            where=db.or_(TipoProductoConsulta.updated_at.is_(None), TipoProductoConsulta.updated_at <= upsert.excluded.updated_at)
+        ))
+        if marca:
+            for fila in tipos:
+                db.session.execute(
+                    db.update(ProductoConsulta)
+                    .where(ProductoConsulta.tipo_producto_id == fila.id)
+                    .values(tipo_producto_nombre=fila.nombre, tipo_producto_descripcion=fila.descripcion)
+                    .execution_options(synchronize_session=False)
+                )
+        _guardar_checkpoint(CHECKPOINT_TIPOS, _marca_maxima(tipos), marca)
+    ids_tipos = [id for (id,) in db.session.execute(db.select(TipoProductoComando.id))]
+    tipos_eliminados = db.session.execute(
+        db.delete(TipoProductoConsulta)
+        .where(TipoProductoConsulta.id.not_in(ids_tipos))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    print(f"[INFO] Sincronización incremental: {len(tipos)} tipos de producto copiados, {tipos_eliminados} eliminados")
+    
+    # 2. Productos: keyset sobre (updated_at, id) desde la marca, leído en una conexión propia para
+    #    poder confirmar cada lote sin cerrar el cursor
+    marca = _leer_checkpoint(CHECKPOINT_PRODUCTOS)
+    consulta = _select_productos_comando().order_by(ProductoComando.updated_at, ProductoComando.id)
+    if marca:
+        consulta = consulta.where(db.tuple_(ProductoComando.updated_at, ProductoComando.id) > db.tuple_(marca[0] - margen, marca[1]))
+    tipos_afectados = set()
+    with db.engines['commands'].connect() as conexion:
+        filas = conexion.execution_options(yield_per=tamano_lote).execute(consulta)
+        for lote in filas.partitions():
+            ids = [fila.id for fila in lote]
+            # Tipos anteriores de los productos existentes, para recontar también el tipo del que salieron
+            tipos_afectados.update(tipo_id for (tipo_id,) in db.session.execute(
+                db.select(ProductoConsulta.tipo_producto_id).where(ProductoConsulta.id.in_(ids))
+            ))
+            tipos_afectados.update(fila.tipo_producto_id for fila in lote)
+            
+            upsert = insert_postgres(ProductoConsulta).values([_fila_producto_consulta(fila) for fila in lote])
+            db.session.execute(upsert.on_conflict_do_update(
+                index_elements=[ProductoConsulta.id],
+                set_={columna: upsert.excluded[columna] for columna in (
+                    'nombre', 'descripcion', 'precio', 'stock', 'marca', 'lote', 'tipo_producto_id',
+                    'tipo_producto_nombre', 'tipo_producto_descripcion', 'created_at', 'updated_at')},
+                where=db.or_(ProductoConsulta.updated_at.is_(None), ProductoConsulta.updated_at <= upsert.excluded.updated_at)
+            ))
+            ultima = lote[-1]
+            _guardar_checkpoint(CHECKPOINT_PRODUCTOS, (ultima.updated_at, ultima.id), marca)
+            db.session.commit()
+            for id in ids:
+                invalidar_producto(id)
+            estado_sync['productos_copiados'] += len(lote)
+            print(f"[INFO] Sincronización incremental: {estado_sync['productos_copiados']} productos copiados")
+    
+    # 3. Recontar solo los tipos afectados por el delta
+    if tipos_afectados:
+        conciliar_cantidad_productos(list(tipos_afectados))
+    print(f"[INFO] Sincronización incremental completada: {estado_sync['productos_copiados']} productos copiados")
+
+def _select_tipos_comando():
+    from modulos.producto.infraestructura.dto_postgres import TipoProductoComando
+    return db.select(
+        TipoProductoComando.id, TipoProductoComando.nombre, TipoProductoComando.descripcion,
+        TipoProductoComando.created_at, TipoProductoComando.updated_at
+    )
+
+def _select_productos_comando():
+    from modulos.producto.infraestructura.dto_postgres import TipoProductoComando, ProductoComando
+    return db.select(
+        ProductoComando.id, ProductoComando.nombre, ProductoComando.descripcion, ProductoComando.precio,
+        ProductoComando.stock, ProductoComando.marca, ProductoComando.lote, ProductoComando.tipo_producto_id,
+        ProductoComando.created_at, ProductoComando.updated_at,
+        TipoProductoComando.nombre.label('tipo_producto_nombre'),
+        TipoProductoComando.descripcion.label('tipo_producto_descripcion')
+    ).outerjoin(TipoProductoComando, ProductoComando.tipo_producto_id == TipoProductoComando.id)
+
+def _fila_tipo_consulta(fila) -> dict:
+    id, nombre, descripcion, created_at, updated_at = fila
+    return {'id': id, 'nombre': nombre, 'descripcion': descripcion, 'created_at': created_at, 'updated_at': updated_at}
+
+def _fila_producto_consulta(fila) -> dict:
+    return {
+        'id': fila.id, 'nombre': fila.nombre, 'descripcion': fila.descripcion, 'precio': fila.precio,
+        'stock': fila.stock, 'marca': fila.marca, 'lote': fila.lote, 'tipo_producto_id': fila.tipo_producto_id,
+        'created_at': fila.created_at, 'updated_at': fila.updated_at,
+        'tipo_producto_nombre': fila.tipo_producto_nombre or "Desconocido",
+        'tipo_producto_descripcion': fila.tipo_producto_descripcion or "Desconocido"
+    }
+
+def _marca_maxima(filas, marca_actual: tuple = None):
+    """Mayor (updated_at, id) entre las filas y la marca actual"""
+    marcas = [(fila.updated_at, fila.id) for fila in filas if fila.updated_at]
+    if marca_actual:
+        marcas.append(marca_actual)
+    return max(marcas, default=None)
+
+def _leer_checkpoint(nombre: str):
+    """Retorna la marca de agua (updated_at, id) guardada o None si la tabla nunca se ha proyectado"""
+    from modulos.producto.infraestructura.dto_postgres import ProyeccionCheckpoint
+    checkpoint = db.session.get(ProyeccionCheckpoint, nombre)
+    if not checkpoint or checkpoint.ultima_actualizacion is None:
+        return None
+    return checkpoint.ultima_actualizacion, checkpoint.ultimo_id
+
+def _guardar_checkpoint(nombre: str, marca: tuple, marca_anterior: tuple = None):
+    """Guarda la marca de agua en la transacción actual; nunca la retrocede respecto a marca_anterior"""
+    from modulos.producto.infraestructura.dto_postgres import ProyeccionCheckpoint
+    if marca is None or (marca_anterior and marca <= marca_anterior):
+        return
+    upsert = insert_postgres(ProyeccionCheckpoint).values(nombre=nombre, ultima_actualizacion=marca[0], ultimo_id=marca[1])
+    db.session.execute(upsert.on_conflict_do_update(
+        index_elements=[ProyeccionCheckpoint.nombre],
+        set_={'ultima_actualizacion': marca[0], 'ultimo_id': marca[1], 'updated_at': db.func.now()}
+    ))
+    estado_sync['checkpoint'] = {'nombre': nombre, 'updated_at': marca[0].isoformat(), 'id': str(marca[1])}
+
+def iniciar_sync_consultas(app: Flask):
+    """Lanza la sincronización incremental de consultas según SYNC_CONSULTAS_AL_INICIAR:
+    'segundo_plano' (por defecto, no retrasa el arranque y repite cada SYNC_INTERVALO_SEGUNDOS),
+    'bloqueante' o 'deshabilitado'"""
+    modo = os.getenv('SYNC_CONSULTAS_AL_INICIAR', 'segundo_plano')
+    intervalo = float(os.getenv('SYNC_INTERVALO_SEGUNDOS', '60'))
+    if modo == 'deshabilitado':
+        estado_sync['estado'] = 'deshabilitado'
+        print("[INFO] Sincronización de consultas al iniciar deshabilitada")
+        return None
+
+    def ejecutar():
+        with app.app_context():
+            try:
+                sync_commands_to_queries()
+            finally:
+                db.session.remove()
+
+    if modo == 'bloqueante':
+        ejecutar()
+        return None
+
+    def ejecutar_periodicamente():
+        ejecutar()
+        while intervalo > 0:
+            time.sleep(intervalo)
+            ejecutar()
+
+    hilo = threading.Thread(target=ejecutar_periodicamente, name='sync-consultas', daemon=True)
+    hilo.start()
+    print(f"[INFO] Sincronización incremental de consultas iniciada en segundo plano (intervalo: {intervalo}s)")
+    return hilo
+
+def registrar_comandos_cli(app: Flask):
+    """Registra `flask sync-consultas` para sincronizar la base de consultas manualmente"""
+    @app.cli.command('sync-consultas')
+    @click.option('--tamano-lote', type=int, default=None, help='Productos por lote')
+    @click.option('--completa', is_flag=True, help='Reconstruir desde cero en lugar de copiar solo los cambios')
+    def sync_consultas(tamano_lote, completa):
+        sync_commands_to_queries(tamano_lote, completa=completa)
+        if estado_sync['estado'] != 'completado':
+            raise click.ClickException(estado_sync['error'] or 'La sincronización no se completó')
+
 # Alias para compatibilidad con el código existente
 db_commands = db
 db_queries = db
\ No newline at end of file
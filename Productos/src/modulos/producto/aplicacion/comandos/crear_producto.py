@@ -7,6 +7,7 @@ from modulos.producto.aplicacion.mapeadores import MapeadorProducto
 from modulos.producto.dominio.repositorios_comando import RepositorioProductoComando, RepositorioTipoProductoComando
 from modulos.producto.dominio.repositorios_consulta import RepositorioTipoProductoConsulta
 from modulos.producto.aplicacion.comandos.base import ProductoComandoBaseHandler
+from seedwork.infraestructura.outbox import despachar_eventos_locales
 
 @dataclass
 class CrearProducto(Comando):
@@ -45,12 +46,13 @@ class CrearProductoHandler(ProductoComandoBaseHandler):
         # 3. Convertir DTO a entidad de dominio usando la fábrica
         producto_entidad = self.fabrica_producto.crear_objeto(producto_dto, MapeadorProducto())
         
-        # 4. Guardar en el repositorio de comandos (escritura)
+        # 4. Registrar el evento de creación (se guarda en el outbox junto con el producto)
+        producto_entidad.disparar_evento_creacion()
+        
+        # 5. Guardar en el repositorio de comandos (escritura) y notificar a los manejadores locales
         repositorio_producto_comando = self.fabrica_repositorio.crear_objeto(RepositorioProductoComando)
         repositorio_producto_comando.agregar(producto_entidad)
-        
-        # 5. Disparar evento de creación
-        producto_entidad.disparar_evento_creacion()
+        despachar_eventos_locales(producto_entidad)
         
         # 6. Retornar el DTO del producto creado
         return producto_dto
@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+from itertools import islice
+from typing import Iterable
+from seedwork.aplicacion.comandos import Comando, ejecutar_comando
+from modulos.producto.aplicacion.mapeadores import MapeadorProducto, MapeadorProductoDTOJson
+from modulos.producto.dominio.repositorios_comando import RepositorioProductoComando
+from modulos.producto.dominio.repositorios_consulta import RepositorioTipoProductoConsulta
+from modulos.producto.aplicacion.comandos.base import ProductoComandoBaseHandler
+
+TAMANO_LOTE_POR_DEFECTO = 1000
+MAXIMO_ERRORES_REPORTADOS = 100
+
+@dataclass
+class CrearProductosMasivo(Comando):
+    """Carga masiva de productos; cada elemento de filas es (número de línea, fila), donde la fila es un dict
+    con los mismos campos de CrearProducto o la excepción con la que falló su lectura"""
+    filas: Iterable[tuple]
+    tamano_lote: int = TAMANO_LOTE_POR_DEFECTO
+
+class CrearProductosMasivoHandler(ProductoComandoBaseHandler):
+    def __init__(self):
+        super().__init__()
+        self._mapeador = MapeadorProducto()
+        self._mapeador_json = MapeadorProductoDTOJson()
+
+    def handle(self, comando: CrearProductosMasivo) -> dict:
+        if comando.tamano_lote < 1:
+            raise ValueError("El tamaño de lote debe ser mayor a cero")
+
+        repositorio_tipo_consulta = self.fabrica_repositorio.crear_objeto(RepositorioTipoProductoConsulta)
+        repositorio_producto_comando = self.fabrica_repositorio.crear_objeto(RepositorioProductoComando)
+
+        insertados, rechazados, sin_proyectar, errores = 0, 0, 0, []
+        filas = iter(comando.filas)
+        while True:
+            lote = list(islice(filas, comando.tamano_lote))
+            if not lote:
+                break
+
+            # 1. Convertir las filas a DTOs; las que no se pueden convertir se rechazan
+            dtos, numeros = [], []
+            for numero_fila, fila in lote:
+                try:
+                    dtos.append(self._fila_a_dto(fila))
+                    numeros.append(numero_fila)
+                except Exception as e:
+                    errores.append((numero_fila, f"Fila inválida: {e}"))
+
+            # 2. Resolver todos los tipos del lote con una sola consulta
+            tipos = repositorio_tipo_consulta.obtener_por_ids(list({dto.tipo_producto_id for dto in dtos if dto.tipo_producto_id}))
+            dtos_con_tipo, numeros_con_tipo = [], []
+            for dto, numero in zip(dtos, numeros):
+                if dto.tipo_producto_id in tipos:
+                    dtos_con_tipo.append(dto)
+                    numeros_con_tipo.append(numero)
+                else:
+                    errores.append((numero, f"Tipo de producto con ID {dto.tipo_producto_id} no encontrado"))
+
+            # 3. Validar las reglas de la fábrica sobre el lote completo
+            productos, errores_fabrica = self.fabrica_producto.crear_objetos(dtos_con_tipo, self._mapeador, tipos)
+            errores.extend((numeros_con_tipo[indice], mensaje) for indice, mensaje in errores_fabrica)
+
+            # 4. Escribir y proyectar el lote en bloque; si la proyección falla el lote queda escrito en comandos
+            if not repositorio_producto_comando.agregar_masivo(productos):
+                sin_proyectar += len(productos)
+            insertados += len(productos)
+            rechazados += len(lote) - len(productos)
+            print(f"[CARGA-MASIVA] Lote procesado: {len(productos)} insertados, {len(lote) - len(productos)} rechazados")
+
+        errores.sort()
+        return {
+            'insertados': insertados,
+            'rechazados': rechazados,
+            'sin_proyectar': sin_proyectar,
+            'errores': [{'fila': fila, 'error': mensaje} for fila, mensaje in errores[:MAXIMO_ERRORES_REPORTADOS]]
+        }
+
+    def _fila_a_dto(self, fila: dict):
+        """Normaliza los tipos de una fila (en CSV todos los valores llegan como texto)"""
+        if isinstance(fila, Exception):
+            raise fila
+        return self._mapeador_json.externo_a_dto(dict(
+            fila,
+            precio=float(fila['precio']),
+            stock=int(fila['stock'])
+        ))
+
+@ejecutar_comando.register
+def _(comando: CrearProductosMasivo):
+    handler = CrearProductosMasivoHandler()
+    return handler.handle(comando)
@@ -0,0 +1,121 @@
+"""
+Comandos para reservar, confirmar y liberar stock de un pedido completo
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+from seedwork.aplicacion.comandos import Comando, ejecutar_comando
+from modulos.producto.aplicacion.comandos.base import ProductoComandoBaseHandler
+from modulos.producto.dominio.excepciones import ReservaNoActivaExcepcion, ReservaNoEncontradaExcepcion
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TTL_RESERVA_POR_DEFECTO = int(os.getenv('RESERVA_TTL_SEGUNDOS', '900'))
+TTL_RESERVA_MAXIMO = 24 * 60 * 60
+MAXIMO_ITEMS_POR_RESERVA = 500
+
+@dataclass
+class ReservarStock(Comando):
+    """Reserva el stock de todos los items de un pedido; cada item es un dict con producto_id y cantidad"""
+    items: list
+    pedido_id: Optional[uuid.UUID] = None
+    ttl_segundos: Optional[int] = None
+    reserva_id: uuid.UUID = field(default_factory=uuid.uuid4)
+
+@dataclass
+class ConfirmarReserva(Comando):
+    reserva_id: uuid.UUID
+
+@dataclass
+class LiberarReserva(Comando):
+    reserva_id: uuid.UUID
+
+class ReservarStockHandler(ProductoComandoBaseHandler):
+    """Reserva todo el pedido en una sola transacción: o se reservan todos los productos o ninguno"""
+
+    def handle(self, comando: ReservarStock) -> dict:
+        cantidades = self._cantidades_por_producto(comando.items)
+        ttl = comando.ttl_segundos if comando.ttl_segundos is not None else TTL_RESERVA_POR_DEFECTO
+        if not 0 < ttl <= TTL_RESERVA_MAXIMO:
+            raise ValueError(f"ttl_segundos debe estar entre 1 y {TTL_RESERVA_MAXIMO}")
+        expira_en = datetime.now() + timedelta(seconds=ttl)
+
+        reserva = self.repositorio_comando.reservar_stock(
+            comando.reserva_id, cantidades, expira_en, comando.pedido_id
+        )
+        if reserva['reserva_id'] != comando.reserva_id:
+            logger.info(f"El pedido {comando.pedido_id} ya tenía la reserva activa {reserva['reserva_id']}; se reutiliza")
+        else:
+            logger.info(f"Reserva {comando.reserva_id} creada para {len(cantidades)} productos, expira {expira_en}")
+        productos = reserva['productos']
+        return {
+            'reserva_id': str(reserva['reserva_id']),
+            'estado': 'ACTIVA',
+            'expira_en': reserva['expira_en'].isoformat(),
+            'items': [{
+                'producto_id': str(producto_id),
+                'cantidad': cantidad,
+                'nombre': productos[producto_id]['nombre'],
+                'precio_unitario': productos[producto_id]['precio_unitario']
+            } for producto_id, cantidad in reserva['cantidades'].items()]
+        }
+
+    @staticmethod
+    def _cantidades_por_producto(items: list) -> dict:
+        if not items:
+            raise ValueError("La reserva debe tener al menos un item")
+        if len(items) > MAXIMO_ITEMS_POR_RESERVA:
+            raise ValueError(f"Máximo {MAXIMO_ITEMS_POR_RESERVA} items por reserva")
+        cantidades = {}
+        for item in items:
+            try:
+                producto_id = uuid.UUID(str(item['producto_id']))
+                cantidad = int(item['cantidad'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Item de reserva inválido: {item}")
+            if cantidad <= 0:
+                raise ValueError(f"La cantidad debe ser mayor a cero: {item}")
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+        return cantidades
+
+class ConfirmarReservaHandler(ProductoComandoBaseHandler):
+    """Confirma una reserva activa; el stock queda descontado definitivamente"""
+
+    def handle(self, comando: ConfirmarReserva) -> dict:
+        anteriores = self.repositorio_comando.confirmar_reservas([comando.reserva_id])
+        estado = anteriores.get(comando.reserva_id)
+        if estado is None:
+            raise ReservaNoEncontradaExcepcion(comando.reserva_id)
+        # Confirmar dos veces es idempotente
+        if estado not in ('ACTIVA', 'CONFIRMADA'):
+            raise ReservaNoActivaExcepcion(comando.reserva_id, estado)
+        return {'reserva_id': str(comando.reserva_id), 'estado': 'CONFIRMADA'}
+
+class LiberarReservaHandler(ProductoComandoBaseHandler):
+    """Libera una reserva activa devolviendo su stock"""
+
+    def handle(self, comando: LiberarReserva) -> dict:
+        estado = self.repositorio_comando.liberar_reserva(comando.reserva_id)
+        if estado == 'CONFIRMADA':
+            raise ReservaNoActivaExcepcion(comando.reserva_id, estado)
+        # Liberar una reserva ya liberada o expirada no cambia nada
+        return {'reserva_id': str(comando.reserva_id), 'estado': 'LIBERADA' if estado == 'ACTIVA' else estado}
+
+@ejecutar_comando.register
+def _(comando: ReservarStock):
+    handler = ReservarStockHandler()
+    return handler.handle(comando)
+
+@ejecutar_comando.register
+def _(comando: ConfirmarReserva):
+    handler = ConfirmarReservaHandler()
+    return handler.handle(comando)
+
+@ejecutar_comando.register
+def _(comando: LiberarReserva):
+    handler = LiberarReservaHandler()
+    return handler.handle(comando)
@@ -1,5 +1,6 @@
 from seedwork.aplicacion.consultas import ConsultaHandler
 from modulos.producto.infraestructura.fabrica import FabricaRepositorio
+from modulos.producto.infraestructura.proyecciones import ProyeccionProductoJson
 from modulos.producto.dominio.fabricas import FabricaTipoProducto
 
 class ProductoConsultaBaseHandler(ConsultaHandler):
@@ -7,11 +8,17 @@ class ProductoConsultaBaseHandler(ConsultaHandler):
     
     def __init__(self):
         self._fabrica_repositorio = FabricaRepositorio()
+        self._proyeccion = ProyeccionProductoJson()
 
     @property
     def fabrica_repositorio(self):
         return self._fabrica_repositorio
 
+    @property
+    def proyeccion(self):
+        """Proyección de lectura que entrega productos directamente en formato externo"""
+        return self._proyeccion
+
 class TipoProductoConsultaBaseHandler(ConsultaHandler):
     def __init__(self):
         self._fabrica_repositorio = FabricaRepositorio()
@@ -0,0 +1,23 @@
+
+from dataclasses import dataclass
+from seedwork.aplicacion.consultas import Consulta
+from modulos.producto.aplicacion.consultas.base import ProductoConsultaBaseHandler
+from seedwork.aplicacion.consultas import QueryResultado, ejecutar_consulta
+
+TAMANO_LOTE_POR_DEFECTO = 1000
+
+@dataclass
+class ExportarProductosConsulta(Consulta):
+    """Consulta que recorre todo el catálogo con un cursor del lado del servidor"""
+    tamano_lote: int = TAMANO_LOTE_POR_DEFECTO
+
+class ExportarProductosHandler(ProductoConsultaBaseHandler):
+    def handle(self, consulta: ExportarProductosConsulta) -> QueryResultado:
+        # El resultado es un generador: las filas se leen a medida que se consumen
+        productos = self.proyeccion.iterar_todos(tamano_lote=consulta.tamano_lote)
+        return QueryResultado(resultado=productos)
+
+@ejecutar_consulta.register
+def _(consulta: ExportarProductosConsulta):
+    handler = ExportarProductosHandler()
+    return handler.handle(consulta)
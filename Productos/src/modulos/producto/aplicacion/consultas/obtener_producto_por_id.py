@@ -1,20 +1,35 @@
 
 from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
 from seedwork.aplicacion.consultas import Consulta, QueryResultado, ejecutar_consulta
 from modulos.producto.aplicacion.consultas.base import ProductoConsultaBaseHandler
-from modulos.producto.dominio.repositorios_consulta import RepositorioProductoConsulta
+from modulos.producto.infraestructura.cache import cache_productos
+import json
 import uuid
 
 @dataclass
 class ObtenerProductoPorIdConsulta(Consulta):
     id: uuid.UUID
 
+@dataclass(frozen=True)
+class ProductoSerializado:
+    """Producto ya serializado a JSON junto con la fecha de su última actualización"""
+    json: str
+    ultima_modificacion: Optional[datetime] = None
+
 class ObtenerProductoPorIdHandler(ProductoConsultaBaseHandler):
     def handle(self, consulta: ObtenerProductoPorIdConsulta) -> QueryResultado:
-        repositorio_consulta = self.fabrica_repositorio.crear_objeto(RepositorioProductoConsulta)
-        producto = repositorio_consulta.obtener_por_id(consulta.id)
+        """Retorna un ProductoSerializado, leyendo a través del cache de productos"""
+        producto = cache_productos.obtener_o_cargar(str(consulta.id), lambda: self._cargar(consulta.id))
         return QueryResultado(resultado=producto)
 
+    def _cargar(self, id: uuid.UUID) -> ProductoSerializado:
+        producto, ultima_modificacion = self.proyeccion.obtener_por_id_con_fecha(id)
+        if not producto:
+            return None
+        return ProductoSerializado(json=json.dumps(producto), ultima_modificacion=ultima_modificacion)
+
 @ejecutar_consulta.register
 def _(consulta: ObtenerProductoPorIdConsulta):
     handler = ObtenerProductoPorIdHandler()
@@ -0,0 +1,42 @@
+
+from dataclasses import dataclass
+from typing import Optional
+from seedwork.aplicacion.consultas import Consulta
+from modulos.producto.aplicacion.consultas.base import ProductoConsultaBaseHandler
+from seedwork.aplicacion.consultas import QueryResultado, ejecutar_consulta
+import uuid
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+
+@dataclass
+class ObtenerProductosPaginadosConsulta(Consulta):
+    """Consulta paginada por cursor (keyset) sobre productos_view"""
+    limite: int = LIMITE_POR_DEFECTO
+    cursor: Optional[str] = None
+    tipo_producto_id: Optional[uuid.UUID] = None
+    marca: Optional[str] = None
+    nombre: Optional[str] = None
+    stock_min: Optional[int] = None
+    stock_max: Optional[int] = None
+
+class ObtenerProductosPaginadosHandler(ProductoConsultaBaseHandler):
+    def handle(self, consulta: ObtenerProductosPaginadosConsulta) -> QueryResultado:
+        if consulta.limite < 1 or consulta.limite > LIMITE_MAXIMO:
+            raise ValueError(f"El limite debe estar entre 1 y {LIMITE_MAXIMO}")
+
+        productos, siguiente_cursor = self.proyeccion.obtener_paginados(
+            limite=consulta.limite,
+            cursor=consulta.cursor,
+            tipo_producto_id=consulta.tipo_producto_id,
+            marca=consulta.marca,
+            nombre_prefijo=consulta.nombre,
+            stock_min=consulta.stock_min,
+            stock_max=consulta.stock_max
+        )
+        return QueryResultado(resultado={'productos': productos, 'siguiente_cursor': siguiente_cursor})
+
+@ejecutar_consulta.register
+def _(consulta: ObtenerProductosPaginadosConsulta):
+    handler = ObtenerProductosPaginadosHandler()
+    return handler.handle(consulta)
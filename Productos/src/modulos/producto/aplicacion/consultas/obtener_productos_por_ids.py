@@ -0,0 +1,29 @@
+from dataclasses import dataclass, field
+from typing import List
+from seedwork.aplicacion.consultas import Consulta
+from modulos.producto.aplicacion.consultas.base import ProductoConsultaBaseHandler
+from seedwork.aplicacion.consultas import QueryResultado, ejecutar_consulta
+import uuid
+
+MAXIMO_IDS_POR_LOTE = 500
+
+@dataclass
+class ObtenerProductosPorIdsConsulta(Consulta):
+    """Consulta en lote de productos por id sobre productos_view"""
+    ids: List[uuid.UUID] = field(default_factory=list)
+
+class ObtenerProductosPorIdsHandler(ProductoConsultaBaseHandler):
+    def handle(self, consulta: ObtenerProductosPorIdsConsulta) -> QueryResultado:
+        # Eliminar duplicados conservando el orden de la petición
+        ids = list(dict.fromkeys(consulta.ids))
+        if len(ids) > MAXIMO_IDS_POR_LOTE:
+            raise ValueError(f"Se pueden consultar máximo {MAXIMO_IDS_POR_LOTE} productos por lote")
+
+        productos = self.proyeccion.obtener_por_ids(ids)
+        no_encontrados = [str(id) for id in ids if str(id) not in productos]
+        return QueryResultado(resultado={'productos': productos, 'no_encontrados': no_encontrados})
+
+@ejecutar_consulta.register
+def _(consulta: ObtenerProductosPorIdsConsulta):
+    handler = ObtenerProductosPorIdsHandler()
+    return handler.handle(consulta)
@@ -0,0 +1,21 @@
+from dataclasses import dataclass
+from seedwork.aplicacion.consultas import Consulta
+from modulos.producto.aplicacion.consultas.base import TipoProductoConsultaBaseHandler
+from modulos.producto.dominio.repositorios_consulta import RepositorioTipoProductoConsulta
+from seedwork.aplicacion.consultas import QueryResultado, ejecutar_consulta
+
+@dataclass
+class ObtenerVersionTiposDeProductoConsulta(Consulta):
+    """Consulta agregada y barata para validar si la colección de tipos cambió"""
+    pass
+
+class ObtenerVersionTiposDeProductoHandler(TipoProductoConsultaBaseHandler):
+    def handle(self, consulta: ObtenerVersionTiposDeProductoConsulta) -> QueryResultado:
+        repositorio = self.fabrica_repositorio.crear_objeto(RepositorioTipoProductoConsulta)
+        ultima_modificacion, cantidad = repositorio.obtener_version()
+        return QueryResultado(resultado={'ultima_modificacion': ultima_modificacion, 'cantidad': cantidad})
+
+@ejecutar_consulta.register
+def _(consulta: ObtenerVersionTiposDeProductoConsulta):
+    handler = ObtenerVersionTiposDeProductoHandler()
+    return handler.handle(consulta)
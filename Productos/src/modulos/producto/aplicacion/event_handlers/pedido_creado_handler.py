@@ -3,12 +3,17 @@ Handler para el evento PedidoCreado que actualiza el stock de productos
 """
 
 import logging
-from typing import Dict, Any
-from seedwork.aplicacion.eventos import ejecutar_evento
+import uuid
+from typing import Dict, Any, List
+from seedwork.aplicacion.eventos import ejecutar_evento, registrar_manejador_lote
 from seedwork.dominio.eventos import EventoDominio
 from modulos.producto.dominio.eventos_externos import PedidoCreado
 from modulos.producto.aplicacion.comandos.actualizar_stock_producto import ActualizarStockProducto, ActualizarStockProductoHandler
+from modulos.producto.aplicacion.comandos.reservar_stock import ConfirmarReserva, ConfirmarReservaHandler
+from modulos.producto.dominio.excepciones import ReservaNoActivaExcepcion, ReservaNoEncontradaExcepcion
 from modulos.producto.dominio.repositorios import RepositorioProducto
+from modulos.producto.dominio.repositorios_comando import RepositorioProductoComando
+from modulos.producto.infraestructura.fabrica import FabricaRepositorio
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +47,11 @@ class PedidoCreadoHandler:
                 logger.warning(f"⚠️ Pedido {datos_evento.get('pedido_id')} no tiene items")
                 return
             
+            # Si Ventas reservó el stock al crear el pedido basta con confirmar la reserva
+            if getattr(evento, 'reserva_id', None) and self._confirmar_reserva(evento.reserva_id):
+                logger.info(f"✅ Reserva {evento.reserva_id} confirmada para pedido {datos_evento.get('pedido_id')}")
+                return
+            
             # Actualizar stock para cada producto
             for item_info in items_info:
                 producto_id = item_info.get('producto_id')
@@ -73,8 +83,88 @@ class PedidoCreadoHandler:
         except Exception as e:
             logger.error(f"❌ Error procesando evento PedidoCreado: {e}")
 
+    def _confirmar_reserva(self, reserva_id) -> bool:
+        """Confirma la reserva del pedido; retorna False si ya no existe o expiró, para descontar el stock directamente"""
+        try:
+            ConfirmarReservaHandler().handle(ConfirmarReserva(reserva_id=reserva_id))
+            return True
+        except (ReservaNoActivaExcepcion, ReservaNoEncontradaExcepcion) as e:
+            logger.warning(f"⚠️ {e}; se descuenta el stock del pedido directamente")
+            return False
+
 @ejecutar_evento.register(PedidoCreado)
 def _(evento: PedidoCreado):
     """Registra el handler para eventos PedidoCreado"""
     handler = PedidoCreadoHandler()
     handler.handle(evento)
+
+
+class PedidoCreadoLoteHandler:
+    """Handler por lotes: agrega las cantidades de varios pedidos por producto y las descuenta en una sola transacción"""
+    
+    def __init__(self):
+        self._fabrica_repositorio = FabricaRepositorio()
+    
+    @property
+    def repositorio_producto(self):
+        """Obtiene el repositorio de comandos de productos"""
+        return self._fabrica_repositorio.crear_objeto(RepositorioProductoComando)
+    
+    def handle(self, eventos: List[PedidoCreado]) -> List[bool]:
+        """Retorna por evento True (ack) o False (nack). Los pedidos rechazados por datos inválidos o stock
+        insuficiente se confirman, igual que en el procesamiento individual, porque reintentarlos no cambia
+        el resultado; solo se hace nack de los pedidos que fallaron por un error al aplicarlos."""
+        try:
+            # Los pedidos con reserva activa ya descontaron su stock: se confirman todas con un solo UPDATE
+            reserva_ids = [evento.reserva_id for evento in eventos if evento.reserva_id]
+            anteriores = self.repositorio_producto.confirmar_reservas(reserva_ids) if reserva_ids else {}
+            sin_reserva = [
+                evento for evento in eventos
+                if anteriores.get(evento.reserva_id) not in ('ACTIVA', 'CONFIRMADA')
+            ]
+            if len(sin_reserva) < len(eventos):
+                logger.info(f"✅ {len(eventos) - len(sin_reserva)} pedidos con reserva confirmada")
+            
+            # Descontar no es idempotente: los eventos quedan procesados en la misma transacción del descuento
+            pedidos = [self._cantidades_por_producto(evento) for evento in sin_reserva]
+            aplicados = self.repositorio_producto.descontar_stock_pedidos(
+                pedidos, [evento.id for evento in sin_reserva]
+            ) if pedidos else []
+            if sin_reserva:
+                self._registrar_resultados(sin_reserva, aplicados)
+            return [True] * len(eventos)
+        except Exception as e:
+            if len(eventos) == 1:
+                logger.error(f"❌ Error aplicando pedido {eventos[0].pedido_id}: {e}")
+                return [False]
+            # Se reintenta pedido por pedido para que un solo pedido problemático no devuelva todo el lote
+            logger.warning(f"⚠️ Error aplicando lote de {len(eventos)} pedidos, se reintenta uno por uno: {e}")
+            return [self.handle([evento])[0] for evento in eventos]
+    
+    def _cantidades_por_producto(self, evento: PedidoCreado) -> Dict[uuid.UUID, int]:
+        """Suma las cantidades del pedido por producto; un item inválido invalida el pedido completo (mapa vacío)"""
+        cantidades = {}
+        for item_info in evento.items_info or []:
+            try:
+                producto_id = uuid.UUID(str(item_info.get('producto_id')))
+                cantidad = int(item_info.get('cantidad', 0))
+            except (TypeError, ValueError):
+                logger.warning(f"⚠️ Item inválido en pedido {evento.pedido_id}: {item_info}")
+                return {}
+            if cantidad <= 0:
+                logger.warning(f"⚠️ Item inválido en pedido {evento.pedido_id}: {item_info}")
+                return {}
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+        return cantidades
+    
+    def _registrar_resultados(self, eventos: List[PedidoCreado], aplicados: List[bool]):
+        rechazados = [str(evento.pedido_id) for evento, aplicado in zip(eventos, aplicados) if not aplicado]
+        logger.info(f"✅ Lote de {len(eventos)} pedidos procesado: {len(eventos) - len(rechazados)} aplicados")
+        if rechazados:
+            logger.warning(f"⚠️ Pedidos sin stock suficiente o con productos inexistentes: {rechazados}")
+
+@registrar_manejador_lote(PedidoCreado)
+def _(eventos: List[PedidoCreado]) -> List[bool]:
+    """Registra el handler por lotes para eventos PedidoCreado"""
+    handler = PedidoCreadoLoteHandler()
+    return handler.handle(eventos)
@@ -0,0 +1,19 @@
+"""
+Manejador local del evento ProductoStockActualizado que invalida el cache de productos
+"""
+
+import logging
+from seedwork.dominio.eventos import ManejadorEvento, despachador_eventos
+from modulos.producto.dominio.eventos import ProductoStockActualizado
+from modulos.producto.infraestructura.cache import invalidar_producto
+
+logger = logging.getLogger(__name__)
+
+class InvalidarCacheProductoHandler(ManejadorEvento):
+    """Invalida la entrada en cache del producto cuyo stock cambió"""
+
+    def manejar(self, evento: ProductoStockActualizado):
+        invalidar_producto(evento.producto_id)
+        logger.debug(f"Cache invalidado para producto {evento.producto_id}")
+
+despachador_eventos.registrar_manejador(ProductoStockActualizado.__name__, InvalidarCacheProductoHandler())
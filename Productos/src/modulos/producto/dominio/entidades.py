@@ -3,7 +3,6 @@ from datetime import datetime
 from seedwork.dominio.entidades import Entidad, AgregacionRaiz
 from .objetos_valor import Nombre, Descripcion, Precio, Stock, Marca, Lote
 from .eventos import ProductoCreado, ProductoStockActualizado
-from seedwork.dominio.eventos import despachador_eventos
 
 @dataclass
 class TipoProducto(Entidad):    
@@ -36,8 +35,8 @@ class Producto(AgregacionRaiz):
             lote=self.lote.codigo,
             tipo_producto_id=self.tipo.id if self.tipo and self.tipo.id else None
         )
-        print(f"Disparando evento de creación del producto: {evento}")
-        despachador_eventos.publicar_evento(evento)
+        print(f"Registrando evento de creación del producto: {evento}")
+        self.agregar_evento(evento)
     
     def actualizar_stock(self, nuevo_stock: int, motivo: str = "Actualización manual"):
         """Actualiza el stock y dispara evento"""
@@ -50,4 +49,4 @@ class Producto(AgregacionRaiz):
             stock_nuevo=nuevo_stock,
             motivo=motivo
         )
-        despachador_eventos.publicar_evento(evento)
\ No newline at end of file
+        self.agregar_evento(evento)
\ No newline at end of file
@@ -4,13 +4,16 @@ Eventos externos que este servicio necesita procesar
 
 from seedwork.dominio.eventos import EventoDominio
 from dataclasses import dataclass, field
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import uuid
 from datetime import datetime
 from enum import Enum
 
 class EstadoPedido(Enum):
     PENDIENTE = "PENDIENTE"
+    # Estados con los que Ventas publica PedidoCreado al aprobar o rechazar un pedido
+    APROBADO = "APROBADO"
+    RECHAZADO = "RECHAZADO"
     CONFIRMADO = "CONFIRMADO"
     ENVIADO = "ENVIADO"
     ENTREGADO = "ENTREGADO"
@@ -25,10 +28,13 @@ class PedidoCreado(EventoDominio):
     estado: EstadoPedido = field(default=EstadoPedido.PENDIENTE)
     items_info: List[Dict[str, Any]] = field(default_factory=list)
     total: float = field(default=0.0)
+    # Reserva de stock hecha por Ventas al crear el pedido; si existe, el stock ya está descontado
+    reserva_id: Optional[uuid.UUID] = field(default=None)
 
     def _get_datos_evento(self) -> Dict[str, Any]:
         return {
             'pedido_id': str(self.pedido_id),
+            'reserva_id': str(self.reserva_id) if self.reserva_id else None,
             'cliente_id': str(self.cliente_id),
             'fecha_pedido': self.fecha_pedido.isoformat() if self.fecha_pedido else None,
             'estado': self.estado.value if hasattr(self.estado, 'value') else str(self.estado),
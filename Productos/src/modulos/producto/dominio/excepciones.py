@@ -0,0 +1,42 @@
+""" Excepciones del dominio de productos
+
+En este archivo usted encontrará las Excepciones relacionadas
+a la capa de dominio de productos
+
+"""
+
+from seedwork.dominio.excepciones import ExcepcionDominio
+import uuid
+
+class StockInsuficienteExcepcion(ExcepcionDominio):
+    def __init__(self, producto_id: uuid.UUID, solicitado: int, disponible: int):
+        self.producto_id = producto_id
+        self.solicitado = solicitado
+        self.disponible = disponible
+        self.__mensaje = (
+            f"Stock insuficiente para producto {producto_id}. "
+            f"Disponible: {disponible}, Solicitado: {solicitado}"
+        )
+        super().__init__(self.__mensaje)
+
+    def __str__(self):
+        return str(self.__mensaje)
+
+class ReservaNoEncontradaExcepcion(ExcepcionDominio):
+    def __init__(self, reserva_id: uuid.UUID):
+        self.reserva_id = reserva_id
+        self.__mensaje = f"Reserva con ID {reserva_id} no encontrada"
+        super().__init__(self.__mensaje)
+
+    def __str__(self):
+        return str(self.__mensaje)
+
+class ReservaNoActivaExcepcion(ExcepcionDominio):
+    def __init__(self, reserva_id: uuid.UUID, estado: str):
+        self.reserva_id = reserva_id
+        self.estado = estado
+        self.__mensaje = f"La reserva {reserva_id} no está activa (estado: {estado})"
+        super().__init__(self.__mensaje)
+
+    def __str__(self):
+        return str(self.__mensaje)
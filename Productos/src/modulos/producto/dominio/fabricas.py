@@ -16,14 +16,31 @@ class FabricaProducto(Fabrica):
             print( "Fabricando producto: ", obj)
             
             producto: Producto = mapeador.dto_a_entidad(obj)
-            self.validar_regla(NombreProductoNoPuedeSerVacio(producto.nombre))
-            self.validar_regla(DescripcionProductoNoPuedeSerVacio(producto.descripcion))
-            self.validar_regla(PrecioProductoNoPuedeSerVacio(producto.precio))
-            self.validar_regla(PrecioProductoNoPuedeSerMenorACero(producto.precio))
-            self.validar_regla(PrecioProductoDebeSerNumerico(producto.precio))
+            self._validar_reglas(producto)
                         
             return producto
 
+    def crear_objetos(self, objs: list, mapeador: Mapeador, tipos: dict = None) -> tuple[list, list]:
+        """Fabrica un lote de productos aplicando las mismas reglas que crear_objeto, sin detenerse en el
+        primer error; retorna (productos válidos, [(índice, mensaje)] de los rechazados)"""
+        productos, errores = [], []
+        for indice, obj in enumerate(objs):
+            try:
+                tipo = tipos.get(obj.tipo_producto_id) if tipos is not None else None
+                producto: Producto = mapeador.dto_a_entidad(obj, tipo)
+                self._validar_reglas(producto)
+                productos.append(producto)
+            except Exception as e:
+                errores.append((indice, str(e)))
+        return productos, errores
+
+    def _validar_reglas(self, producto: Producto):
+        self.validar_regla(NombreProductoNoPuedeSerVacio(producto.nombre))
+        self.validar_regla(DescripcionProductoNoPuedeSerVacio(producto.descripcion))
+        self.validar_regla(PrecioProductoNoPuedeSerVacio(producto.precio))
+        self.validar_regla(PrecioProductoNoPuedeSerMenorACero(producto.precio))
+        self.validar_regla(PrecioProductoDebeSerNumerico(producto.precio))
+
 @dataclass
 class FabricaTipoProducto(Fabrica):
     def crear_objeto(self, obj: any, mapeador: Mapeador) -> any:
@@ -0,0 +1,19 @@
+# src/modulos/producto/infraestructura/cache.py
+"""Cache en memoria de productos serializados para el lado de consultas
+
+Las entradas se invalidan cuando el repositorio de comandos sincroniza un
+producto hacia la base de consultas o cuando se recibe ProductoStockActualizado.
+El TTL acota la obsolescencia entre réplicas, que no comparten este cache.
+"""
+
+import os
+from seedwork.infraestructura.cache import CacheLRU
+
+cache_productos = CacheLRU(
+    capacidad=int(os.getenv('CACHE_PRODUCTOS_CAPACIDAD', '10000')),
+    ttl_segundos=float(os.getenv('CACHE_PRODUCTOS_TTL_SEGUNDOS', '30'))
+)
+
+def invalidar_producto(producto_id):
+    """Invalida la entrada en cache de un producto"""
+    cache_productos.invalidar(str(producto_id))
@@ -0,0 +1,76 @@
+# src/modulos/producto/infraestructura/conciliacion.py
+"""Conciliación periódica de los contadores de productos por tipo
+
+En este archivo usted encontrará el job que verifica en bloque, con un único
+UPDATE ... FROM sobre un GROUP BY de productos_view, que
+tipos_productos_view.cantidad_productos coincida con los productos reales,
+y corrige solo los tipos desviados.
+
+"""
+
+from modulos.producto.infraestructura.dto_postgres import (
+    ProductoConsulta as ProductoConsultaModelo,
+    TipoProductoConsulta as TipoProductoConsultaModelo
+)
+from config.config.db_postgres import db
+import threading
+import time
+import os
+
+def conciliar_cantidad_productos(tipo_producto_ids: list = None) -> int:
+    """Recuenta los productos de cada tipo y corrige los contadores desviados; retorna cuántos se corrigieron.
+    Si se indican tipo_producto_ids solo se verifican esos tipos."""
+    tipos = TipoProductoConsultaModelo.__table__
+    productos = ProductoConsultaModelo.__table__
+    reales = (
+        db.select(tipos.c.id.label('tipo_id'), db.func.count(productos.c.id).label('cantidad'))
+        .select_from(tipos.outerjoin(productos, productos.c.tipo_producto_id == tipos.c.id))
+        .group_by(tipos.c.id)
+    )
+    if tipo_producto_ids is not None:
+        reales = reales.where(tipos.c.id.in_(tipo_producto_ids))
+    reales = reales.subquery('reales')
+
+    # Un único UPDATE ... FROM (SELECT ... GROUP BY) en REPEATABLE READ: el recuento y la corrección usan la
+    # misma instantánea, y si otra transacción cambió el contador de un tipo después de tomarla la sentencia
+    # falla por serialización en lugar de pisarlo con un valor viejo; ese tipo se corrige en la siguiente ronda
+    sentencia = (
+        db.update(tipos)
+        .where(tipos.c.id == reales.c.tipo_id)
+        .where(tipos.c.cantidad_productos.is_distinct_from(reales.c.cantidad))
+        .values(cantidad_productos=reales.c.cantidad)
+        .returning(tipos.c.id, tipos.c.cantidad_productos)
+    )
+    try:
+        with db.engines['queries'].connect().execution_options(isolation_level='REPEATABLE READ') as conexion:
+            with conexion.begin():
+                corregidos = conexion.execute(sentencia).all()
+    except Exception as e:
+        print(f"[CONCILIACION] Error conciliando contadores de productos: {e}")
+        return 0
+
+    for tipo_id, cantidad in corregidos:
+        print(f"[CONCILIACION] Tipo {tipo_id}: contador corregido a {cantidad}")
+    print(f"[CONCILIACION] ✅ {len(corregidos)} contadores corregidos")
+    return len(corregidos)
+
+def iniciar_conciliacion_periodica(app) -> threading.Thread:
+    """Inicia un hilo que concilia los contadores cada CONCILIACION_INTERVALO_SEGUNDOS (0 lo deshabilita)"""
+    intervalo = float(os.getenv('CONCILIACION_INTERVALO_SEGUNDOS', '300'))
+    if intervalo <= 0:
+        print("[CONCILIACION] Conciliación periódica deshabilitada")
+        return None
+
+    def ejecutar():
+        while True:
+            time.sleep(intervalo)
+            with app.app_context():
+                try:
+                    conciliar_cantidad_productos()
+                finally:
+                    db.session.remove()
+
+    hilo = threading.Thread(target=ejecutar, name='conciliacion-cantidad-productos', daemon=True)
+    hilo.start()
+    print(f"[CONCILIACION] Conciliación periódica iniciada cada {intervalo} segundos")
+    return hilo
@@ -37,6 +37,11 @@ class ProductoComando(db.Model):
     
     # Relación con tipo de producto
     tipo_producto = db.relationship('TipoProductoComando', back_populates='productos')
+    
+    # Índice para la proyección incremental por marca de agua (updated_at, id)
+    __table_args__ = (
+        db.Index('idx_producto_comando_actualizacion', 'updated_at', 'id'),
+    )
 
 # =============================================================================
 # MODELOS PARA CONSULTAS (Base de datos denormalizada - productos_queries)
@@ -70,6 +75,13 @@ class ProductoConsulta(db.Model):
         db.Index('idx_producto_stock', 'stock'),
         db.Index('idx_producto_nombre', 'nombre'),
         db.Index('idx_producto_marca', 'marca'),
+        # Paginación por keyset: filtro + orden por id sin ordenar en memoria
+        db.Index('idx_producto_tipo_id', 'tipo_producto_id', 'id'),
+        db.Index('idx_producto_marca_id', 'marca', 'id'),
+        db.Index('idx_producto_nombre_id', 'nombre', 'id'),
+        db.Index('idx_producto_stock_id', 'stock', 'id'),
+        # Filtro por prefijo de nombre (LIKE 'abc%') independiente del collation
+        db.Index('idx_producto_nombre_prefijo', 'nombre', postgresql_ops={'nombre': 'text_pattern_ops'}),
     )
 
 class TipoProductoConsulta(db.Model):
@@ -84,4 +96,86 @@ class TipoProductoConsulta(db.Model):
     updated_at = db.Column(db.DateTime)
     
     # Campo calculado: cantidad de productos de este tipo
-    cantidad_productos = db.Column(db.Integer, default=0)
\ No newline at end of file
+    cantidad_productos = db.Column(db.Integer, default=0)
+
+
+class ProyeccionCheckpoint(db.Model):
+    """Marca de agua (updated_at, id) hasta la que se proyectó cada tabla de comandos a consultas"""
+    __tablename__ = 'proyeccion_checkpoints'
+    __bind_key__ = 'queries'
+    
+    nombre = db.Column(db.String(100), primary_key=True)
+    ultima_actualizacion = db.Column(db.DateTime)
+    ultimo_id = db.Column(db.UUID(as_uuid=True))
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+
+# =============================================================================
+# OUTBOX DE EVENTOS (Base de datos de comandos)
+# =============================================================================
+
+class EventoOutbox(db.Model):
+    """Evento de dominio pendiente de publicar, escrito en la misma transacción que el agregado"""
+    __tablename__ = 'outbox_eventos'
+    __bind_key__ = 'commands'
+    
+    secuencia = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    evento_id = db.Column(db.UUID(as_uuid=True), nullable=False, unique=True)
+    tipo_evento = db.Column(db.String(255), nullable=False)
+    agregado_id = db.Column(db.UUID(as_uuid=True))
+    payload = db.Column(db.Text, nullable=False)
+    creado_en = db.Column(db.DateTime, default=db.func.now())
+    publicado_en = db.Column(db.DateTime)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    ultimo_error = db.Column(db.Text)
+    estacionado_en = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('idx_outbox_pendientes', 'secuencia', postgresql_where=db.text('publicado_en IS NULL AND estacionado_en IS NULL')),
+        db.Index('idx_outbox_publicado_en', 'publicado_en'),
+    )
+
+# =============================================================================
+# RESERVAS DE STOCK (Base de datos de comandos)
+# =============================================================================
+
+class ReservaStock(db.Model):
+    """Stock apartado para un pedido: se descuenta al reservar y se repone si la reserva se libera o expira"""
+    __tablename__ = 'reservas_stock'
+    __bind_key__ = 'commands'
+    
+    id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    pedido_id = db.Column(db.UUID(as_uuid=True))
+    estado = db.Column(db.String(20), nullable=False, default='ACTIVA')
+    # Lista de {"producto_id", "cantidad"} necesaria para reponer el stock
+    items = db.Column(db.JSON, nullable=False)
+    expira_en = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+    
+    __table_args__ = (
+        db.Index('idx_reserva_activa_expiracion', 'expira_en', postgresql_where=db.text("estado = 'ACTIVA'")),
+        db.Index('idx_reserva_pedido', 'pedido_id'),
+        # Un pedido tiene a lo sumo una reserva activa: los reintentos de Ventas la reutilizan
+        db.Index('uq_reserva_activa_pedido', 'pedido_id', unique=True,
+                 postgresql_where=db.text("estado = 'ACTIVA' AND pedido_id IS NOT NULL")),
+    )
+
+# =============================================================================
+# EVENTOS PROCESADOS (Base de datos de comandos)
+# =============================================================================
+
+class EventoProcesado(db.Model):
+    """Evento consumido, identificado por EventoDominio.id, para descartar reentregas de Pub/Sub"""
+    __tablename__ = 'eventos_procesados'
+    __bind_key__ = 'commands'
+    
+    evento_id = db.Column(db.UUID(as_uuid=True), primary_key=True)
+    tipo_evento = db.Column(db.String(255))
+    # EN_PROCESO mientras corre el manejador, PROCESADO cuando terminó
+    estado = db.Column(db.String(20), nullable=False, default='EN_PROCESO')
+    reclamado_en = db.Column(db.DateTime, nullable=False)
+    procesado_en = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('idx_eventos_procesados_reclamado_en', 'reclamado_en'),
+    )
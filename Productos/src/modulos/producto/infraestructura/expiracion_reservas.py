@@ -0,0 +1,50 @@
+# src/modulos/producto/infraestructura/expiracion_reservas.py
+"""Expiración de reservas de stock
+
+En este archivo usted encontrará el proceso periódico que devuelve al inventario el
+stock de las reservas que vencieron sin confirmarse ni liberarse.
+
+"""
+
+from config.config.db_postgres import db
+import os
+import threading
+import time
+
+def expirar_reservas_vencidas(tamano_lote: int = 500) -> int:
+    """Expira por lotes todas las reservas activas vencidas; retorna cuántas se expiraron"""
+    from modulos.producto.infraestructura.repositorios import RepositorioProductoComandoPostgreSQL
+    repositorio = RepositorioProductoComandoPostgreSQL()
+    total = 0
+    try:
+        while True:
+            expiradas = repositorio.expirar_reservas(tamano_lote)
+            total += expiradas
+            if expiradas < tamano_lote:
+                break
+        if total:
+            print(f"[RESERVAS] ✅ {total} reservas vencidas expiradas, stock repuesto")
+    except Exception as e:
+        print(f"[RESERVAS] Error expirando reservas: {e}")
+    return total
+
+def iniciar_expiracion_reservas(app) -> threading.Thread:
+    """Inicia un hilo que expira las reservas vencidas cada RESERVA_EXPIRACION_INTERVALO_SEGUNDOS (0 lo deshabilita)"""
+    intervalo = float(os.getenv('RESERVA_EXPIRACION_INTERVALO_SEGUNDOS', '30'))
+    if intervalo <= 0:
+        print("[RESERVAS] Expiración de reservas deshabilitada")
+        return None
+
+    def ejecutar():
+        while True:
+            time.sleep(intervalo)
+            with app.app_context():
+                try:
+                    expirar_reservas_vencidas()
+                finally:
+                    db.session.remove()
+
+    hilo = threading.Thread(target=ejecutar, name='expiracion-reservas', daemon=True)
+    hilo.start()
+    print(f"[RESERVAS] Expiración de reservas iniciada cada {intervalo} segundos")
+    return hilo
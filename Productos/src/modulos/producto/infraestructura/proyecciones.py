@@ -0,0 +1,145 @@
+# src/modulos/producto/infraestructura/proyecciones.py
+"""Proyecciones de lectura para el lado de consultas (CQRS)
+
+En este archivo usted encontrará las proyecciones que leen solo las columnas
+necesarias de productos_view con SQLAlchemy Core y las serializan directamente
+al formato JSON externo, sin pasar por entidades de dominio ni DTOs.
+
+"""
+
+from modulos.producto.infraestructura.dto_postgres import ProductoConsulta as ProductoConsultaModelo
+from config.config.db_postgres import db
+from sqlalchemy import select
+from uuid import UUID
+from datetime import datetime
+import base64
+import json
+
+def codificar_cursor(ultimo_id: UUID) -> str:
+    """Genera un token opaco de continuación a partir del último id entregado"""
+    contenido = json.dumps({'id': str(ultimo_id)}).encode('utf-8')
+    return base64.urlsafe_b64encode(contenido).decode('ascii')
+
+def decodificar_cursor(cursor: str) -> UUID:
+    """Obtiene el último id entregado a partir de un token de continuación"""
+    try:
+        contenido = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        return UUID(json.loads(contenido)['id'])
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
+
+class ProyeccionProductoJson:
+    """Proyección de productos_view al formato JSON externo de la API"""
+
+    def __init__(self):
+        tabla = ProductoConsultaModelo.__table__
+        self._tabla = tabla
+        # El orden de las columnas debe coincidir con fila_a_externo
+        self._columnas = (
+            tabla.c.id,
+            tabla.c.nombre,
+            tabla.c.descripcion,
+            tabla.c.precio,
+            tabla.c.stock,
+            tabla.c.marca,
+            tabla.c.lote,
+            tabla.c.tipo_producto_id
+        )
+
+    @staticmethod
+    def fila_a_externo(fila) -> dict:
+        """Convierte una fila de la proyección al mismo formato que MapeadorProductoDTOJson.dto_a_externo"""
+        id, nombre, descripcion, precio, stock, marca, lote, tipo_producto_id = fila
+        return {
+            'id': str(id),
+            'nombre': nombre,
+            'descripcion': descripcion,
+            'precio': float(precio) if precio is not None else None,
+            'stock': stock,
+            'marca': marca,
+            'lote': lote,
+            'tipo_producto_id': str(tipo_producto_id) if tipo_producto_id else None
+        }
+
+    def _select(self):
+        return select(*self._columnas)
+
+    def _ejecutar(self, consulta, **execution_options):
+        # Flask-SQLAlchemy no resuelve el bind de un SELECT de Core; se indica con el modelo
+        return db.session.execute(
+            consulta,
+            execution_options=execution_options,
+            bind_arguments={'mapper': ProductoConsultaModelo}
+        )
+
+    def obtener_por_id(self, id: UUID) -> dict:
+        """Obtiene un producto por ID en formato externo, o None si no existe"""
+        print(f"[PROYECCION] Obteniendo producto por ID: {id}")
+        fila = self._ejecutar(self._select().where(self._tabla.c.id == id)).first()
+        return self.fila_a_externo(fila) if fila else None
+
+    def obtener_por_id_con_fecha(self, id: UUID) -> tuple[dict, datetime]:
+        """Obtiene un producto por ID en formato externo junto con su fecha de actualización"""
+        print(f"[PROYECCION] Obteniendo producto por ID: {id}")
+        fila = self._ejecutar(
+            select(*self._columnas, self._tabla.c.updated_at).where(self._tabla.c.id == id)
+        ).first()
+        if not fila:
+            return None, None
+        return self.fila_a_externo(fila[:-1]), fila[-1]
+
+    def obtener_por_ids(self, ids: list[UUID]) -> dict[str, dict]:
+        """Obtiene varios productos en una sola consulta, como mapa id -> producto en formato externo"""
+        print(f"[PROYECCION] Obteniendo {len(ids)} productos por ID")
+        if not ids:
+            return {}
+        # Un único parámetro expandido sobre la llave primaria (id IN ...), sin una consulta por producto
+        filas = self._ejecutar(self._select().where(self._tabla.c.id.in_(ids))).all()
+        return {str(fila[0]): self.fila_a_externo(fila) for fila in filas}
+
+    def obtener_todos(self) -> list[dict]:
+        """Obtiene todos los productos en formato externo"""
+        print(f"[PROYECCION] Obteniendo todos los productos")
+        filas = self._ejecutar(self._select()).all()
+        return [self.fila_a_externo(fila) for fila in filas]
+
+    def iterar_todos(self, tamano_lote: int = 1000):
+        """Recorre todos los productos con un cursor del lado del servidor, sin materializar la tabla"""
+        print(f"[PROYECCION] Exportando productos en lotes de {tamano_lote}")
+        resultado = self._ejecutar(self._select().order_by(self._tabla.c.id), yield_per=tamano_lote)
+        for fila in resultado:
+            yield self.fila_a_externo(fila)
+
+    def obtener_paginados(self, limite: int, cursor: str = None, tipo_producto_id: UUID = None,
+                          marca: str = None, nombre_prefijo: str = None,
+                          stock_min: int = None, stock_max: int = None) -> tuple[list[dict], str]:
+        """Obtiene una página de productos usando paginación por cursor (keyset) sobre el id"""
+        print(f"[PROYECCION] Obteniendo página de productos (limite={limite})")
+        tabla = self._tabla
+        consulta = self._select()
+
+        # Los filtros se apoyan en los índices idx_producto_*_id (filtro, id) y idx_producto_nombre_prefijo
+        if tipo_producto_id:
+            consulta = consulta.where(tabla.c.tipo_producto_id == tipo_producto_id)
+        if marca:
+            consulta = consulta.where(tabla.c.marca == marca)
+        if nombre_prefijo:
+            consulta = consulta.where(tabla.c.nombre.startswith(nombre_prefijo, autoescape=True))
+        if stock_min is not None:
+            consulta = consulta.where(tabla.c.stock >= stock_min)
+        if stock_max is not None:
+            consulta = consulta.where(tabla.c.stock <= stock_max)
+
+        # Keyset: continuar después del último id entregado (índice de la llave primaria)
+        if cursor:
+            consulta = consulta.where(tabla.c.id > decodificar_cursor(cursor))
+
+        # Se pide un registro adicional para saber si existe una página siguiente
+        filas = self._ejecutar(consulta.order_by(tabla.c.id).limit(limite + 1)).all()
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+
+        productos = [self.fila_a_externo(fila) for fila in filas]
+        siguiente_cursor = codificar_cursor(filas[-1][0]) if hay_mas else None
+        print(f"[PROYECCION] Página con {len(productos)} productos, hay más: {hay_mas}")
+        return productos, siguiente_cursor
@@ -13,11 +13,31 @@ from modulos.producto.infraestructura.dto_postgres import (
     ProductoComando as ProductoComandoModelo, 
     TipoProductoComando as TipoProductoComandoModelo,
     ProductoConsulta as ProductoConsultaModelo,
-    TipoProductoConsulta as TipoProductoConsultaModelo
+    TipoProductoConsulta as TipoProductoConsultaModelo,
+    EventoOutbox as EventoOutboxModelo,
+    EventoProcesado as EventoProcesadoModelo,
+    ReservaStock as ReservaStockModelo
 )
+from modulos.producto.infraestructura.cache import invalidar_producto
+from modulos.producto.dominio.excepciones import StockInsuficienteExcepcion, ReservaNoEncontradaExcepcion
+from seedwork.infraestructura.outbox import registrar_eventos_outbox
+from seedwork.infraestructura.eventos_procesados import completar_eventos_procesados
 from config.config.db_postgres import db
+from sqlalchemy import column, values, Integer, DateTime, Uuid
+from datetime import datetime
 from uuid import UUID
 
+def ajustar_cantidad_productos(tipo_producto_id: UUID, delta: int):
+    """Suma delta al contador de productos de un tipo con un UPDATE atómico, sin recontar la tabla"""
+    if not tipo_producto_id or not delta:
+        return
+    db.session.execute(
+        db.update(TipoProductoConsultaModelo)
+        .where(TipoProductoConsultaModelo.id == tipo_producto_id)
+        .values(cantidad_productos=db.func.coalesce(TipoProductoConsultaModelo.cantidad_productos, 0) + delta)
+        .execution_options(synchronize_session=False)
+    )
+
 # =============================================================================
 # CLASES BASE ORIGINALES (Para compatibilidad con código existente)
 # =============================================================================
@@ -77,6 +97,8 @@ class RepositorioProductoComandoPostgreSQL(RepositorioProductoComando):
         )
         
         db.session.add(producto_modelo)
+        # Los eventos del producto se guardan en el outbox en la misma transacción
+        registrar_eventos_outbox(db.session, EventoOutboxModelo, producto)
         db.session.commit()
         
         # Sincronizar a la base de consultas
@@ -84,6 +106,63 @@ class RepositorioProductoComandoPostgreSQL(RepositorioProductoComando):
         
         print(f"[COMANDO-POSTGRES] Producto agregado exitosamente: {producto.id}")
 
+    def agregar_masivo(self, productos: list[Producto]) -> bool:
+        """Inserta un lote de productos con un INSERT de múltiples filas y lo proyecta a consultas en bloque.
+        Los tipos de producto deben existir previamente. Retorna False si el lote no se pudo proyectar."""
+        if not productos:
+            return True
+        print(f"[COMANDO-POSTGRES] Agregando lote de {len(productos)} productos")
+        filas = [{
+            'id': producto.id,
+            'nombre': producto.nombre.nombre,
+            'descripcion': producto.descripcion.descripcion,
+            'precio': producto.precio.precio,
+            'stock': producto.stock.stock,
+            'marca': producto.marca.nombre,
+            'lote': producto.lote.codigo,
+            'tipo_producto_id': producto.tipo.id
+        } for producto in productos]
+
+        # SQLAlchemy agrupa las filas en INSERT ... VALUES (...), (...) y retorna las fechas asignadas por la base
+        fechas = db.session.execute(
+            db.insert(ProductoComandoModelo).returning(
+                ProductoComandoModelo.id, ProductoComandoModelo.created_at, ProductoComandoModelo.updated_at
+            ),
+            filas
+        ).all()
+        db.session.commit()
+
+        proyectado = self._sync_masivo_to_queries(productos, filas, {id: (creado, actualizado) for id, creado, actualizado in fechas})
+        print(f"[COMANDO-POSTGRES] Lote de {len(productos)} productos agregado exitosamente")
+        return proyectado
+
+    def _sync_masivo_to_queries(self, productos: list[Producto], filas: list[dict], fechas: dict) -> bool:
+        """Proyecta un lote de productos a productos_view y ajusta los contadores una vez por tipo"""
+        try:
+            filas_consulta = []
+            cantidades_por_tipo = {}
+            for producto, fila in zip(productos, filas):
+                created_at, updated_at = fechas.get(fila['id'], (None, None))
+                filas_consulta.append(dict(
+                    fila,
+                    tipo_producto_nombre=producto.tipo.nombre.nombre,
+                    tipo_producto_descripcion=producto.tipo.descripcion.descripcion,
+                    created_at=created_at,
+                    updated_at=updated_at
+                ))
+                cantidades_por_tipo[producto.tipo.id] = cantidades_por_tipo.get(producto.tipo.id, 0) + 1
+
+            db.session.execute(db.insert(ProductoConsultaModelo), filas_consulta)
+            for tipo_producto_id, cantidad in cantidades_por_tipo.items():
+                ajustar_cantidad_productos(tipo_producto_id, cantidad)
+            db.session.commit()
+            print(f"[SYNC] ✅ Lote de {len(filas_consulta)} productos proyectado a consultas")
+            return True
+        except Exception as e:
+            print(f"[SYNC] Error sincronizando lote de productos: {e}")
+            db.session.rollback()
+            return False
+
     def _sync_to_queries(self, producto_comando: ProductoComandoModelo, tipo_producto_comando: TipoProductoComandoModelo):
         """Sincroniza un producto de comandos a consultas"""
         print(f"[SYNC] Iniciando sincronización para producto {producto_comando.id} con stock {producto_comando.stock}")
@@ -104,6 +183,7 @@ class RepositorioProductoComandoPostgreSQL(RepositorioProductoComando):
             # Verificar si el producto ya existe en consultas
             producto_consulta = ProductoConsultaModelo.query.filter_by(id=producto_comando.id).first()
             if producto_consulta:
+                tipo_anterior_id = producto_consulta.tipo_producto_id
                 # Actualizar producto existente
                 producto_consulta.nombre = producto_comando.nombre
                 producto_consulta.descripcion = producto_comando.descripcion
@@ -116,6 +196,12 @@ class RepositorioProductoComandoPostgreSQL(RepositorioProductoComando):
                 producto_consulta.tipo_producto_descripcion = tipo_producto_comando.descripcion
                 producto_consulta.updated_at = producto_comando.updated_at
                 print(f"[SYNC] Producto actualizado en consultas: {producto_comando.id}")
+
+                # Si el producto cambió de tipo se mueve una unidad entre los contadores
+                if tipo_anterior_id != producto_comando.tipo_producto_id:
+                    db.session.flush()
+                    ajustar_cantidad_productos(tipo_anterior_id, -1)
+                    ajustar_cantidad_productos(producto_comando.tipo_producto_id, 1)
             else:
                 # Crear nuevo producto en consultas
                 producto_consulta = ProductoConsultaModelo(
@@ -133,17 +219,19 @@ class RepositorioProductoComandoPostgreSQL(RepositorioProductoComando):
                     updated_at=producto_comando.updated_at
                 )
                 db.session.add(producto_consulta)
+                db.session.flush()
+                ajustar_cantidad_productos(producto_comando.tipo_producto_id, 1)
                 print(f"[SYNC] Producto creado en consultas: {producto_comando.id}")
             
-            # Actualizar contador de productos
-            tipo_consulta.cantidad_productos = ProductoConsultaModelo.query.filter_by(tipo_producto_id=tipo_producto_comando.id).count()
-            
             db.session.commit()
             print(f"[SYNC] ✅ Sincronización completada exitosamente para producto {producto_comando.id}")
             
         except Exception as e:
             print(f"[SYNC] Error sincronizando producto: {e}")
             db.session.rollback()
+        finally:
+            # La vista de consultas pudo cambiar: la siguiente lectura debe ir a la base
+            invalidar_producto(producto_comando.id)
 
     def actualizar(self, producto: Producto):
         print(f"[COMANDO-POSTGRES] Actualizando producto: {producto.id}")
@@ -155,6 +243,7 @@ class RepositorioProductoComandoPostgreSQL(RepositorioProductoComando):
             producto_modelo.stock = producto.stock.stock
             producto_modelo.marca = producto.marca.nombre
             producto_modelo.lote = producto.lote.codigo
+            registrar_eventos_outbox(db.session, EventoOutboxModelo, producto)
             db.session.commit()
             print(f"[COMANDO-POSTGRES] Producto actualizado exitosamente: {producto.id}")
             
@@ -173,10 +262,313 @@ class RepositorioProductoComandoPostgreSQL(RepositorioProductoComando):
         if producto_modelo:
             db.session.delete(producto_modelo)
             db.session.commit()
+            self._eliminar_de_consultas(id)
             print(f"[COMANDO-POSTGRES] Producto eliminado exitosamente: {id}")
         else:
             print(f"[COMANDO-POSTGRES] Producto no encontrado para eliminar: {id}")
 
+    def _eliminar_de_consultas(self, id: UUID):
+        """Elimina un producto de la base de consultas y descuenta el contador de su tipo"""
+        try:
+            producto_consulta = ProductoConsultaModelo.query.filter_by(id=id).first()
+            if producto_consulta:
+                tipo_producto_id = producto_consulta.tipo_producto_id
+                db.session.delete(producto_consulta)
+                db.session.flush()
+                ajustar_cantidad_productos(tipo_producto_id, -1)
+                db.session.commit()
+                print(f"[SYNC] Producto eliminado de consultas: {id}")
+        except Exception as e:
+            print(f"[SYNC] Error eliminando producto de consultas: {e}")
+            db.session.rollback()
+        finally:
+            invalidar_producto(id)
+
+    def descontar_stock(self, producto_id: UUID, cantidad: int) -> int:
+        """Descuenta stock con un UPDATE condicional atómico (stock >= cantidad) en un solo viaje a la base,
+        sin leer el producto antes. Retorna el stock resultante."""
+        tabla = ProductoComandoModelo.__table__
+        fila = db.session.execute(
+            db.update(tabla)
+            .where(tabla.c.id == producto_id)
+            .where(tabla.c.stock >= cantidad)
+            .values(stock=tabla.c.stock - cantidad)
+            .returning(tabla.c.id, tabla.c.stock, tabla.c.updated_at),
+            bind_arguments={'mapper': ProductoComandoModelo}
+        ).first()
+        if fila is None:
+            db.session.rollback()
+            # Solo en el caso de fallo se consulta el motivo: producto inexistente o stock insuficiente
+            disponible = db.session.execute(
+                db.select(ProductoComandoModelo.stock).where(ProductoComandoModelo.id == producto_id),
+                bind_arguments={'mapper': ProductoComandoModelo}
+            ).scalar()
+            if disponible is None:
+                raise ValueError(f"Producto con ID {producto_id} no encontrado")
+            raise StockInsuficienteExcepcion(producto_id, cantidad, disponible)
+        db.session.commit()
+        print(f"[COMANDO-POSTGRES] Stock del producto {producto_id} descontado en {cantidad}, nuevo stock: {fila.stock}")
+
+        self._sync_stock_to_queries([fila])
+        return fila.stock
+
+    def descontar_stock_pedidos(self, pedidos: list[dict[UUID, int]], evento_ids: list[UUID] = None) -> list[bool]:
+        """Descuenta en una sola transacción el stock de varios pedidos (cada uno un mapa producto -> cantidad).
+        Un pedido se aplica completo o no se aplica: si alguno de sus productos no existe o no tiene stock
+        suficiente se omite. Las cantidades de los pedidos aplicados se suman por producto y se descuentan con
+        un único UPDATE ... FROM (VALUES ...). Retorna, en el mismo orden, si cada pedido fue aplicado.
+        evento_ids son los eventos que originan los pedidos: se marcan procesados en la misma transacción."""
+        ids = {producto_id for pedido in pedidos for producto_id in pedido}
+        try:
+            disponibles = self._bloquear_stock(list(ids)) if ids else {}
+            aplicados = []
+            cantidades = {}
+            for pedido in pedidos:
+                aplicable = bool(pedido) and all(
+                    disponibles.get(producto_id) is not None and disponibles[producto_id] >= cantidad
+                    for producto_id, cantidad in pedido.items()
+                )
+                if aplicable:
+                    for producto_id, cantidad in pedido.items():
+                        disponibles[producto_id] -= cantidad
+                        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+                aplicados.append(aplicable)
+
+            filas = self._descontar_stock(cantidades) if cantidades else []
+            completar_eventos_procesados(db.session, EventoProcesadoModelo, evento_ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if filas:
+            self._sync_stock_to_queries(filas)
+        return aplicados
+
+    def _bloquear_stock(self, ids: list[UUID]) -> dict[UUID, int]:
+        """Lee el stock de varios productos bloqueando sus filas (SELECT ... FOR UPDATE) hasta el commit"""
+        return {id: fila.stock for id, fila in self._bloquear_productos(ids).items()}
+
+    def _bloquear_productos(self, ids: list[UUID]) -> dict:
+        """Lee stock, precio y nombre de varios productos bloqueando sus filas hasta el commit.
+        Se bloquean en orden de id para que dos transacciones concurrentes no se esperen mutuamente."""
+        filas = db.session.execute(
+            db.select(ProductoComandoModelo.id, ProductoComandoModelo.stock,
+                      ProductoComandoModelo.precio, ProductoComandoModelo.nombre)
+            .where(ProductoComandoModelo.id.in_(ids))
+            .order_by(ProductoComandoModelo.id)
+            .with_for_update(),
+            bind_arguments={'mapper': ProductoComandoModelo}
+        ).all()
+        return {fila.id: fila for fila in filas}
+
+    def _reponer_stock(self, cantidades: dict[UUID, int]) -> list:
+        """Devuelve al stock las cantidades de varios productos con un único UPDATE ... FROM (VALUES ...) ... RETURNING"""
+        self._bloquear_stock(list(cantidades))
+        tabla = ProductoComandoModelo.__table__
+        reposiciones = values(
+            column('id', Uuid), column('cantidad', Integer), name='reposiciones'
+        ).data(list(cantidades.items()))
+        return db.session.execute(
+            db.update(tabla)
+            .where(tabla.c.id == reposiciones.c.id)
+            .values(stock=tabla.c.stock + reposiciones.c.cantidad)
+            .returning(tabla.c.id, tabla.c.stock, tabla.c.updated_at),
+            bind_arguments={'mapper': ProductoComandoModelo}
+        ).all()
+
+    # -------------------------------------------------------------------------
+    # Reservas de stock
+    # -------------------------------------------------------------------------
+
+    def reservar_stock(self, reserva_id: UUID, cantidades: dict[UUID, int], expira_en: datetime,
+                       pedido_id: UUID = None) -> dict:
+        """Reserva en una sola transacción las cantidades de todo un pedido: descuenta el stock de todos los
+        productos o de ninguno y guarda la reserva para poder reponerlo. Si el pedido ya tiene una reserva
+        activa (un reintento de Ventas) la retorna sin descontar nada. Retorna reserva_id, expira_en,
+        cantidades y nombre y precio por producto."""
+        print(f"[COMANDO-POSTGRES] Reservando {len(cantidades)} productos (reserva {reserva_id})")
+        try:
+            productos = self._bloquear_productos(list(cantidades))
+            # Se busca con las filas ya bloqueadas: un reintento concurrente espera a que la primera reserva
+            # confirme y entonces la encuentra
+            existente = self._reserva_activa_de_pedido(pedido_id) if pedido_id else None
+            if existente is not None:
+                if self._cantidades_reservadas([existente]) != cantidades:
+                    raise ValueError(f"El pedido {pedido_id} ya tiene la reserva activa {existente.id} con otros items")
+                db.session.commit()
+                return self._datos_reserva(existente, productos)
+
+            for producto_id, cantidad in cantidades.items():
+                producto = productos.get(producto_id)
+                if producto is None:
+                    raise ValueError(f"Producto con ID {producto_id} no encontrado")
+                if producto.stock < cantidad:
+                    raise StockInsuficienteExcepcion(producto_id, cantidad, producto.stock)
+
+            filas = self._descontar_stock(cantidades)
+            reserva = ReservaStockModelo(
+                id=reserva_id,
+                pedido_id=pedido_id,
+                estado='ACTIVA',
+                items=[{'producto_id': str(producto_id), 'cantidad': cantidad} for producto_id, cantidad in cantidades.items()],
+                expira_en=expira_en
+            )
+            db.session.add(reserva)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self._sync_stock_to_queries(filas)
+        return self._datos_reserva(reserva, productos)
+
+    def _reserva_activa_de_pedido(self, pedido_id: UUID):
+        return db.session.execute(
+            db.select(ReservaStockModelo)
+            .where(ReservaStockModelo.pedido_id == pedido_id)
+            .where(ReservaStockModelo.estado == 'ACTIVA'),
+            bind_arguments={'mapper': ReservaStockModelo}
+        ).scalar_one_or_none()
+
+    def _datos_reserva(self, reserva, productos: dict) -> dict:
+        cantidades = self._cantidades_reservadas([reserva])
+        return {
+            'reserva_id': reserva.id,
+            'expira_en': reserva.expira_en,
+            'cantidades': cantidades,
+            'productos': {
+                producto_id: {'nombre': producto.nombre, 'precio_unitario': float(producto.precio)}
+                for producto_id, producto in productos.items()
+            }
+        }
+
+    def confirmar_reservas(self, reserva_ids: list[UUID]) -> dict[UUID, str]:
+        """Confirma con un único UPDATE las reservas activas de la lista; el stock ya estaba descontado.
+        Retorna el estado que tenía cada reserva encontrada antes de confirmarla."""
+        try:
+            anteriores = dict(db.session.execute(
+                db.select(ReservaStockModelo.id, ReservaStockModelo.estado)
+                .where(ReservaStockModelo.id.in_(reserva_ids))
+                .with_for_update(),
+                bind_arguments={'mapper': ReservaStockModelo}
+            ).all())
+            activas = [reserva_id for reserva_id, estado in anteriores.items() if estado == 'ACTIVA']
+            if activas:
+                db.session.execute(
+                    db.update(ReservaStockModelo)
+                    .where(ReservaStockModelo.id.in_(activas))
+                    .values(estado='CONFIRMADA')
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        print(f"[COMANDO-POSTGRES] {len(activas)} reservas confirmadas")
+        return anteriores
+
+    def liberar_reserva(self, reserva_id: UUID) -> str:
+        """Repone el stock de una reserva activa y la marca como LIBERADA. Retorna el estado previo;
+        si la reserva no estaba activa no modifica nada."""
+        try:
+            reserva = db.session.execute(
+                db.select(ReservaStockModelo).where(ReservaStockModelo.id == reserva_id).with_for_update()
+            ).scalar_one_or_none()
+            if reserva is None:
+                raise ReservaNoEncontradaExcepcion(reserva_id)
+            estado_anterior = reserva.estado
+            filas = []
+            if estado_anterior == 'ACTIVA':
+                filas = self._reponer_stock(self._cantidades_reservadas([reserva]))
+                reserva.estado = 'LIBERADA'
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if filas:
+            self._sync_stock_to_queries(filas)
+            print(f"[COMANDO-POSTGRES] Reserva {reserva_id} liberada")
+        return estado_anterior
+
+    def expirar_reservas(self, limite: int = 500) -> int:
+        """Repone el stock de hasta `limite` reservas activas vencidas y las marca como EXPIRADA.
+        Con SKIP LOCKED varias réplicas pueden expirar a la vez sin tomar las mismas reservas."""
+        try:
+            reservas = db.session.execute(
+                db.select(ReservaStockModelo)
+                .where(ReservaStockModelo.estado == 'ACTIVA')
+                .where(ReservaStockModelo.expira_en < datetime.now())
+                .order_by(ReservaStockModelo.expira_en)
+                .limit(limite)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            filas = []
+            if reservas:
+                filas = self._reponer_stock(self._cantidades_reservadas(reservas))
+                for reserva in reservas:
+                    reserva.estado = 'EXPIRADA'
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if filas:
+            self._sync_stock_to_queries(filas)
+        return len(reservas)
+
+    @staticmethod
+    def _cantidades_reservadas(reservas: list) -> dict[UUID, int]:
+        cantidades = {}
+        for reserva in reservas:
+            for item in reserva.items:
+                producto_id = UUID(item['producto_id'])
+                cantidades[producto_id] = cantidades.get(producto_id, 0) + int(item['cantidad'])
+        return cantidades
+
+    def _descontar_stock(self, cantidades: dict[UUID, int]) -> list:
+        """Resta las cantidades de varios productos con un único UPDATE ... FROM (VALUES ...) ... RETURNING"""
+        print(f"[COMANDO-POSTGRES] Descontando stock de {len(cantidades)} productos en una sola sentencia")
+        tabla = ProductoComandoModelo.__table__
+        descuentos = values(
+            column('id', Uuid), column('cantidad', Integer), name='descuentos'
+        ).data(list(cantidades.items()))
+        filas = db.session.execute(
+            db.update(tabla)
+            .where(tabla.c.id == descuentos.c.id)
+            .where(tabla.c.stock >= descuentos.c.cantidad)
+            .values(stock=tabla.c.stock - descuentos.c.cantidad)
+            .returning(tabla.c.id, tabla.c.stock, tabla.c.updated_at),
+            bind_arguments={'mapper': ProductoComandoModelo}
+        ).all()
+        if len(filas) != len(cantidades):
+            # Con las filas bloqueadas no debería ocurrir; quien llama deshace todo el lote
+            raise ValueError(f"Solo {len(filas)} de {len(cantidades)} productos tenían stock suficiente")
+        return filas
+
+    def _sync_stock_to_queries(self, filas: list):
+        """Copia el stock y la fecha de actualización de varios productos a productos_view en una sola sentencia"""
+        tabla = ProductoConsultaModelo.__table__
+        try:
+            nuevos = values(
+                column('id', Uuid), column('stock', Integer), column('updated_at', DateTime), name='nuevos'
+            ).data([tuple(fila) for fila in filas])
+            db.session.execute(
+                db.update(tabla)
+                .where(tabla.c.id == nuevos.c.id)
+                .values(stock=nuevos.c.stock, updated_at=nuevos.c.updated_at),
+                bind_arguments={'mapper': ProductoConsultaModelo}
+            )
+            db.session.commit()
+            print(f"[SYNC] ✅ Stock de {len(filas)} productos proyectado a consultas")
+        except Exception as e:
+            print(f"[SYNC] Error sincronizando stock de productos: {e}")
+            db.session.rollback()
+        finally:
+            for id, _, _ in filas:
+                invalidar_producto(id)
+
     def obtener_por_id(self, id: UUID) -> Producto:
         """Obtiene un producto por ID para operaciones de comando"""
         producto_modelo = ProductoComandoModelo.query.filter_by(id=id).first()
@@ -328,6 +720,21 @@ class RepositorioTipoProductoConsultaPostgreSQL(RepositorioTipoProductoConsulta)
         print(f"[CONSULTA-POSTGRES] Encontrados {len(tipos_producto)} tipos de producto")
         return tipos_producto
 
+    def obtener_por_ids(self, ids: list[UUID]) -> dict:
+        """Obtiene varios tipos de producto en una sola consulta, como mapa id -> TipoProducto"""
+        print(f"[CONSULTA-POSTGRES] Obteniendo {len(ids)} tipos de producto por ID")
+        if not ids:
+            return {}
+        tipo_producto_modelos = TipoProductoConsultaModelo.query.filter(TipoProductoConsultaModelo.id.in_(ids)).all()
+        return {modelo.id: self._mapeador.dto_a_entidad(modelo) for modelo in tipo_producto_modelos}
+
+    def obtener_version(self) -> tuple:
+        """Retorna (max(updated_at), count(*)) de los tipos de producto sin cargar las filas"""
+        return db.session.query(
+            db.func.max(TipoProductoConsultaModelo.updated_at),
+            db.func.count(TipoProductoConsultaModelo.id)
+        ).one()
+
     # Métodos de escritura no disponibles en repositorio de consultas
     def agregar(self, tipo_producto: TipoProducto):
         raise NotImplementedError("El repositorio de consultas no permite operaciones de escritura")
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Callable, Dict, List
 from seedwork.dominio.eventos import ManejadorEvento, PublicadorEventos, EventoDominio
 from functools import singledispatch
 
@@ -20,4 +20,18 @@ class DespachadorEventos:
 @singledispatch
 def ejecutar_evento(evento):
     """Función genérica para ejecutar eventos usando singledispatch"""
-    raise NotImplementedError(f"No existe implementacion para el evento de tipo: {type(evento).__name__}")
\ No newline at end of file
+    raise NotImplementedError(f"No existe implementacion para el evento de tipo: {type(evento).__name__}")
+
+_manejadores_lote: Dict[type, Callable] = {}
+
+def registrar_manejador_lote(tipo_evento: type):
+    """Registra un manejador que procesa varios eventos del mismo tipo a la vez. Recibe la lista
+    de eventos y retorna, en el mismo orden, True si el evento se puede confirmar (ack) o False (nack)"""
+    def decorador(funcion: Callable):
+        _manejadores_lote[tipo_evento] = funcion
+        return funcion
+    return decorador
+
+def obtener_manejador_lote(tipo_evento: type) -> Callable:
+    """Retorna el manejador de lote registrado para el tipo de evento, o None"""
+    return _manejadores_lote.get(tipo_evento)
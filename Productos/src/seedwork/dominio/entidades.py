@@ -38,9 +38,18 @@ class Entidad:
 
 @dataclass
 class AgregacionRaiz(Entidad, ValidarReglasMixin):
+    # Eventos de dominio pendientes; el repositorio los guarda en el outbox en la misma transacción
+    eventos: list = field(default_factory=list, init=False, repr=False, compare=False)
+
     def __post_init__(self):
         super().__post_init__()
 
+    def agregar_evento(self, evento):
+        self.eventos.append(evento)
+
+    def limpiar_eventos(self):
+        self.eventos = []
+
 
 @dataclass
 class Locacion(Entidad):
@@ -72,7 +72,6 @@ class DespachadorEventos:
     def publicar_evento(self, evento: EventoDominio):
         """Publica un evento y lo distribuye a los manejadores"""
         print(f"📡 Despachador: Recibido evento {evento.__class__.__name__} con ID: {evento.id}")
-        print(f"📋 Despachador: Datos del evento: {evento.to_dict()}")
         
         # Publicar a sistemas externos
         print(f"🔄 Despachador: Publicando a {len(self._publicadores)} publicadores externos")
@@ -81,6 +80,10 @@ class DespachadorEventos:
             publicador.publicar(evento)
         
         # Distribuir a manejadores locales
+        self.despachar_a_manejadores(evento)
+    
+    def despachar_a_manejadores(self, evento: EventoDominio):
+        """Distribuye un evento solo a los manejadores locales (la publicación externa la hace el outbox)"""
         tipo_evento = evento.__class__.__name__
         print(f"🏠 Despachador: Buscando manejadores locales para {tipo_evento}")
         if tipo_evento in self._manejadores:
@@ -0,0 +1,105 @@
+"""Cache en memoria reusable parte del seedwork del proyecto
+
+En este archivo usted encontrará un cache LRU acotado con expiración (TTL)
+y contadores de aciertos, fallos y desalojos para poder dimensionarlo.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class CacheLRU:
+    """Cache LRU con TTL, seguro para hilos"""
+
+    def __init__(self, capacidad: int = 10000, ttl_segundos: float = 30.0):
+        self.capacidad = capacidad
+        self.ttl_segundos = ttl_segundos
+        self._entradas: "OrderedDict[Any, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Se incrementa en cada invalidación para no guardar lecturas que quedaron obsoletas
+        self._generacion = 0
+        self._aciertos = 0
+        self._fallos = 0
+        self._desalojos = 0
+        self._expiraciones = 0
+        self._invalidaciones = 0
+
+    @property
+    def habilitado(self) -> bool:
+        return self.capacidad > 0
+
+    def obtener(self, clave) -> Optional[Any]:
+        """Retorna el valor en cache o None si no existe o ya expiró"""
+        if not self.habilitado:
+            return None
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self._fallos += 1
+                return None
+            expira_en, valor = entrada
+            if expira_en < time.monotonic():
+                del self._entradas[clave]
+                self._expiraciones += 1
+                self._fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self._aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor, generacion: int = None):
+        """Guarda un valor; si se indica la generación leída antes de cargarlo y hubo
+        invalidaciones desde entonces, el valor se descarta por estar potencialmente obsoleto"""
+        if not self.habilitado:
+            return
+        with self._lock:
+            if generacion is not None and generacion != self._generacion:
+                return
+            self._entradas[clave] = (time.monotonic() + self.ttl_segundos, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+                self._desalojos += 1
+
+    def obtener_o_cargar(self, clave, cargar: Callable[[], Any]) -> Optional[Any]:
+        """Lectura a través del cache: si no hay valor se carga y se guarda (los None no se guardan)"""
+        valor = self.obtener(clave)
+        if valor is not None:
+            return valor
+        generacion = self._generacion
+        valor = cargar()
+        if valor is not None:
+            self.guardar(clave, valor, generacion)
+        return valor
+
+    def invalidar(self, clave):
+        """Elimina una entrada del cache"""
+        with self._lock:
+            self._generacion += 1
+            if self._entradas.pop(clave, None) is not None:
+                self._invalidaciones += 1
+
+    def limpiar(self):
+        """Elimina todas las entradas del cache"""
+        with self._lock:
+            self._generacion += 1
+            self._invalidaciones += len(self._entradas)
+            self._entradas.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores para dimensionar el cache"""
+        with self._lock:
+            consultas = self._aciertos + self._fallos
+            return {
+                'capacidad': self.capacidad,
+                'ttl_segundos': self.ttl_segundos,
+                'entradas': len(self._entradas),
+                'aciertos': self._aciertos,
+                'fallos': self._fallos,
+                'tasa_aciertos': round(self._aciertos / consultas, 4) if consultas else 0.0,
+                'desalojos': self._desalojos,
+                'expiraciones': self._expiraciones,
+                'invalidaciones': self._invalidaciones
+            }
@@ -7,26 +7,170 @@ import logging
 import threading
 import time
 import os
+import uuid
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
 from typing import Dict, Any
 from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
+from google.api_core.exceptions import AlreadyExists
 from google.auth.exceptions import DefaultCredentialsError
 from seedwork.dominio.eventos import EventoDominio, despachador_eventos
-from seedwork.aplicacion.eventos import ejecutar_evento
+from seedwork.aplicacion.eventos import ejecutar_evento, obtener_manejador_lote
+from seedwork.infraestructura.eventos_procesados import NUEVO, DUPLICADO, EN_PROCESO
+from seedwork.infraestructura.codificacion import decodificar_evento
+from seedwork.infraestructura.reintentos import ReintentosSuscripcion, nombre_topic_dlq, nombre_suscripcion_dlq
 
 logger = logging.getLogger(__name__)
 
+
+def _variable_suscripcion(topic_name: str, nombre: str, por_defecto: str) -> str:
+    """Lee PUBSUB_<TOPIC>_<NOMBRE> (ej. PUBSUB_PEDIDOS_CREADOS_HILOS) y si no existe PUBSUB_CONSUMIDOR_<NOMBRE>"""
+    prefijo_topic = topic_name.upper().replace('-', '_')
+    return os.getenv(f'PUBSUB_{prefijo_topic}_{nombre}', os.getenv(f'PUBSUB_CONSUMIDOR_{nombre}', por_defecto))
+
+
+@dataclass(frozen=True)
+class ConfiguracionSuscripcion:
+    """Control de flujo y concurrencia de una suscripción"""
+    max_mensajes: int = 10
+    max_bytes: int = 100 * 1024 * 1024
+    hilos: int = 10
+    max_lease_segundos: int = 3600
+    # Micro-lotes: con lote_max_mensajes > 1 los eventos con manejador de lote se agrupan
+    lote_max_mensajes: int = 1
+    lote_espera_ms: int = 5
+    # Reintentos: un mensaje fallido se reentrega con backoff exponencial y tras max_intentos va al dead-letter
+    max_intentos: int = 5
+    backoff_inicial_segundos: int = 10
+    backoff_maximo_segundos: int = 600
+
+    @classmethod
+    def desde_entorno(cls, topic_name: str) -> 'ConfiguracionSuscripcion':
+        return cls(
+            max_mensajes=int(_variable_suscripcion(topic_name, 'MAX_MENSAJES', str(cls.max_mensajes))),
+            max_bytes=int(_variable_suscripcion(topic_name, 'MAX_BYTES', str(cls.max_bytes))),
+            hilos=int(_variable_suscripcion(topic_name, 'HILOS', str(cls.hilos))),
+            max_lease_segundos=int(_variable_suscripcion(topic_name, 'MAX_LEASE_SEGUNDOS', str(cls.max_lease_segundos))),
+            lote_max_mensajes=int(_variable_suscripcion(topic_name, 'LOTE_MAX_MENSAJES', str(cls.lote_max_mensajes))),
+            lote_espera_ms=int(_variable_suscripcion(topic_name, 'LOTE_ESPERA_MS', str(cls.lote_espera_ms))),
+            max_intentos=int(_variable_suscripcion(topic_name, 'MAX_INTENTOS', str(cls.max_intentos))),
+            backoff_inicial_segundos=int(_variable_suscripcion(topic_name, 'BACKOFF_INICIAL_SEGUNDOS', str(cls.backoff_inicial_segundos))),
+            backoff_maximo_segundos=int(_variable_suscripcion(topic_name, 'BACKOFF_MAXIMO_SEGUNDOS', str(cls.backoff_maximo_segundos)))
+        )
+
+
+class MetricasSuscripcion:
+    """Mensajes en proceso, procesados por segundo y latencia hasta el ack de una suscripción"""
+
+    VENTANA_SEGUNDOS = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_proceso = 0
+        self._procesados = 0
+        self._fallidos = 0
+        self._acks_recientes = deque()
+        self._latencias = deque(maxlen=1000)
+
+    def inicio(self) -> float:
+        with self._lock:
+            self._en_proceso += 1
+        return time.monotonic()
+
+    def fin(self, inicio: float, exito: bool):
+        ahora = time.monotonic()
+        with self._lock:
+            self._en_proceso -= 1
+            if exito:
+                self._procesados += 1
+                self._latencias.append(ahora - inicio)
+                self._acks_recientes.append(ahora)
+                self._descartar_antiguos(ahora)
+            else:
+                self._fallidos += 1
+
+    def _descartar_antiguos(self, ahora: float):
+        limite = ahora - self.VENTANA_SEGUNDOS
+        while self._acks_recientes and self._acks_recientes[0] < limite:
+            self._acks_recientes.popleft()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            self._descartar_antiguos(time.monotonic())
+            latencias = sorted(self._latencias)
+            return {
+                'en_proceso': self._en_proceso,
+                'procesados': self._procesados,
+                'fallidos': self._fallidos,
+                'procesados_por_segundo': round(len(self._acks_recientes) / self.VENTANA_SEGUNDOS, 2),
+                'latencia_ack_ms_p50': round(latencias[len(latencias) // 2] * 1000, 1) if latencias else None,
+                'latencia_ack_ms_p95': round(latencias[int(len(latencias) * 0.95)] * 1000, 1) if latencias else None
+            }
+
+
+class AcumuladorLote:
+    """Junta mensajes hasta max_mensajes o hasta espera_segundos desde el primero, y entrega cada lote
+    a procesar desde un hilo propio. Los mensajes no se confirman hasta que su lote se procesa."""
+
+    def __init__(self, procesar, max_mensajes: int, espera_segundos: float, nombre: str):
+        self._procesar = procesar
+        self.max_mensajes = max_mensajes
+        self.espera_segundos = espera_segundos
+        self._pendientes = []
+        self._condicion = threading.Condition()
+        threading.Thread(target=self._ciclo, name=f"lote-{nombre}", daemon=True).start()
+
+    def agregar(self, elemento):
+        with self._condicion:
+            self._pendientes.append(elemento)
+            if len(self._pendientes) == 1 or len(self._pendientes) >= self.max_mensajes:
+                self._condicion.notify()
+
+    def _ciclo(self):
+        while True:
+            with self._condicion:
+                while not self._pendientes:
+                    self._condicion.wait()
+                limite = time.monotonic() + self.espera_segundos
+                while len(self._pendientes) < self.max_mensajes:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._condicion.wait(restante)
+                lote = self._pendientes[:self.max_mensajes]
+                del self._pendientes[:self.max_mensajes]
+            try:
+                self._procesar(lote)
+            except Exception as e:
+                logger.error(f"❌ Error procesando lote de {len(lote)} mensajes: {e}")
+
+
 class ConsumidorPubSub:
     """Consumidor de eventos que recibe mensajes de Google Cloud Pub/Sub"""
     
-    def __init__(self, project_id: str = None, emulator_host: str = None, app=None):
+    def __init__(self, project_id: str = None, emulator_host: str = None, app=None, registro_procesados=None):
                 
         self.project_id = project_id or os.getenv('GCP_PROJECT_ID', 'medisupply-project')
         self.use_emulator = os.getenv('USE_PUBSUB_EMULATOR', 'false').lower() == 'true'
         self.emulator_host = emulator_host or os.getenv('PUBSUB_EMULATOR_HOST', 'localhost:8085')
         
+        # Con PUBSUB_ADMINISTRAR_TOPICS=false las suscripciones se aprovisionan por fuera
+        self.administrar_recursos = os.getenv('PUBSUB_ADMINISTRAR_TOPICS', 'true').lower() == 'true'
+        
         self.app = app
+        # RegistroEventosProcesados opcional: descarta reentregas de eventos ya procesados
+        self.registro_procesados = registro_procesados
         self._subscriber = None
+        # Cliente para publicar en los topics de dead-letter
+        self._publisher = None
         self._subscriptions = {}
+        self._configuraciones: Dict[str, ConfiguracionSuscripcion] = {}
+        self._metricas: Dict[str, MetricasSuscripcion] = {}
+        self._reintentos: Dict[str, ReintentosSuscripcion] = {}
+        self._streaming_futures = {}
         self._initialize_subscriber()
     
     def _initialize_subscriber(self):
@@ -42,6 +186,7 @@ class ConsumidorPubSub:
                 logger.info(f"Consumidor Pub/Sub inicializado para GCP proyecto: {self.project_id}")
             
             self._subscriber = pubsub_v1.SubscriberClient()
+            self._publisher = pubsub_v1.PublisherClient()
             
         except Exception as e:
             logger.warning(f"No se pudo inicializar consumidor Pub/Sub: {e}")
@@ -102,6 +247,12 @@ class ConsumidorPubSub:
             self.project_id, f"{topic_name}-productos-sub"
         )
         
+        if not self.administrar_recursos:
+            self._subscriptions[topic_name] = subscription_path
+            return
+        
+        self._crear_dead_letter(topic_name)
+        
         try:
             # Crear la suscripción
             self._subscriber.create_subscription(
@@ -119,6 +270,26 @@ class ConsumidorPubSub:
             else:
                 logger.error(f"❌ Error creando suscripción {topic_name}: {e}")
     
+    def _crear_dead_letter(self, topic_name: str):
+        """Crea el topic de dead-letter y una suscripción que retiene sus mensajes para inspeccionarlos con ver_eventos.py"""
+        topic_dlq_path = self._publisher.topic_path(self.project_id, nombre_topic_dlq(topic_name))
+        subscription_dlq_path = self._subscriber.subscription_path(self.project_id, nombre_suscripcion_dlq(topic_name))
+        try:
+            self._publisher.create_topic(request={"name": topic_dlq_path})
+            logger.info(f"✅ Topic de dead-letter creado: {topic_dlq_path}")
+        except AlreadyExists:
+            pass
+        except Exception as e:
+            logger.warning(f"No se pudo crear el topic de dead-letter {topic_dlq_path}: {e}")
+            return
+        try:
+            self._subscriber.create_subscription(
+                request={"name": subscription_dlq_path, "topic": topic_dlq_path}
+            )
+        except Exception as e:
+            if "already exists" not in str(e):
+                logger.warning(f"No se pudo crear la suscripción de dead-letter {subscription_dlq_path}: {e}")
+    
     def iniciar_escucha(self):
         """Inicia la escucha de eventos en background"""
         if not self._subscriber:
@@ -141,45 +312,95 @@ class ConsumidorPubSub:
     
     def _escuchar_suscripcion(self, subscription_path: str, topic_name: str):
         """Escucha mensajes de una suscripción específica"""
+        configuracion = ConfiguracionSuscripcion.desde_entorno(topic_name)
+        metricas = MetricasSuscripcion()
+        reintentos = ReintentosSuscripcion(
+            topic_name,
+            subscription_path,
+            configuracion.max_intentos,
+            configuracion.backoff_inicial_segundos,
+            configuracion.backoff_maximo_segundos,
+            publisher=self._publisher,
+            topic_dlq_path=self._publisher.topic_path(self.project_id, nombre_topic_dlq(topic_name)) if self._publisher else None
+        )
+        # _metricas se asigna al final porque estadisticas() recorre sus topics
+        self._configuraciones[topic_name] = configuracion
+        self._reintentos[topic_name] = reintentos
+        self._metricas[topic_name] = metricas
+        acumulador = None
+        if configuracion.lote_max_mensajes > 1:
+            acumulador = AcumuladorLote(
+                lambda lote: self._procesar_lote(lote, metricas, reintentos),
+                configuracion.lote_max_mensajes,
+                configuracion.lote_espera_ms / 1000,
+                topic_name
+            )
         try:
             def callback(message):
+                inicio = metricas.inicio()
                 try:
-                    # Decodificar el mensaje
-                    data = json.loads(message.data.decode('utf-8'))
+                    # Decodificar el mensaje con el codec indicado en sus atributos
+                    data = decodificar_evento(message.data, message.attributes)
                     
                     logger.info(f"📨 Recibido evento {data.get('tipo_evento')} desde {topic_name}")
                     
                     # Crear evento de dominio desde los datos
                     evento = self._crear_evento_desde_datos(data)
                     
+                    if evento and self.registro_procesados and self.registro_procesados.procesado_recientemente(evento.id):
+                        logger.info(f"⏭️ Evento {evento.id} ya procesado, se descarta la reentrega")
+                        message.ack()
+                        metricas.fin(inicio, exito=True)
+                        return
+                    
+                    if evento and acumulador and obtener_manejador_lote(type(evento)):
+                        # El ack/nack lo hace el lote cuando se procesa
+                        acumulador.agregar((message, evento, inicio))
+                        return
+                    
                     if evento:
                         # Procesar el evento usando el sistema local con contexto de Flask
                         logger.info(f"🔄 Procesando evento {evento.__class__.__name__}")
                         
                         # Usar el contexto de la aplicación Flask si está disponible
-                        if self.app:
-                            with self.app.app_context():
-                                ejecutar_evento(evento)
-                        else:
-                            ejecutar_evento(evento)
+                        with self._contexto_app():
+                            confirmar = self._ejecutar_una_vez(evento)
+                        
+                        if not confirmar:
+                            reintentos.posponer(message, f"Evento {evento.id} en proceso en otra réplica")
+                            metricas.fin(inicio, exito=False)
+                            return
                         
                         logger.info(f"✅ Evento {evento.__class__.__name__} procesado exitosamente")
                     
                     # Confirmar que el mensaje fue procesado
                     message.ack()
+                    reintentos.exito(message)
+                    metricas.fin(inicio, exito=True)
                     
                 except Exception as e:
                     logger.error(f"❌ Error procesando mensaje: {e}")
-                    message.nack()
+                    reintentos.fallo(message, str(e))
+                    metricas.fin(inicio, exito=False)
             
-            # Usar subscribe() con la API correcta
+            # Pool propio por suscripción: su tamaño limita cuántos mensajes se procesan en paralelo
+            scheduler = ThreadScheduler(executor=ThreadPoolExecutor(
+                max_workers=configuracion.hilos,
+                thread_name_prefix=f"consumidor-{topic_name}"
+            ))
             streaming_pull_future = self._subscriber.subscribe(
                 subscription_path,
                 callback=callback,
-                flow_control=pubsub_v1.types.FlowControl(max_messages=10)
+                flow_control=pubsub_v1.types.FlowControl(
+                    max_messages=configuracion.max_mensajes,
+                    max_bytes=configuracion.max_bytes,
+                    max_lease_duration=configuracion.max_lease_segundos
+                ),
+                scheduler=scheduler
             )
+            self._streaming_futures[topic_name] = streaming_pull_future
             
-            logger.info(f"✅ Escucha activa para {topic_name}")
+            logger.info(f"✅ Escucha activa para {topic_name}: {configuracion}")
             
             # Mantener el hilo vivo
             streaming_pull_future.result()
@@ -187,8 +408,140 @@ class ConsumidorPubSub:
         except Exception as e:
             logger.error(f"❌ Error en escucha de {topic_name}: {e}")
     
+    def _contexto_app(self):
+        return self.app.app_context() if self.app else nullcontext()
+    
+    def _ejecutar_una_vez(self, evento: EventoDominio) -> bool:
+        """Ejecuta el evento si no se procesó antes; retorna False si otra réplica lo está procesando.
+
+        Si el tipo de evento tiene manejador de lote se ejecuta con un lote de uno: ese manejador aplica sus
+        efectos no idempotentes y completa el reclamo en una sola transacción. Con un manejador individual
+        que no lo hace queda una ventana entre su commit y completar(): si el proceso muere ahí, el reclamo
+        se retoma al vencer el lease y el evento se aplica otra vez."""
+        if not self.registro_procesados:
+            self._ejecutar_evento(evento)
+            return True
+        
+        estado = self.registro_procesados.reclamar([evento.id], type(evento).__name__)[evento.id]
+        if estado == DUPLICADO:
+            logger.info(f"⏭️ Evento {evento.id} ya procesado, se descarta la reentrega")
+            return True
+        if estado == EN_PROCESO:
+            logger.info(f"⏳ Evento {evento.id} en proceso en otra réplica, se reintentará")
+            return False
+        
+        try:
+            self._ejecutar_evento(evento)
+        except Exception:
+            self.registro_procesados.liberar([evento.id])
+            raise
+        try:
+            self.registro_procesados.completar([evento.id])
+        except Exception as e:
+            # Los efectos ya se aplicaron: se confirma igual. Si el manejador no completó el reclamo en su
+            # transacción, queda EN_PROCESO y una reentrega posterior al lease volvería a aplicarlo
+            logger.error(f"❌ Error registrando evento procesado {evento.id}: {e}")
+        return True
+    
+    @staticmethod
+    def _ejecutar_evento(evento: EventoDominio):
+        manejador_lote = obtener_manejador_lote(type(evento))
+        if manejador_lote is None:
+            ejecutar_evento(evento)
+        elif not manejador_lote([evento])[0]:
+            raise RuntimeError(f"El manejador de {type(evento).__name__} no pudo aplicar el evento {evento.id}")
+    
+    def _procesar_lote(self, lote: list, metricas: MetricasSuscripcion, reintentos: ReintentosSuscripcion):
+        """Entrega un lote de (mensaje, evento, inicio) a los manejadores de lote y confirma cada mensaje según su resultado"""
+        por_tipo = {}
+        for elemento in lote:
+            por_tipo.setdefault(type(elemento[1]), []).append(elemento)
+        
+        for tipo_evento, elementos in por_tipo.items():
+            with self._contexto_app():
+                confirmaciones, en_proceso = self._procesar_lote_tipo(tipo_evento, elementos)
+            
+            for posicion, ((message, evento, inicio), confirmar) in enumerate(zip(elementos, confirmaciones)):
+                if confirmar:
+                    message.ack()
+                    reintentos.exito(message)
+                elif posicion in en_proceso:
+                    reintentos.posponer(message, f"Evento {evento.id} en proceso en otra réplica")
+                else:
+                    reintentos.fallo(message, f"Evento {evento.id} no se pudo procesar en el lote de {tipo_evento.__name__}")
+                metricas.fin(inicio, exito=confirmar)
+    
+    def _procesar_lote_tipo(self, tipo_evento: type, elementos: list) -> tuple:
+        """Reclama los eventos del lote, ejecuta el manejador solo con los nuevos y retorna si se confirma cada
+        mensaje junto con las posiciones que no se confirman porque otra réplica tiene su evento reclamado"""
+        eventos = [evento for _, evento, _ in elementos]
+        estados = {}
+        if self.registro_procesados:
+            try:
+                estados = self.registro_procesados.reclamar([evento.id for evento in eventos], tipo_evento.__name__)
+            except Exception as e:
+                logger.error(f"❌ Error reclamando lote de {tipo_evento.__name__}: {e}")
+                return [False] * len(eventos), set()
+        
+        # Un mismo evento repetido dentro del lote se procesa una sola vez
+        confirmaciones = [True] * len(eventos)
+        en_proceso = set()
+        nuevos = []
+        vistos = set()
+        for posicion, evento in enumerate(eventos):
+            estado = estados.get(evento.id, NUEVO)
+            if evento.id in vistos or estado == DUPLICADO:
+                continue
+            vistos.add(evento.id)
+            if estado == EN_PROCESO:
+                confirmaciones[posicion] = False
+                en_proceso.add(posicion)
+            else:
+                nuevos.append(posicion)
+        if len(nuevos) < len(eventos):
+            logger.info(f"⏭️ {len(eventos) - len(nuevos)} eventos del lote ya procesados o en proceso")
+        if not nuevos:
+            return confirmaciones, en_proceso
+        
+        manejador = obtener_manejador_lote(tipo_evento)
+        try:
+            logger.info(f"🔄 Procesando lote de {len(nuevos)} eventos {tipo_evento.__name__}")
+            resultados = manejador([eventos[posicion] for posicion in nuevos])
+        except Exception as e:
+            logger.error(f"❌ Error procesando lote de {tipo_evento.__name__}: {e}")
+            resultados = [False] * len(nuevos)
+        
+        exitosos, fallidos = [], []
+        for posicion, confirmar in zip(nuevos, resultados):
+            confirmaciones[posicion] = confirmar
+            (exitosos if confirmar else fallidos).append(eventos[posicion].id)
+        if self.registro_procesados:
+            try:
+                self.registro_procesados.completar(exitosos)
+            except Exception as e:
+                # Los efectos ya se aplicaron; los manejadores que completan el reclamo en su propia transacción
+                # no se repiten, los demás se volverían a aplicar en una reentrega posterior al lease
+                logger.error(f"❌ Error registrando eventos procesados: {e}")
+            self.registro_procesados.liberar(fallidos)
+        return confirmaciones, en_proceso
+    
+    def estadisticas(self) -> Dict[str, Any]:
+        """Configuración y métricas de cada suscripción activa, para monitoreo"""
+        estadisticas = {
+            topic_name: {
+                'configuracion': asdict(self._configuraciones[topic_name]),
+                **metricas.estadisticas(),
+                **self._reintentos[topic_name].estadisticas()
+            }
+            for topic_name, metricas in list(self._metricas.items())
+        }
+        if self.registro_procesados:
+            estadisticas['eventos_procesados'] = self.registro_procesados.estadisticas()
+        return estadisticas
+    
     def _crear_evento_desde_datos(self, data: Dict[str, Any]) -> EventoDominio:
-        """Crea un evento de dominio desde los datos del mensaje"""
+        """Crea un evento de dominio desde los datos del mensaje. Retorna None si el tipo no se reconoce;
+        si el mensaje no se puede interpretar lanza la excepción para que pase por reintentos y dead-letter"""
         try:
             tipo_evento = data.get('tipo_evento')
             
@@ -196,18 +549,20 @@ class ConsumidorPubSub:
                 # Importar el evento PedidoCreado local
                 from modulos.producto.dominio.eventos_externos import PedidoCreado, EstadoPedido
                 from datetime import datetime
-                import uuid
                 
                 datos_evento = data.get('datos', {})
                 
-                # Crear el evento PedidoCreado
+                # Crear el evento PedidoCreado conservando el id publicado, que es la clave de idempotencia
                 evento = PedidoCreado(
+                    id=uuid.UUID(data['id']) if data.get('id') else uuid.uuid4(),
+                    fecha_evento=datetime.fromisoformat(data['fecha_evento']) if data.get('fecha_evento') else datetime.now(),
                     pedido_id=uuid.UUID(datos_evento.get('pedido_id')),
                     cliente_id=uuid.UUID(datos_evento.get('cliente_id')),
                     fecha_pedido=datetime.fromisoformat(datos_evento.get('fecha_pedido')) if datos_evento.get('fecha_pedido') else datetime.now(),
                     estado=EstadoPedido(datos_evento.get('estado')),
                     items_info=datos_evento.get('items_info', []),
-                    total=float(datos_evento.get('total', 0))
+                    total=float(datos_evento.get('total', 0)),
+                    reserva_id=uuid.UUID(datos_evento['reserva_id']) if datos_evento.get('reserva_id') else None
                 )
                 
                 return evento
@@ -218,4 +573,4 @@ class ConsumidorPubSub:
                 
         except Exception as e:
             logger.error(f"❌ Error creando evento desde datos: {e}")
-            return None
\ No newline at end of file
+            raise
\ No newline at end of file
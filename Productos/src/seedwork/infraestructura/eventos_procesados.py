@@ -0,0 +1,221 @@
+"""Registro de eventos procesados reusable parte del seedwork del proyecto
+
+En este archivo usted encontrará el registro que hace idempotente el consumo de eventos:
+antes de ejecutar un manejador se reclama el id del evento (EventoDominio.id) en una tabla,
+y un cache LRU en memoria descarta los duplicados recientes sin ir a la base.
+
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+from uuid import UUID
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as insert_postgres
+from seedwork.infraestructura.cache import CacheLRU
+
+logger = logging.getLogger(__name__)
+
+NUEVO = 'NUEVO'
+DUPLICADO = 'DUPLICADO'
+EN_PROCESO = 'EN_PROCESO'
+PROCESADO = 'PROCESADO'
+
+
+def completar_eventos_procesados(sesion, modelo, evento_ids: List[UUID]):
+    """Marca como procesados, dentro de la transacción en curso y sin hacer commit, los eventos reclamados.
+    Los manejadores cuyos efectos no son idempotentes lo llaman antes de su commit: si el proceso muere
+    después, la reentrega encuentra el evento PROCESADO en lugar de retomar el reclamo y aplicarlo otra vez."""
+    if not evento_ids:
+        return
+    tabla = modelo.__table__
+    sesion.execute(
+        update(tabla)
+        .where(tabla.c.evento_id.in_(evento_ids))
+        .where(tabla.c.estado == EN_PROCESO)
+        .values(estado=PROCESADO, procesado_en=datetime.now()),
+        bind_arguments={'mapper': modelo}
+    )
+
+
+class RegistroEventosProcesados:
+    """Reclama, completa y purga ids de eventos en la tabla del modelo recibido.
+
+    reclamar() clasifica cada id como NUEVO (quien llama debe procesarlo), DUPLICADO (ya se
+    procesó: se confirma sin ejecutar el manejador) o EN_PROCESO (otra réplica lo tiene; se
+    reintenta más tarde). Un reclamo EN_PROCESO más antiguo que el lease se puede retomar,
+    para no perder eventos si el proceso que lo reclamó murió."""
+
+    def __init__(self, db, modelo, capacidad_cache: int = None, retencion_horas: float = None,
+                 lease_segundos: float = None):
+        self.db = db
+        self.modelo = modelo
+        self.retencion = timedelta(hours=retencion_horas if retencion_horas is not None
+                                   else float(os.getenv('EVENTOS_PROCESADOS_RETENCION_HORAS', '168')))
+        self.lease = timedelta(seconds=lease_segundos if lease_segundos is not None
+                               else float(os.getenv('EVENTOS_PROCESADOS_LEASE_SEGUNDOS', '600')))
+        # El cache solo guarda ids ya procesados, por lo que un acierto siempre es un duplicado
+        self._cache = CacheLRU(
+            capacidad=capacidad_cache if capacidad_cache is not None
+            else int(os.getenv('EVENTOS_PROCESADOS_CACHE_CAPACIDAD', '100000')),
+            ttl_segundos=self.retencion.total_seconds()
+        )
+        self._lock = threading.Lock()
+        self._duplicados = 0
+        self._purgados = 0
+
+    def _ejecutar(self, sentencia):
+        return self.db.session.execute(sentencia, bind_arguments={'mapper': self.modelo})
+
+    def procesado_recientemente(self, evento_id: UUID) -> bool:
+        """Consulta solo el cache en memoria; un falso negativo se resuelve luego en reclamar()"""
+        if self._cache.obtener(evento_id) is None:
+            return False
+        with self._lock:
+            self._duplicados += 1
+        return True
+
+    def reclamar(self, evento_ids: Iterable[UUID], tipo_evento: str = None) -> Dict[UUID, str]:
+        """Reclama varios eventos con un solo INSERT ... ON CONFLICT DO NOTHING y hace commit"""
+        resultado = {}
+        pendientes = []
+        for evento_id in dict.fromkeys(evento_ids):
+            if self._cache.obtener(evento_id) is not None:
+                resultado[evento_id] = DUPLICADO
+            else:
+                pendientes.append(evento_id)
+
+        if pendientes:
+            try:
+                resultado.update(self._reclamar_en_base(pendientes, tipo_evento))
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                raise
+
+        duplicados = sum(1 for estado in resultado.values() if estado == DUPLICADO)
+        if duplicados:
+            with self._lock:
+                self._duplicados += duplicados
+        return resultado
+
+    def _reclamar_en_base(self, evento_ids: List[UUID], tipo_evento: str) -> Dict[UUID, str]:
+        tabla = self.modelo.__table__
+        ahora = datetime.now()
+        reclamados = set(self._ejecutar(
+            insert_postgres(tabla)
+            .values([{'evento_id': evento_id, 'tipo_evento': tipo_evento, 'estado': EN_PROCESO, 'reclamado_en': ahora}
+                     for evento_id in evento_ids])
+            .on_conflict_do_nothing(index_elements=[tabla.c.evento_id])
+            .returning(tabla.c.evento_id)
+        ).scalars().all())
+        resultado = {evento_id: NUEVO for evento_id in reclamados}
+
+        existentes = [evento_id for evento_id in evento_ids if evento_id not in reclamados]
+        if not existentes:
+            return resultado
+        filas = self._ejecutar(
+            self.db.select(tabla.c.evento_id, tabla.c.estado, tabla.c.reclamado_en)
+            .where(tabla.c.evento_id.in_(existentes))
+        ).all()
+        for evento_id, estado, reclamado_en in filas:
+            if estado == PROCESADO:
+                resultado[evento_id] = DUPLICADO
+                self._cache.guardar(evento_id, True)
+            elif reclamado_en is not None and reclamado_en < ahora - self.lease:
+                # Reclamo abandonado: se retoma solo si nadie lo retomó antes (condicionado al valor leído)
+                retomado = self._ejecutar(
+                    self.db.update(tabla)
+                    .where(tabla.c.evento_id == evento_id)
+                    .where(tabla.c.estado == EN_PROCESO)
+                    .where(tabla.c.reclamado_en == reclamado_en)
+                    .values(reclamado_en=ahora)
+                ).rowcount
+                resultado[evento_id] = NUEVO if retomado else EN_PROCESO
+            else:
+                resultado[evento_id] = EN_PROCESO
+        # Si la fila se purgó entre el INSERT y el SELECT, el evento se trata como en proceso y se reintenta
+        for evento_id in existentes:
+            resultado.setdefault(evento_id, EN_PROCESO)
+        return resultado
+
+    def completar(self, evento_ids: List[UUID]):
+        """Marca como procesados los eventos cuyo manejador terminó bien"""
+        if not evento_ids:
+            return
+        try:
+            completar_eventos_procesados(self.db.session, self.modelo, evento_ids)
+            self.db.session.commit()
+        except Exception:
+            self.db.session.rollback()
+            raise
+        for evento_id in evento_ids:
+            self._cache.guardar(evento_id, True)
+
+    def liberar(self, evento_ids: List[UUID]):
+        """Elimina el reclamo de eventos cuyo manejador falló, para que la reentrega los procese"""
+        if not evento_ids:
+            return
+        tabla = self.modelo.__table__
+        try:
+            self._ejecutar(
+                self.db.delete(tabla)
+                .where(tabla.c.evento_id.in_(evento_ids))
+                .where(tabla.c.estado == EN_PROCESO)
+            )
+            self.db.session.commit()
+        except Exception as e:
+            # Si no se puede liberar, el reclamo se retoma cuando venza el lease
+            logger.warning(f"No se pudieron liberar {len(evento_ids)} eventos reclamados: {e}")
+            self.db.session.rollback()
+
+    def purgar(self) -> int:
+        """Elimina los reclamos más antiguos que la retención; Pub/Sub no reentrega mensajes tan antiguos"""
+        tabla = self.modelo.__table__
+        try:
+            eliminados = self._ejecutar(
+                self.db.delete(tabla)
+                .where(tabla.c.reclamado_en < datetime.now() - self.retencion)
+            ).rowcount
+            self.db.session.commit()
+        except Exception as e:
+            print(f"[IDEMPOTENCIA] Error purgando eventos procesados: {e}")
+            self.db.session.rollback()
+            return 0
+        with self._lock:
+            self._purgados += eliminados
+        if eliminados:
+            print(f"[IDEMPOTENCIA] {eliminados} eventos procesados purgados")
+        return eliminados
+
+    def iniciar_purga(self, app) -> threading.Thread:
+        """Inicia un hilo que purga cada EVENTOS_PROCESADOS_PURGA_INTERVALO_SEGUNDOS (0 lo deshabilita)"""
+        intervalo = float(os.getenv('EVENTOS_PROCESADOS_PURGA_INTERVALO_SEGUNDOS', '3600'))
+        if intervalo <= 0:
+            print("[IDEMPOTENCIA] Purga de eventos procesados deshabilitada")
+            return None
+
+        def ejecutar():
+            while True:
+                time.sleep(intervalo)
+                with app.app_context():
+                    try:
+                        self.purgar()
+                    finally:
+                        self.db.session.remove()
+
+        hilo = threading.Thread(target=ejecutar, name='purga-eventos-procesados', daemon=True)
+        hilo.start()
+        print(f"[IDEMPOTENCIA] Purga de eventos procesados iniciada cada {intervalo} segundos")
+        return hilo
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                'duplicados_descartados': self._duplicados,
+                'purgados': self._purgados,
+                'cache': self._cache.estadisticas()
+            }
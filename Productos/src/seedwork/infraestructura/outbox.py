@@ -0,0 +1,208 @@
+"""Outbox transaccional reusable parte del seedwork del proyecto
+
+En este archivo usted encontrará las utilidades para guardar los eventos de una
+agregación en la tabla de outbox dentro de la misma transacción que su escritura,
+y el relay que los publica hacia Pub/Sub en lotes ordenados (entrega al menos una vez).
+
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import wait
+from datetime import datetime, timedelta
+from typing import Any, Dict
+from sqlalchemy import select, delete
+from seedwork.dominio.eventos import despachador_eventos
+from seedwork.infraestructura.codificacion import CODEC_JSON, codificar_evento, obtener_codec
+
+logger = logging.getLogger(__name__)
+
+
+def registrar_eventos_outbox(sesion, modelo, agregacion) -> list:
+    """Agrega a la sesión una fila de outbox por cada evento pendiente de la agregación, sin hacer commit"""
+    eventos = list(agregacion.eventos)
+    for evento in eventos:
+        sesion.add(modelo(
+            evento_id=evento.id,
+            tipo_evento=evento.__class__.__name__,
+            agregado_id=agregacion.id,
+            payload=json.dumps(evento.to_dict())
+        ))
+    return eventos
+
+
+def despachar_eventos_locales(agregacion):
+    """Después del commit entrega los eventos a los manejadores locales y los limpia de la agregación"""
+    for evento in agregacion.eventos:
+        despachador_eventos.despachar_a_manejadores(evento)
+    agregacion.limpiar_eventos()
+
+
+class RelayOutbox:
+    """Hilo que drena el outbox hacia el publicador en lotes ordenados por secuencia.
+    Varias réplicas pueden ejecutarlo a la vez gracias a FOR UPDATE SKIP LOCKED.
+
+    Tras un fallo de publicación el relay espera con backoff exponencial según los intentos del evento y lo
+    reintenta sin límite: un error de transporte es pasajero y saltarlo rompería el orden. Solo un evento
+    cuyo payload no se puede codificar queda estacionado (estacionado_en): sigue en la tabla con su
+    ultimo_error pero el relay lo salta. Para volver a publicarlo basta con poner estacionado_en en NULL."""
+
+    def __init__(self, app, db, modelo, publicador, tamano_lote: int = None, intervalo_segundos: float = None):
+        self.app = app
+        self.db = db
+        self.modelo = modelo
+        self.publicador = publicador
+        self.tamano_lote = tamano_lote or int(os.getenv('OUTBOX_TAMANO_LOTE', '100'))
+        self.intervalo_segundos = intervalo_segundos if intervalo_segundos is not None else float(os.getenv('OUTBOX_INTERVALO_SEGUNDOS', '0.5'))
+        self.timeout_publicacion = float(os.getenv('OUTBOX_TIMEOUT_PUBLICACION_SEGUNDOS', '30'))
+        self.retencion = timedelta(hours=float(os.getenv('OUTBOX_RETENCION_HORAS', '24')))
+        self.backoff_inicial_segundos = float(os.getenv('OUTBOX_BACKOFF_INICIAL_SEGUNDOS', '1'))
+        self.backoff_maximo_segundos = float(os.getenv('OUTBOX_BACKOFF_MAXIMO_SEGUNDOS', '300'))
+        self._pausa_hasta = 0.0
+        self.codec = obtener_codec()
+        self._ultima_purga = 0.0
+        self._lock = threading.Lock()
+        self._publicados = 0
+        self._fallidos = 0
+        self._estacionados = 0
+        self._hilo = None
+
+    def procesar_lote(self) -> int:
+        """Publica el siguiente lote de eventos pendientes y retorna cuántos quedaron publicados"""
+        if not self.publicador.disponible or time.monotonic() < self._pausa_hasta:
+            return 0
+        sesion = self.db.session
+        modelo = self.modelo
+        try:
+            filas = sesion.execute(
+                select(modelo)
+                .where(modelo.publicado_en.is_(None), modelo.estacionado_en.is_(None))
+                .order_by(modelo.secuencia)
+                .limit(self.tamano_lote)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not filas:
+                sesion.commit()
+                return 0
+
+            # Se envían todos en orden (el cliente los agrupa) y luego se esperan las confirmaciones
+            envios = []
+            fallidas = []
+            for fila in filas:
+                try:
+                    datos, atributos = self._codificar(fila)
+                except Exception as e:
+                    # Un payload que no se puede codificar nunca se publicará: se estaciona de inmediato
+                    self._marcar_fallo(fila, e, estacionar=True)
+                    continue
+                try:
+                    envios.append((fila, self.publicador.publicar_serializado(fila.tipo_evento, datos, atributos)))
+                except Exception as e:
+                    # Se detiene el lote para no adelantar eventos posteriores al que falló
+                    self._marcar_fallo(fila, e)
+                    fallidas.append(fila)
+                    break
+
+            # Un único plazo para todo el lote: los bloqueos de las filas no se retienen más que eso
+            wait([futuro for _, futuro in envios], timeout=self.timeout_publicacion)
+            publicados = 0
+            for fila, futuro in envios:
+                if not futuro.done():
+                    self._marcar_fallo(fila, TimeoutError(f"Sin confirmación tras {self.timeout_publicacion}s"))
+                    fallidas.append(fila)
+                    continue
+                error = futuro.exception()
+                if error is not None:
+                    self._marcar_fallo(fila, error)
+                    fallidas.append(fila)
+                    continue
+                fila.publicado_en = datetime.utcnow()
+                publicados += 1
+            sesion.commit()
+
+            if fallidas:
+                espera = self.backoff(max(fila.intentos for fila in fallidas))
+                self._pausa_hasta = time.monotonic() + espera
+                print(f"[OUTBOX] {len(fallidas)} eventos fallaron, se reintentará en {espera:.1f}s")
+
+            with self._lock:
+                self._publicados += publicados
+            print(f"[OUTBOX] {publicados}/{len(filas)} eventos publicados")
+            return publicados
+        except Exception as e:
+            print(f"[OUTBOX] Error procesando lote del outbox: {e}")
+            sesion.rollback()
+            return 0
+
+    def _codificar(self, fila):
+        """El outbox guarda JSON legible; solo se recodifica si el codec de publicación es otro"""
+        datos = json.loads(fila.payload)
+        if self.codec.nombre == CODEC_JSON:
+            return fila.payload.encode('utf-8'), codificar_evento(datos, self.codec)[1]
+        return codificar_evento(datos, self.codec)
+
+    def _marcar_fallo(self, fila, error: Exception, estacionar: bool = False):
+        fila.intentos = (fila.intentos or 0) + 1
+        fila.ultimo_error = str(error)[:1000]
+        with self._lock:
+            self._fallidos += 1
+        if estacionar:
+            fila.estacionado_en = datetime.utcnow()
+            with self._lock:
+                self._estacionados += 1
+            logger.error(f"Evento {fila.tipo_evento} ({fila.evento_id}) estacionado en el outbox: {error}")
+        else:
+            logger.warning(f"Error publicando evento {fila.tipo_evento} ({fila.evento_id}) desde el outbox: {error}")
+
+    def backoff(self, intentos: int) -> float:
+        """Backoff exponencial con jitter: entre la mitad y el total de inicial * 2^(intentos-1)"""
+        # El exponente se acota porque los intentos de un evento crecen sin límite mientras dure la caída
+        espera = min(self.backoff_maximo_segundos, self.backoff_inicial_segundos * 2 ** min(max(intentos, 1) - 1, 30))
+        return espera / 2 + random.uniform(0, espera / 2)
+
+    def purgar_publicados(self) -> int:
+        """Elimina los eventos publicados hace más de OUTBOX_RETENCION_HORAS"""
+        try:
+            resultado = self.db.session.execute(
+                delete(self.modelo).where(self.modelo.publicado_en < datetime.utcnow() - self.retencion)
+            )
+            self.db.session.commit()
+            return resultado.rowcount
+        except Exception as e:
+            print(f"[OUTBOX] Error purgando eventos publicados: {e}")
+            self.db.session.rollback()
+            return 0
+
+    def iniciar(self) -> threading.Thread:
+        """Inicia el hilo del relay"""
+        def ejecutar():
+            while True:
+                with self.app.app_context():
+                    try:
+                        publicados = self.procesar_lote()
+                        if time.monotonic() - self._ultima_purga > 3600:
+                            self.purgar_publicados()
+                            self._ultima_purga = time.monotonic()
+                    finally:
+                        self.db.session.remove()
+                # Si el lote vino lleno probablemente hay más pendientes: continuar sin esperar
+                if publicados < self.tamano_lote:
+                    time.sleep(self.intervalo_segundos)
+
+        self._hilo = threading.Thread(target=ejecutar, name='relay-outbox', daemon=True)
+        self._hilo.start()
+        print(f"[OUTBOX] Relay iniciado (lote: {self.tamano_lote}, intervalo: {self.intervalo_segundos}s)")
+        return self._hilo
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'publicados': self._publicados,
+                'fallidos': self._fallidos,
+                'estacionados': self._estacionados,
+                'tamano_lote': self.tamano_lote
+            }
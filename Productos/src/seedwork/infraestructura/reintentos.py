@@ -0,0 +1,138 @@
+"""Reintentos con backoff exponencial y dead-letter para mensajes de Pub/Sub
+
+En este archivo usted encontrará la política que decide qué hacer con un mensaje cuyo
+procesamiento falló: posponer su reentrega o enviarlo al topic de dead-letter.
+
+"""
+
+import logging
+import random
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Pub/Sub no acepta plazos de ack mayores a 600 segundos
+MAXIMO_PLAZO_ACK_SEGUNDOS = 600
+MAXIMO_MENSAJES_RASTREADOS = 10000
+MAXIMO_LARGO_ERROR = 1000
+
+
+def nombre_topic_dlq(topic_name: str) -> str:
+    return f"{topic_name}-dlq"
+
+
+def nombre_suscripcion_dlq(topic_name: str) -> str:
+    return f"{nombre_topic_dlq(topic_name)}-sub"
+
+
+class ReintentosSuscripcion:
+    """Cuenta los intentos de cada mensaje de una suscripción y, ante un fallo, pospone su reentrega
+    (modify_ack_deadline + drop, en lugar de un nack que lo reentrega de inmediato) o, agotados
+    max_intentos, lo publica en el topic de dead-letter y lo confirma.
+
+    Si la suscripción tiene dead-letter policy, Pub/Sub informa delivery_attempt; si no, los intentos
+    se cuentan en memoria por message_id."""
+
+    def __init__(self, topic_name: str, suscripcion: str, max_intentos: int, backoff_inicial_segundos: float,
+                 backoff_maximo_segundos: float, publisher=None, topic_dlq_path: str = None):
+        self.topic_name = topic_name
+        self.suscripcion = suscripcion
+        self.max_intentos = max_intentos
+        self.backoff_inicial_segundos = backoff_inicial_segundos
+        self.backoff_maximo_segundos = min(backoff_maximo_segundos, MAXIMO_PLAZO_ACK_SEGUNDOS)
+        self._publisher = publisher
+        self.topic_dlq_path = topic_dlq_path
+        self._intentos = OrderedDict()
+        self._lock = threading.Lock()
+        self._reintentos = 0
+        self._pospuestos = 0
+        self._enviados_dlq = 0
+        self._errores_dlq = 0
+
+    def intento(self, message) -> int:
+        """Número de entrega del mensaje, empezando en 1"""
+        intento = getattr(message, 'delivery_attempt', None)
+        if intento:
+            return intento
+        with self._lock:
+            return self._intentos.get(message.message_id, 0) + 1
+
+    def exito(self, message):
+        with self._lock:
+            self._intentos.pop(message.message_id, None)
+
+    def fallo(self, message, error: str):
+        """Pospone el mensaje con backoff o lo envía al dead-letter si agotó los intentos"""
+        intento = self.intento(message)
+        with self._lock:
+            self._intentos[message.message_id] = intento
+            self._intentos.move_to_end(message.message_id)
+            while len(self._intentos) > MAXIMO_MENSAJES_RASTREADOS:
+                self._intentos.popitem(last=False)
+
+        if self.max_intentos and intento >= self.max_intentos and self._enviar_dlq(message, intento, error):
+            message.ack()
+            self.exito(message)
+            return
+
+        espera = int(self.backoff(intento))
+        logger.warning(f"🔁 Mensaje {message.message_id} de {self.topic_name} falló (intento {intento}): {error}. "
+                       f"Se reintentará en {espera}s")
+        # El mensaje deja de renovarse y Pub/Sub lo reentrega cuando vence el nuevo plazo
+        message.modify_ack_deadline(espera)
+        message.drop()
+        with self._lock:
+            self._reintentos += 1
+
+    def posponer(self, message, motivo: str):
+        """Pospone la reentrega sin contarla como intento fallido ni enviarla nunca al dead-letter; es para
+        mensajes que no fallaron sino que aún no se pueden procesar (el evento lo tiene reclamado otra réplica,
+        y si esta murió el reclamo se retoma cuando vence su lease). Con una dead-letter policy nativa de
+        Pub/Sub, delivery_attempt igual cuenta estas reentregas."""
+        espera = int(self.backoff(1))
+        logger.info(f"⏳ Mensaje {message.message_id} de {self.topic_name} pospuesto {espera}s: {motivo}")
+        message.modify_ack_deadline(espera)
+        message.drop()
+        with self._lock:
+            self._pospuestos += 1
+
+    def backoff(self, intento: int) -> float:
+        """Backoff exponencial con jitter: entre la mitad y el total de inicial * 2^(intento-1)"""
+        espera = min(self.backoff_maximo_segundos, self.backoff_inicial_segundos * 2 ** (intento - 1))
+        return max(1, espera / 2 + random.uniform(0, espera / 2))
+
+    def _enviar_dlq(self, message, intento: int, error: str) -> bool:
+        if not self._publisher or not self.topic_dlq_path:
+            return False
+        atributos = dict(getattr(message, 'attributes', None) or {})
+        atributos.update({
+            'topic_origen': self.topic_name,
+            'suscripcion_origen': self.suscripcion,
+            'intentos': str(intento),
+            'error': (error or '')[:MAXIMO_LARGO_ERROR],
+            'fallido_en': datetime.now().isoformat()
+        })
+        try:
+            self._publisher.publish(self.topic_dlq_path, message.data, **atributos).result(timeout=30)
+        except Exception as e:
+            logger.error(f"❌ No se pudo enviar {message.message_id} al dead-letter {self.topic_dlq_path}: {e}")
+            with self._lock:
+                self._errores_dlq += 1
+            return False
+        logger.error(f"☠️ Mensaje {message.message_id} de {self.topic_name} enviado al dead-letter tras {intento} intentos: {error}")
+        with self._lock:
+            self._enviados_dlq += 1
+        return True
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'reintentos': self._reintentos,
+                'pospuestos': self._pospuestos,
+                'enviados_dlq': self._enviados_dlq,
+                'errores_dlq': self._errores_dlq,
+                'mensajes_con_fallos': len(self._intentos)
+            }
@@ -1,8 +1,40 @@
 import functools
+import hashlib
+from datetime import datetime, timezone
 
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, session, url_for
+    Blueprint, Response, flash, g, redirect, render_template, request, session, url_for
 )
 
 def crear_blueprint(identificador: str, prefijo_url: str):
-    return Blueprint(identificador, __name__, url_prefix=prefijo_url)
\ No newline at end of file
+    return Blueprint(identificador, __name__, url_prefix=prefijo_url)
+
+def etag_fuerte(*partes) -> str:
+    """Genera un ETag fuerte (sin comillas) a partir de las partes que identifican una versión del recurso"""
+    contenido = '|'.join('' if parte is None else str(parte) for parte in partes)
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+def _a_utc(fecha: datetime) -> datetime:
+    # Las fechas de la base se guardan sin zona horaria y se interpretan como UTC
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha.replace(microsecond=0)
+
+def es_no_modificado(etag: str, ultima_modificacion: datetime = None) -> bool:
+    """Evalúa If-None-Match y, si no viene, If-Modified-Since contra la versión actual del recurso"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and ultima_modificacion:
+        return _a_utc(ultima_modificacion) <= request.if_modified_since
+    return False
+
+def agregar_cabeceras_validacion(response: Response, etag: str, ultima_modificacion: datetime = None) -> Response:
+    """Agrega ETag y Last-Modified a la respuesta"""
+    response.set_etag(etag)
+    if ultima_modificacion:
+        response.last_modified = _a_utc(ultima_modificacion)
+    return response
+
+def respuesta_no_modificado(etag: str, ultima_modificacion: datetime = None) -> Response:
+    """Respuesta 304 sin cuerpo con los validadores del recurso"""
+    return agregar_cabeceras_validacion(Response(status=304), etag, ultima_modificacion)
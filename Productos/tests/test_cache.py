@@ -0,0 +1,93 @@
+import pytest
+
+from seedwork.infraestructura import cache as modulo_cache
+from seedwork.infraestructura.cache import CacheLRU
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def monotonic(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = RelojFalso()
+    monkeypatch.setattr(modulo_cache, 'time', reloj)
+    return reloj
+
+
+def test_obtener_retorna_lo_guardado_y_cuenta_aciertos_y_fallos(reloj):
+    cache = CacheLRU(capacidad=10, ttl_segundos=30)
+    assert cache.obtener('a') is None
+    cache.guardar('a', 1)
+    assert cache.obtener('a') == 1
+
+    estadisticas = cache.estadisticas()
+    assert estadisticas['aciertos'] == 1
+    assert estadisticas['fallos'] == 1
+    assert estadisticas['tasa_aciertos'] == 0.5
+
+
+def test_desaloja_la_entrada_usada_hace_mas_tiempo(reloj):
+    cache = CacheLRU(capacidad=2, ttl_segundos=30)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    cache.obtener('a')
+    cache.guardar('c', 3)
+
+    assert cache.obtener('b') is None
+    assert cache.obtener('a') == 1
+    assert cache.obtener('c') == 3
+    assert cache.estadisticas()['desalojos'] == 1
+
+
+def test_la_entrada_expira_tras_el_ttl(reloj):
+    cache = CacheLRU(capacidad=10, ttl_segundos=30)
+    cache.guardar('a', 1)
+    reloj.ahora += 29
+    assert cache.obtener('a') == 1
+    reloj.ahora += 2
+    assert cache.obtener('a') is None
+
+    estadisticas = cache.estadisticas()
+    assert estadisticas['expiraciones'] == 1
+    assert estadisticas['entradas'] == 0
+
+
+def test_invalidar_y_limpiar(reloj):
+    cache = CacheLRU(capacidad=10, ttl_segundos=30)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    cache.guardar('c', 3)
+    cache.invalidar('a')
+    cache.invalidar('no-existe')
+    assert cache.obtener('a') is None
+
+    cache.limpiar()
+    assert cache.obtener('b') is None
+    assert cache.estadisticas()['invalidaciones'] == 3
+
+
+def test_descarta_lecturas_cargadas_antes_de_una_invalidacion(reloj):
+    cache = CacheLRU(capacidad=10, ttl_segundos=30)
+
+    def cargar():
+        # Otra escritura invalida la clave mientras el valor se carga
+        cache.invalidar('a')
+        return 'obsoleto'
+
+    assert cache.obtener_o_cargar('a', cargar) == 'obsoleto'
+    assert cache.obtener('a') is None
+    assert cache.obtener_o_cargar('a', lambda: 'vigente') == 'vigente'
+    assert cache.obtener('a') == 'vigente'
+
+
+def test_capacidad_cero_deshabilita_el_cache(reloj):
+    cache = CacheLRU(capacidad=0)
+    cache.guardar('a', 1)
+    assert not cache.habilitado
+    assert cache.obtener('a') is None
+    assert cache.estadisticas()['fallos'] == 0
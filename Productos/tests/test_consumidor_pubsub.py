@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+pytest.importorskip('google.cloud.pubsub_v1')
+
+from seedwork.infraestructura.consumidor_pubsub import AcumuladorLote
+
+
+class Receptor:
+    def __init__(self, lotes_esperados: int = 1):
+        self.lotes = []
+        self._restantes = lotes_esperados
+        self.listo = threading.Event()
+
+    def __call__(self, lote):
+        self.lotes.append(lote)
+        self._restantes -= 1
+        if self._restantes <= 0:
+            self.listo.set()
+
+
+def test_entrega_el_lote_al_llegar_a_max_mensajes():
+    receptor = Receptor()
+    acumulador = AcumuladorLote(receptor, max_mensajes=3, espera_segundos=60, nombre='prueba')
+    for elemento in range(3):
+        acumulador.agregar(elemento)
+
+    assert receptor.listo.wait(5)
+    assert receptor.lotes == [[0, 1, 2]]
+
+
+def test_entrega_un_lote_incompleto_al_vencer_la_espera():
+    receptor = Receptor()
+    acumulador = AcumuladorLote(receptor, max_mensajes=100, espera_segundos=0.05, nombre='prueba')
+    acumulador.agregar('a')
+    acumulador.agregar('b')
+
+    assert receptor.listo.wait(5)
+    assert receptor.lotes == [['a', 'b']]
+
+
+def test_un_error_al_procesar_no_detiene_el_acumulador():
+    recibidos = []
+    listo = threading.Event()
+
+    def procesar(lote):
+        recibidos.append(lote)
+        if len(recibidos) == 1:
+            raise RuntimeError('falla del manejador')
+        listo.set()
+
+    acumulador = AcumuladorLote(procesar, max_mensajes=1, espera_segundos=60, nombre='prueba')
+    acumulador.agregar('a')
+    acumulador.agregar('b')
+
+    assert listo.wait(5)
+    assert recibidos == [['a'], ['b']]
@@ -0,0 +1,39 @@
+import uuid
+
+from modulos.producto.aplicacion.dto import ProductoDTO
+from modulos.producto.aplicacion.mapeadores import MapeadorProducto
+from modulos.producto.dominio.entidades import TipoProducto
+from modulos.producto.dominio.fabricas import FabricaProducto
+from modulos.producto.dominio.objetos_valor import Nombre, Descripcion
+
+
+def crear_dto(**cambios) -> ProductoDTO:
+    datos = dict(nombre='Acetaminofén', descripcion='Caja x 20', precio=12500.0, stock=10,
+                 marca='Genfar', lote='L-001', tipo_producto_id=uuid.uuid4())
+    datos.update(cambios)
+    return ProductoDTO(**datos)
+
+
+def test_crear_objetos_separa_validos_de_rechazados():
+    dtos = [crear_dto(), crear_dto(nombre='  '), crear_dto(precio=0.0), crear_dto(precio=10)]
+    productos, errores = FabricaProducto().crear_objetos(dtos, MapeadorProducto())
+
+    assert [producto.id for producto in productos] == [dtos[0].id]
+    assert [indice for indice, _ in errores] == [1, 2, 3]
+    assert 'El nombre del producto no puede ser vacio' in errores[0][1]
+    assert 'El precio del producto no puede ser vacio' in errores[1][1]
+    assert 'El precio del producto debe ser numerico' in errores[2][1]
+
+
+def test_crear_objetos_usa_el_tipo_ya_cargado():
+    tipo = TipoProducto(id=uuid.uuid4(), nombre=Nombre('Analgésicos'), descripcion=Descripcion('Dolor'))
+    productos, errores = FabricaProducto().crear_objetos([crear_dto(tipo_producto_id=tipo.id)], MapeadorProducto(),
+                                                         {tipo.id: tipo})
+    assert errores == []
+    assert productos[0].tipo is tipo
+
+
+def test_crear_objetos_sin_tipo_cargado_usa_uno_por_defecto():
+    dto = crear_dto()
+    productos, _ = FabricaProducto().crear_objetos([dto], MapeadorProducto(), {})
+    assert productos[0].tipo.id == dto.tipo_producto_id
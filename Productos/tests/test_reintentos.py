@@ -0,0 +1,125 @@
+import pytest
+
+from seedwork.infraestructura import reintentos as modulo_reintentos
+from seedwork.infraestructura.reintentos import ReintentosSuscripcion, MAXIMO_PLAZO_ACK_SEGUNDOS
+
+
+class MensajeFalso:
+    def __init__(self, message_id='m-1', delivery_attempt=None):
+        self.message_id = message_id
+        self.delivery_attempt = delivery_attempt
+        self.data = b'{}'
+        self.attributes = {'tipo_evento': 'PedidoCreado'}
+        self.plazos = []
+        self.confirmado = False
+        self.soltado = False
+
+    def ack(self):
+        self.confirmado = True
+
+    def drop(self):
+        self.soltado = True
+
+    def modify_ack_deadline(self, segundos):
+        self.plazos.append(segundos)
+
+
+class ResultadoFalso:
+    def __init__(self, error=None):
+        self.error = error
+
+    def result(self, timeout=None):
+        if self.error:
+            raise self.error
+
+
+class PublisherFalso:
+    def __init__(self, error=None):
+        self.error = error
+        self.publicados = []
+
+    def publish(self, topic, data, **atributos):
+        self.publicados.append((topic, data, atributos))
+        return ResultadoFalso(self.error)
+
+
+@pytest.fixture(autouse=True)
+def sin_jitter(monkeypatch):
+    # Con el jitter en su máximo la espera es exactamente inicial * 2^(intento-1)
+    monkeypatch.setattr(modulo_reintentos.random, 'uniform', lambda minimo, maximo: maximo)
+
+
+def crear_reintentos(publisher=None, max_intentos=3):
+    return ReintentosSuscripcion('pedidos', 'pedidos-sub', max_intentos=max_intentos, backoff_inicial_segundos=10,
+                                 backoff_maximo_segundos=60, publisher=publisher, topic_dlq_path='topics/pedidos-dlq')
+
+
+def test_backoff_exponencial_acotado_al_maximo():
+    reintentos = crear_reintentos()
+    assert [reintentos.backoff(intento) for intento in (1, 2, 3, 4, 5)] == [10, 20, 40, 60, 60]
+
+
+def test_el_maximo_no_supera_el_plazo_de_ack_de_pubsub():
+    reintentos = ReintentosSuscripcion('pedidos', 'pedidos-sub', 3, 10, 3600)
+    assert reintentos.backoff_maximo_segundos == MAXIMO_PLAZO_ACK_SEGUNDOS
+
+
+def test_sin_delivery_attempt_cuenta_los_intentos_en_memoria():
+    reintentos = crear_reintentos(max_intentos=0)
+    mensaje = MensajeFalso()
+    reintentos.fallo(mensaje, 'error')
+    reintentos.fallo(mensaje, 'error')
+
+    assert reintentos.intento(mensaje) == 3
+    assert mensaje.plazos == [10, 20]
+    assert mensaje.soltado and not mensaje.confirmado
+
+    reintentos.exito(mensaje)
+    assert reintentos.intento(mensaje) == 1
+
+
+def test_agotados_los_intentos_envia_al_dead_letter_y_confirma():
+    publisher = PublisherFalso()
+    reintentos = crear_reintentos(publisher)
+    mensaje = MensajeFalso(delivery_attempt=3)
+    reintentos.fallo(mensaje, 'falla permanente')
+
+    assert mensaje.confirmado
+    assert mensaje.plazos == []
+    topic, data, atributos = publisher.publicados[0]
+    assert topic == 'topics/pedidos-dlq'
+    assert data == mensaje.data
+    assert atributos['intentos'] == '3'
+    assert atributos['error'] == 'falla permanente'
+    assert atributos['tipo_evento'] == 'PedidoCreado'
+    assert reintentos.estadisticas()['enviados_dlq'] == 1
+
+
+def test_si_el_dead_letter_falla_el_mensaje_se_pospone():
+    reintentos = crear_reintentos(PublisherFalso(error=RuntimeError('sin conexión')))
+    mensaje = MensajeFalso(delivery_attempt=3)
+    reintentos.fallo(mensaje, 'falla permanente')
+
+    assert not mensaje.confirmado
+    assert mensaje.soltado
+    assert mensaje.plazos == [40]
+    assert reintentos.estadisticas()['errores_dlq'] == 1
+
+
+def test_antes_del_maximo_no_envia_al_dead_letter():
+    publisher = PublisherFalso()
+    reintentos = crear_reintentos(publisher)
+    reintentos.fallo(MensajeFalso(delivery_attempt=2), 'error')
+    assert publisher.publicados == []
+
+
+def test_posponer_no_cuenta_como_intento():
+    publisher = PublisherFalso()
+    reintentos = crear_reintentos(publisher, max_intentos=1)
+    mensaje = MensajeFalso()
+    reintentos.posponer(mensaje, 'reclamado por otra réplica')
+
+    assert mensaje.plazos == [10]
+    assert reintentos.intento(mensaje) == 1
+    assert publisher.publicados == []
+    assert reintentos.estadisticas()['pospuestos'] == 1
@@ -0,0 +1,168 @@
+"""Benchmark de escritura: pedidos por segundo al guardar un pedido en comandos y en consultas
+
+Compara RepositorioPedidoComandoPostgreSQL.agregar en tres modos:
+
+  1. anterior:  items con session.add uno a uno, commit, y la proyección con un SELECT,
+                la carga perezosa de los items y un segundo commit
+  2. nuevo:     pedido e items con un INSERT cada uno (items en executemany) y la
+                proyección construida en memoria con un solo INSERT
+  3. combinado: PEDIDOS_ESCRITURA_COMBINADA; pedido, items y outbox en una sola
+                sentencia con CTEs y la proyección confirmada en el mismo session.commit()
+                (no atómico entre las dos bases; solo PostgreSQL, con otro motor se mide
+                igual que "nuevo")
+
+Usa las bases de COMMANDS_DATABASE_URL y QUERIES_DATABASE_URL (crea las tablas si no
+existen) y además de pedidos/s informa cuántas sentencias y commits cuesta cada pedido.
+
+Uso:
+    python benchmarks/benchmark_escritura_pedidos.py [--pedidos 2000] [--items 5] [--modos anterior nuevo combinado]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from flask import Flask
+from sqlalchemy import BigInteger, Integer, event
+from config.config.db_postgres import db, init_databases, create_all_tables
+from modulos.ventas.dominio.entidades import Pedido, Item
+from modulos.ventas.infraestructura.dto_postgres import ItemComando, PedidoConsulta, EventoOutbox
+from modulos.ventas.infraestructura.mapeadores_postgres import MapeadorPedidoComando
+from modulos.ventas.infraestructura.repositorios import RepositorioPedidoComandoPostgreSQL
+from seedwork.infraestructura.outbox import registrar_eventos_outbox
+
+MODOS = ('anterior', 'nuevo', 'combinado')
+
+
+def generar_pedidos(cantidad: int, items: int):
+    pedidos = []
+    for _ in range(cantidad):
+        pedido = Pedido(cliente_id=uuid.uuid4())
+        pedido.aprobar([Item(producto_id=uuid.uuid4(), cantidad=2, precio=1250.5, total=2501.0) for _ in range(items)])
+        pedidos.append(pedido)
+    return pedidos
+
+
+def agregar_anterior(pedido: Pedido):
+    """Camino de escritura previo a la inserción en bloque, reproducido para comparar"""
+    try:
+        pedido_modelo = MapeadorPedidoComando().entidad_a_dto(pedido)
+        db.session.add(pedido_modelo)
+        db.session.flush()
+        for item in pedido.items:
+            db.session.add(ItemComando(
+                pedido_id=pedido_modelo.id,
+                producto_id=item.producto_id,
+                cantidad=item.cantidad,
+                precio=item.precio,
+                total=item.total
+            ))
+        registrar_eventos_outbox(db.session, EventoOutbox, pedido)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    existente = PedidoConsulta.query.filter_by(id=pedido_modelo.id).first()
+    if existente is None:
+        db.session.add(PedidoConsulta(
+            id=pedido_modelo.id,
+            cliente_id=pedido_modelo.cliente_id,
+            fecha_pedido=pedido_modelo.fecha_pedido,
+            estado=pedido_modelo.estado,
+            total=pedido_modelo.total,
+            cantidad_items=len(pedido_modelo.items),
+            items_detalle=json.dumps([{
+                'producto_id': str(item.producto_id),
+                'cantidad': item.cantidad,
+                'precio': float(item.precio),
+                'total': float(item.total)
+            } for item in pedido_modelo.items]),
+            fecha_ultima_actualizacion=datetime.utcnow()
+        ))
+    db.session.commit()
+
+
+class ContadorViajes:
+    """Cuenta sentencias y commits enviados a las bases de comandos y consultas"""
+
+    def __init__(self, engines):
+        self.sentencias = 0
+        self.commits = 0
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._sentencia)
+            event.listen(engine, 'commit', self._commit)
+
+    def _sentencia(self, *args):
+        self.sentencias += 1
+
+    def _commit(self, *args):
+        self.commits += 1
+
+    def reiniciar(self):
+        self.sentencias = 0
+        self.commits = 0
+
+
+def medir(modo: str, pedidos: list, contador: ContadorViajes) -> dict:
+    repositorio = RepositorioPedidoComandoPostgreSQL()
+    repositorio.escritura_combinada = modo == 'combinado'
+    agregar = agregar_anterior if modo == 'anterior' else repositorio.agregar
+    contador.reiniciar()
+    inicio = time.perf_counter()
+    for pedido in pedidos:
+        agregar(pedido)
+        db.session.expunge_all()
+    duracion = time.perf_counter() - inicio
+    return {
+        'pedidos_por_segundo': len(pedidos) / duracion,
+        'sentencias': contador.sentencias / len(pedidos),
+        'commits': contador.commits / len(pedidos)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pedidos', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+    args = parser.parse_args()
+
+    # En sqlite solo una columna INTEGER PRIMARY KEY se autoincrementa; en PostgreSQL sigue siendo BIGINT
+    EventoOutbox.__table__.c.secuencia.type = BigInteger().with_variant(Integer, 'sqlite')
+
+    app = Flask(__name__)
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_databases(app)
+    with app.app_context():
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_all_tables()
+        contador = ContadorViajes([db.engines['commands'], db.engines['queries']])
+        motor = db.engines['commands'].dialect.name
+        if 'combinado' in args.modos and motor != 'postgresql':
+            print("Aviso: la escritura combinada requiere PostgreSQL; en este motor 'combinado' mide lo mismo que 'nuevo'")
+
+        # Calentamiento: conexiones del pool y compilación de sentencias
+        for modo in args.modos:
+            medir(modo, generar_pedidos(20, args.items), contador)
+
+        resultados = {modo: medir(modo, generar_pedidos(args.pedidos, args.items), contador) for modo in args.modos}
+
+    print(f"Pedidos: {args.pedidos} con {args.items} items cada uno ({motor})")
+    base = resultados.get('anterior')
+    for modo, resultado in resultados.items():
+        mejora = f"  ({resultado['pedidos_por_segundo'] / base['pedidos_por_segundo']:.2f}x)" if base and modo != 'anterior' else ''
+        print(f"  {modo:<10} {resultado['pedidos_por_segundo']:9.1f} pedidos/s  "
+              f"{resultado['sentencias']:5.1f} sentencias/pedido  {resultado['commits']:4.1f} commits/pedido{mejora}")
+
+
+if __name__ == '__main__':
+    main()
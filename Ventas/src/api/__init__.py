@@ -17,7 +17,7 @@ def importar_modelos_postgres():
     try:
         from modulos.ventas.infraestructura.dto_postgres import (
             # Modelos de comandos
-            PedidoComando, ItemComando,
+            PedidoComando, ItemComando, EventoOutbox, SolicitudPedido,
             # Modelos de consultas
             PedidoConsulta, ItemConsulta
         )
@@ -26,11 +26,11 @@ def importar_modelos_postgres():
         logger.error(f"❌ Error importando modelos PostgreSQL: {e}")
         raise
 
-def inicializar_sistema_eventos():
+def inicializar_sistema_eventos(app):
     """Inicializa el sistema de eventos"""
     try:
         from modulos.ventas.aplicacion.configuracion_eventos import configurar_sistema_eventos
-        if configurar_sistema_eventos():
+        if configurar_sistema_eventos(app):
             logger.info("✅ Sistema de eventos inicializado correctamente")
         else:
             logger.warning("⚠️ Sistema de eventos no se pudo configurar")
@@ -39,6 +39,16 @@ def inicializar_sistema_eventos():
 
 
 
+def inicializar_procesador_pedidos(app):
+    """Inicia los workers que aprueban o rechazan los pedidos aceptados en modo asíncrono"""
+    try:
+        from modulos.ventas.aplicacion.comandos.procesar_pedido import iniciar_procesador_pedidos
+        iniciar_procesador_pedidos(app)
+        logger.info("✅ Procesador de pedidos pendientes inicializado")
+    except Exception as e:
+        logger.warning(f"⚠️ Procesador de pedidos pendientes no disponible: {e}")
+
+
 def create_app(configuracion=None):
     try:
         # Init la aplicacion de Flask
@@ -53,12 +63,15 @@ def create_app(configuracion=None):
         
         init_databases(app)
         importar_modelos_postgres()
-        inicializar_sistema_eventos()
 
         with app.app_context():
             create_all_tables()
             logger.info("✅ Bases de datos PostgreSQL inicializadas")
 
+        # Después de crear las tablas, porque el relay del outbox empieza a leerlas de inmediato
+        inicializar_sistema_eventos(app)
+        inicializar_procesador_pedidos(app)
+
         
         # Importa Blueprints
         from . import ventas
@@ -75,7 +88,14 @@ def create_app(configuracion=None):
 
         @app.route("/health")
         def health():
-            return {"status": "up"}
+            from modulos.ventas.infraestructura.cliente_productos import estadisticas_resiliencia
+            return {
+                "status": "up",
+                "publicador_pubsub": app.extensions['publicador_pubsub'].estadisticas() if 'publicador_pubsub' in app.extensions else None,
+                "outbox": app.extensions['relay_outbox'].estadisticas() if 'relay_outbox' in app.extensions else None,
+                "productos_service": estadisticas_resiliencia(),
+                "procesador_pedidos": app.extensions['procesador_pedidos'].estadisticas() if 'procesador_pedidos' in app.extensions else None
+            }
 
         logger.info("Aplicación Flask configurada correctamente")
         return app
@@ -1,11 +1,16 @@
 import seedwork.presentacion.api as api
 import json
+import os
+import uuid
 from modulos.ventas.aplicacion.mapeadores import MapeadorPedidoDTOJson, MapeadorPedido
 from flask import request, Response, Blueprint
 from modulos.ventas.aplicacion.comandos.crear_pedido import CrearPedido
+from modulos.ventas.aplicacion.comandos.registrar_pedido import RegistrarPedido
+from modulos.ventas.aplicacion.consultas.obtener_pedido import ObtenerPedidoConsulta
 from seedwork.aplicacion.comandos import ejecutar_comando
 from modulos.ventas.aplicacion.consultas.obtener_todos_los_pedidos import ObtenerTodosLosPedidosConsulta
 from seedwork.aplicacion.consultas import ejecutar_consulta
+from modulos.ventas.infraestructura.excepciones import ServicioProductosNoDisponible
 
 
 import logging
@@ -14,6 +19,9 @@ logger = logging.getLogger(__name__)
 
 bp = api.crear_blueprint('ventas', '/api/ventas')
 
+# En modo asíncrono el pedido se acepta PENDIENTE y un worker lo aprueba o rechaza después
+PROCESAMIENTO_ASINCRONO = os.getenv('PEDIDOS_PROCESAMIENTO_ASINCRONO', 'true').lower() == 'true'
+
 
 @bp.route('/', methods=['POST'])
 def crear_pedido():
@@ -30,6 +38,22 @@ def crear_pedido():
                 'cantidad': item.cantidad
             })
 
+        if PROCESAMIENTO_ASINCRONO:
+            comando = RegistrarPedido(
+                cliente_id=pedido_dto.cliente_id,
+                fecha_pedido=pedido_dto.fecha_pedido,
+                items=items_simplificados
+            )
+            resultado = ejecutar_comando(comando)
+            logger.info(f"Pedido {resultado.id} aceptado, pendiente de aprobación")
+            respuesta = Response(
+                json.dumps({'id': str(resultado.id), 'estado': resultado.estado.value}),
+                status=202,
+                mimetype='application/json'
+            )
+            respuesta.headers['Location'] = f"/api/ventas/{resultado.id}"
+            return respuesta
+
         comando = CrearPedido(
             cliente_id=pedido_dto.cliente_id,
             fecha_pedido=pedido_dto.fecha_pedido,
@@ -42,8 +66,23 @@ def crear_pedido():
         return Response('{}', status=202, mimetype='application/json')
         
         
-    except ValueError as e:
-        # Errores de validación (productos no encontrados, stock insuficiente, etc.)
+    except ServicioProductosNoDisponible as e:
+        # El servicio de productos falló, no respondió a tiempo o su circuito está abierto
+        logger.warning(f"Servicio de productos no disponible al crear pedido: {e}")
+        respuesta = Response(
+            json.dumps({
+                "error": "Servicio de productos no disponible",
+                "message": str(e),
+                "type": "dependency_unavailable"
+            }),
+            status=503,
+            mimetype='application/json'
+        )
+        if e.reintentar_en is not None:
+            respuesta.headers['Retry-After'] = str(max(1, int(e.reintentar_en)))
+        return respuesta
+    except (ValueError, KeyError, TypeError) as e:
+        # Errores de validación (payload inválido, productos no encontrados, stock insuficiente, etc.)
         logger.warning(f"Error de validación al crear pedido: {e}")
         return Response(
             json.dumps({
@@ -84,3 +123,20 @@ def obtener_todos_los_pedidos():
         return Response(json.dumps(pedidos_json), status=200, mimetype='application/json')
     except Exception as e:
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
+@bp.route('/<pedido_id>', methods=['GET'])
+def obtener_pedido(pedido_id):
+    """Estado de un pedido; en modo asíncrono el cliente lo consulta hasta que deje de estar PENDIENTE"""
+    try:
+        pedido_id = uuid.UUID(pedido_id)
+    except ValueError:
+        return Response(json.dumps(dict(error=f"ID de pedido inválido: {pedido_id}")), status=400, mimetype='application/json')
+    try:
+        resultado = ejecutar_consulta(ObtenerPedidoConsulta(pedido_id=pedido_id))
+        if resultado.resultado is None:
+            return Response(json.dumps(dict(error=f"Pedido {pedido_id} no encontrado")), status=404, mimetype='application/json')
+        
+        pedido_dto = MapeadorPedido().entidad_a_dto(resultado.resultado)
+        return Response(json.dumps(MapeadorPedidoDTOJson().dto_a_externo(pedido_dto)), status=200, mimetype='application/json')
+    except Exception as e:
+        return Response(json.dumps(dict(error=str(e))), status=500, mimetype='application/json')
@@ -41,7 +41,7 @@ def create_all_tables():
         # Importar modelos para que estén registrados en metadata
         from modulos.ventas.infraestructura.dto_postgres import (
             # Modelos de comandos
-            PedidoComando, ItemComando,
+            PedidoComando, ItemComando, EventoOutbox, SolicitudPedido,
             # Modelos de consultas
             PedidoConsulta, ItemConsulta
         )
@@ -50,6 +50,8 @@ def create_all_tables():
         # Crear tablas de comandos usando bind específico
         PedidoComando.__table__.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
         ItemComando.__table__.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
+        EventoOutbox.__table__.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
+        SolicitudPedido.__table__.create(bind=db.get_engine(bind_key='commands'), checkfirst=True)
         print("✅ Tablas de comandos creadas")
         
         print("🔨 Creando tablas de consultas...")
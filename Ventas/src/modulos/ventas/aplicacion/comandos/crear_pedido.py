@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from seedwork.aplicacion.comandos import Comando, ejecutar_comando
+import os
 import uuid
 from datetime import datetime
 from typing import List
@@ -9,6 +10,8 @@ from modulos.ventas.dominio.repositorios_comando import RepositorioPedidoComando
 from modulos.ventas.dominio.fabricas import FabricaPedido
 from modulos.ventas.aplicacion.comandos.base import PedidoComandoBaseHandler
 from modulos.ventas.infraestructura.cliente_productos import ClienteProductos
+from seedwork.infraestructura.outbox import despachar_eventos_locales
+from seedwork.infraestructura.resiliencia import con_plazo
 
 
 @dataclass
@@ -24,81 +27,80 @@ class CrearPedidoHandler(PedidoComandoBaseHandler):
         self._mapeador = MapeadorPedido()
         self._fabrica_pedido = FabricaPedido()
         self._cliente_productos = ClienteProductos()
+        # Tiempo total que el pedido puede esperar al servicio de productos, sumando todas sus llamadas
+        self._plazo_segundos = float(os.getenv('PEDIDO_PLAZO_SEGUNDOS', '10'))
     
     def handle(self, comando: CrearPedido) -> PedidoDTO:
-        # 1. Obtener precios de productos y crear items completos
-        items_completos = self._obtener_precios_y_crear_items(comando.items)
-        
-        # 2. Calcular el total del pedido
-        total_pedido = sum(item.total for item in items_completos)
-        
-        # 3. Crear el DTO del pedido
-        pedido_dto = PedidoDTO(
-            cliente_id=comando.cliente_id,
-            fecha_pedido=comando.fecha_pedido,
-            estado=comando.estado,
-            items=items_completos,
-            total=total_pedido)
-        
-        # 4. Convertir DTO a entidad de dominio usando la fábrica
-        pedido_entidad = self._fabrica_pedido.crear_objeto(pedido_dto, self._mapeador)
-        
-        # 5. Guardar en el repositorio de comandos (que sincroniza automáticamente con consultas)
-        repositorio_comando = self.repositorio_comando
-        repositorio_comando.agregar(pedido_entidad)
+        with con_plazo(self._plazo_segundos):
+            return self._crear_pedido(comando)
+    
+    def _crear_pedido(self, comando: CrearPedido) -> PedidoDTO:
+        # 1. Reservar el stock de todo el pedido en una sola petición, que además retorna los precios
+        reserva = self._reservar_stock(comando.items)
         
-        # 6. Disparar evento de creación (opcional)
-        pedido_entidad.disparar_evento_creacion()
+        try:
+            # 2. Crear los items completos con los precios de la reserva
+            items_completos = self._crear_items(comando.items, reserva)
+            
+            # 3. Calcular el total del pedido
+            total_pedido = sum(item.total for item in items_completos)
+            
+            # 4. Crear el DTO del pedido
+            pedido_dto = PedidoDTO(
+                cliente_id=comando.cliente_id,
+                fecha_pedido=comando.fecha_pedido,
+                estado=comando.estado,
+                items=items_completos,
+                total=total_pedido)
+            
+            # 5. Convertir DTO a entidad de dominio usando la fábrica
+            pedido_entidad = self._fabrica_pedido.crear_objeto(pedido_dto, self._mapeador)
+            
+            # 6. Registrar el evento de creación (se guarda en el outbox junto con el pedido);
+            #    al recibirlo, Productos confirma la reserva
+            pedido_entidad.disparar_evento_creacion(reserva_id=reserva.reserva_id)
+            
+            # 7. Guardar en el repositorio de comandos (que sincroniza automáticamente con consultas)
+            repositorio_comando = self.repositorio_comando
+            repositorio_comando.agregar(pedido_entidad)
+        except Exception:
+            # El pedido no se creó: se devuelve el stock reservado
+            self._cliente_productos.liberar_reserva(reserva.reserva_id)
+            raise
+        despachar_eventos_locales(pedido_entidad)
         
-        # 7. Retornar el DTO del pedido creado
+        # 8. Retornar el DTO del pedido creado
         return pedido_dto
     
-    def _obtener_precios_y_crear_items(self, items: List[dict]) -> List[ItemDTO]:
-        """Obtiene los precios de los productos y crea los items completos"""
+    def _reservar_stock(self, items: List[dict], pedido_id: uuid.UUID = None):
+        """Reserva el stock de los items; falla si algún producto no existe o no tiene stock suficiente"""
         if not items:
             raise ValueError("El pedido debe tener al menos un item")
-        
+        return self._cliente_productos.reservar_stock(items, pedido_id)
+    
+    def _crear_items(self, items: List[dict], reserva) -> List[ItemDTO]:
+        """Crea los items completos con los precios vigentes al momento de reservar"""
         items_completos = []
         for item_data in items:
-            producto_id = uuid.UUID(item_data['producto_id'])
+            producto_id = uuid.UUID(str(item_data['producto_id']))
             cantidad = item_data['cantidad']
             
-            try:
-                # Obtener información del producto desde el servicio de productos
-                producto_info = self._cliente_productos.obtener_producto(producto_id)
-                
-                if not producto_info:
-                    raise ValueError(f"Producto con ID {producto_id} no encontrado")
-                
-                # Verificar stock disponible
-                stock_disponible = producto_info.stock
-                if stock_disponible < cantidad:
-                    raise ValueError(f"Stock insuficiente para el producto {producto_id}. Disponible: {stock_disponible}, Solicitado: {cantidad}")
-                
-                # Obtener precio del servicio de productos
-                precio = producto_info.precio
-                if precio <= 0:
-                    raise ValueError(f"Precio inválido para el producto {producto_id}: {precio}")
-                
-                # Calcular total del item
-                total_item = precio * cantidad
-                
-                # Crear ItemDTO completo
-                item_dto = ItemDTO(
-                    producto_id=producto_id,
-                    cantidad=cantidad,
-                    precio=precio,
-                    total=total_item
-                )
-                items_completos.append(item_dto)
-                
-            except Exception as e:
-                if "Producto con ID" in str(e) or "Stock insuficiente" in str(e) or "Precio inválido" in str(e):
-                    raise e
-                else:
-                    raise ValueError(f"Error obteniendo información del producto {producto_id}: {str(e)}")
+            producto_info = reserva.productos.get(producto_id)
+            if not producto_info:
+                raise ValueError(f"Producto con ID {producto_id} no encontrado")
+            
+            precio = producto_info.precio
+            if precio <= 0:
+                raise ValueError(f"Precio inválido para el producto {producto_id}: {precio}")
+            
+            items_completos.append(ItemDTO(
+                producto_id=producto_id,
+                cantidad=cantidad,
+                precio=precio,
+                total=precio * cantidad
+            ))
         
-        return items_completos 
+        return items_completos
 
 @ejecutar_comando.register
 def _(comando: CrearPedido):
@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+from seedwork.aplicacion.comandos import Comando, ejecutar_comando
+import uuid
+import logging
+from seedwork.infraestructura.outbox import despachar_eventos_locales
+from seedwork.infraestructura.resiliencia import con_plazo
+from modulos.ventas.aplicacion.comandos.crear_pedido import CrearPedidoHandler
+from modulos.ventas.dominio.entidades import Item
+from modulos.ventas.dominio.enums import EstadoPedido
+from modulos.ventas.infraestructura.excepciones import ServicioProductosNoDisponible
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProcesarPedido(Comando):
+    pedido_id: uuid.UUID
+    # En el último intento un servicio de productos no disponible rechaza el pedido en lugar de reintentarlo
+    ultimo_intento: bool = False
+
+class ProcesarPedidoHandler(CrearPedidoHandler):
+    """Lleva un pedido PENDIENTE a APROBADO (stock reservado y precios de la reserva) o a RECHAZADO.
+    Si el servicio de productos no está disponible lanza la excepción para que el procesador lo reintente."""
+    
+    def handle(self, comando: ProcesarPedido):
+        pedido = self.repositorio_comando.obtener_por_id(comando.pedido_id)
+        if pedido is None or pedido.estado != EstadoPedido.PENDIENTE:
+            # Ya procesado (por ejemplo, una reentrega tras vencer el lease) o eliminado: se cierra la
+            # solicitud para que no se reclame de nuevo
+            self.repositorio_comando.cerrar_solicitud(comando.pedido_id, pedido.motivo_rechazo if pedido else None)
+            return None
+        items = [{'producto_id': str(item.producto_id), 'cantidad': item.cantidad} for item in pedido.items]
+        
+        try:
+            with con_plazo(self._plazo_segundos):
+                reserva = self._reservar_stock(items, pedido.id)
+        except ServicioProductosNoDisponible as e:
+            if not comando.ultimo_intento:
+                raise
+            return self._rechazar(pedido, f"Servicio de productos no disponible: {e}")
+        except ValueError as e:
+            return self._rechazar(pedido, str(e))
+        
+        try:
+            items_completos = self._crear_items(items, reserva)
+        except ValueError as e:
+            self._cliente_productos.liberar_reserva(reserva.reserva_id)
+            return self._rechazar(pedido, str(e))
+        
+        try:
+            pedido.aprobar(
+                [Item(producto_id=item.producto_id, cantidad=item.cantidad, precio=item.precio, total=item.total)
+                 for item in items_completos],
+                reserva_id=reserva.reserva_id
+            )
+            self.repositorio_comando.actualizar(pedido)
+        except Exception:
+            self._cliente_productos.liberar_reserva(reserva.reserva_id)
+            raise
+        despachar_eventos_locales(pedido)
+        print(f"[PEDIDOS] Pedido {pedido.id} aprobado por {pedido.total}")
+        return pedido
+    
+    def _rechazar(self, pedido, motivo: str):
+        pedido.rechazar(motivo)
+        self.repositorio_comando.actualizar(pedido)
+        print(f"[PEDIDOS] Pedido {pedido.id} rechazado: {motivo}")
+        return pedido
+
+@ejecutar_comando.register
+def _(comando: ProcesarPedido):
+    handler = ProcesarPedidoHandler()
+    return handler.handle(comando)
+
+
+def iniciar_procesador_pedidos(app):
+    """Inicia el pool de workers que procesa los pedidos aceptados en modo asíncrono"""
+    from config.config.db_postgres import db
+    from modulos.ventas.infraestructura.dto_postgres import SolicitudPedido
+    from modulos.ventas.infraestructura.procesador_pedidos import ProcesadorPedidosPendientes
+    
+    procesador = ProcesadorPedidosPendientes(
+        app, db, SolicitudPedido,
+        lambda pedido_id, ultimo_intento: ejecutar_comando(ProcesarPedido(pedido_id=pedido_id, ultimo_intento=ultimo_intento))
+    )
+    procesador.iniciar()
+    app.extensions['procesador_pedidos'] = procesador
+    return procesador
@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from seedwork.aplicacion.comandos import Comando, ejecutar_comando
+import uuid
+from datetime import datetime
+from typing import List
+from flask import current_app
+from modulos.ventas.aplicacion.dto import PedidoDTO
+from modulos.ventas.aplicacion.mapeadores import MapeadorPedido
+from modulos.ventas.aplicacion.comandos.base import PedidoComandoBaseHandler
+from modulos.ventas.dominio.entidades import Pedido, Item
+from modulos.ventas.dominio.enums import EstadoPedido
+
+
+@dataclass
+class RegistrarPedido(Comando):
+    cliente_id: uuid.UUID
+    fecha_pedido: datetime
+    items: List[dict]  # Lista de dicts con producto_id y cantidad
+
+class RegistrarPedidoHandler(PedidoComandoBaseHandler):
+    """Acepta un pedido sin llamar al servicio de productos: lo guarda PENDIENTE y lo deja en cola para que
+    el procesador de pedidos lo valorice, reserve su stock y lo apruebe o rechace"""
+    
+    def __init__(self):
+        super().__init__()
+        self._mapeador = MapeadorPedido()
+    
+    def handle(self, comando: RegistrarPedido) -> PedidoDTO:
+        items = self._validar_items(comando.items)
+        pedido = Pedido(
+            cliente_id=comando.cliente_id,
+            fecha_pedido=comando.fecha_pedido,
+            estado=EstadoPedido.PENDIENTE,
+            items=items,
+            total=0.0
+        )
+        self.repositorio_comando.agregar(pedido, encolar=True)
+        
+        procesador = current_app.extensions.get('procesador_pedidos')
+        if procesador:
+            procesador.notificar()
+        return self._mapeador.entidad_a_dto(pedido)
+    
+    def _validar_items(self, items: List[dict]) -> List[Item]:
+        """Valida la forma de los items; la existencia y el stock se validan al procesar el pedido"""
+        if not items:
+            raise ValueError("El pedido debe tener al menos un item")
+        cantidades = {}
+        for item in items:
+            cantidad = item.get('cantidad')
+            if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad <= 0:
+                raise ValueError(f"Cantidad inválida para el producto {item.get('producto_id')}: {cantidad}")
+            producto_id = uuid.UUID(str(item['producto_id']))
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+        # Sin precio todavía: se completa con el de la reserva al aprobar
+        return [Item(producto_id=producto_id, cantidad=cantidad) for producto_id, cantidad in cantidades.items()]
+
+@ejecutar_comando.register
+def _(comando: RegistrarPedido):
+    handler = RegistrarPedidoHandler()
+    return handler.handle(comando)
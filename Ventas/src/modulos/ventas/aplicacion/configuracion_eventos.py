@@ -9,8 +9,9 @@ from seedwork.dominio.eventos import despachador_eventos
 
 logger = logging.getLogger(__name__)
 
-def configurar_sistema_eventos():
-    """Configura el sistema de eventos registrando el publicador Pub/Sub"""
+def configurar_sistema_eventos(app=None):
+    """Configura el sistema de eventos registrando el publicador Pub/Sub y, si se recibe la
+    aplicación, iniciando el relay del outbox"""
     try:
         # Crear instancia del publicador
         publicador_pubsub = PublicadorPubSub()
@@ -18,6 +19,16 @@ def configurar_sistema_eventos():
         # Registrar el publicador en el despachador global
         despachador_eventos.registrar_publicador(publicador_pubsub)
         
+        if app is not None:
+            from seedwork.infraestructura.outbox import RelayOutbox
+            from modulos.ventas.infraestructura.dto_postgres import EventoOutbox
+            from config.config.db_postgres import db
+            relay_outbox = RelayOutbox(app, db, EventoOutbox, publicador_pubsub)
+            relay_outbox.iniciar()
+            app.extensions['publicador_pubsub'] = publicador_pubsub
+            app.extensions['relay_outbox'] = relay_outbox
+            logger.info("📮 Relay del outbox iniciado")
+        
         logger.info("✅ Sistema de eventos configurado correctamente")
         logger.info("📡 Publicador Pub/Sub registrado en despachador global")
         
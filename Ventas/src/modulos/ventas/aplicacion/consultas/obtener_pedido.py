@@ -0,0 +1,19 @@
+from dataclasses import dataclass
+import uuid
+from seedwork.aplicacion.consultas import Consulta
+from modulos.ventas.aplicacion.consultas.base import PedidoConsultaBaseHandler
+from seedwork.aplicacion.consultas import QueryResultado, ejecutar_consulta
+
+@dataclass
+class ObtenerPedidoConsulta(Consulta):
+    pedido_id: uuid.UUID
+
+class ObtenerPedidoHandler(PedidoConsultaBaseHandler):
+    def handle(self, consulta: ObtenerPedidoConsulta) -> QueryResultado:
+        pedido = self.repositorio_consulta.obtener_por_id(consulta.pedido_id)
+        return QueryResultado(resultado=pedido)
+
+@ejecutar_consulta.register
+def _(consulta: ObtenerPedidoConsulta):
+    handler = ObtenerPedidoHandler()
+    return handler.handle(consulta)
@@ -20,4 +20,5 @@ class PedidoDTO(DTO):
     estado: EstadoPedido
     items: List[ItemDTO]
     total: float
-    id: Optional[uuid.UUID] = None
\ No newline at end of file
+    id: Optional[uuid.UUID] = None
+    motivo_rechazo: Optional[str] = None
\ No newline at end of file
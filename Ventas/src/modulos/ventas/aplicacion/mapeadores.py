@@ -36,13 +36,16 @@ class MapeadorPedidoDTOJson(AppMap):
                 'total': item.total
             })
         
-        return {
+        externo = {
             'id': str(dto.id),
             'cliente_id': str(dto.cliente_id),
             'fecha_pedido': dto.fecha_pedido.isoformat(),
             'estado': dto.estado.value,
             'items': items_externo,
             'total': dto.total}
+        if dto.motivo_rechazo:
+            externo['motivo_rechazo'] = dto.motivo_rechazo
+        return externo
 
 class MapeadorPedido(RepMap):
     def obtener_tipo(self) -> type:
@@ -65,7 +68,8 @@ class MapeadorPedido(RepMap):
             fecha_pedido=entidad.fecha_pedido,
             estado=entidad.estado,
             items=items_dto,
-            total=entidad.total)
+            total=entidad.total,
+            motivo_rechazo=entidad.motivo_rechazo)
         
     def dto_a_entidad(self, dto: PedidoDTO) -> Pedido:
         # Convertir items de ItemDTOs a entidades de dominio
@@ -1,9 +1,8 @@
 from dataclasses import dataclass, field
 from seedwork.dominio.entidades import AgregacionRaiz, Entidad
 from datetime import datetime
-from typing import List, Literal
+from typing import List, Literal, Optional
 import uuid
-from seedwork.dominio.eventos import despachador_eventos
 from modulos.ventas.dominio.eventos import PedidoCreado
 from modulos.ventas.dominio.enums import EstadoPedido
 
@@ -21,11 +20,24 @@ class Pedido(AgregacionRaiz):
     estado: EstadoPedido = field(default=EstadoPedido.PENDIENTE)
     items: List[Item] = field(default_factory=list)
     total: float = field(default=0.0)
+    motivo_rechazo: Optional[str] = field(default=None)
 
     def __post_init__(self):
         super().__post_init__()
+    
+    def aprobar(self, items: List[Item], reserva_id: uuid.UUID = None):
+        """Aprueba un pedido pendiente con los items ya valorizados y dispara su evento de creación"""
+        self.items = items
+        self.total = sum(item.total for item in items)
+        self.estado = EstadoPedido.APROBADO
+        self.disparar_evento_creacion(reserva_id=reserva_id)
+    
+    def rechazar(self, motivo: str):
+        """Rechaza un pedido pendiente; no se dispara PedidoCreado porque no hay stock reservado"""
+        self.estado = EstadoPedido.RECHAZADO
+        self.motivo_rechazo = motivo
         
-    def disparar_evento_creacion(self):
+    def disparar_evento_creacion(self, reserva_id: uuid.UUID = None):
         """Dispara el evento de creación del pedido"""
         # Convertir items a información básica para el evento
         items_info = [
@@ -44,5 +56,6 @@ class Pedido(AgregacionRaiz):
             fecha_pedido=self.fecha_pedido,
             estado=self.estado,
             items_info=items_info,
-            total=self.total)
-        despachador_eventos.publicar_evento(evento)
\ No newline at end of file
+            total=self.total,
+            reserva_id=reserva_id)
+        self.agregar_evento(evento)
\ No newline at end of file
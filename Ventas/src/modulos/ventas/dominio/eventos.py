@@ -1,6 +1,6 @@
 from seedwork.dominio.eventos import EventoDominio
 from dataclasses import dataclass, field
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import uuid
 from datetime import datetime
 from modulos.ventas.dominio.enums import EstadoPedido
@@ -13,10 +13,12 @@ class PedidoCreado(EventoDominio):
     estado: EstadoPedido = field(default=EstadoPedido.PENDIENTE)
     items_info: List[Dict[str, Any]] = field(default_factory=list)  # Información básica de items
     total: float = field(default=0.0)
+    reserva_id: Optional[uuid.UUID] = field(default=None)  # Reserva de stock que el pedido confirma
 
     def _get_datos_evento(self) -> Dict[str, Any]:
         return {
             'pedido_id': str(self.pedido_id),
+            'reserva_id': str(self.reserva_id) if self.reserva_id else None,
             'cliente_id': str(self.cliente_id),
             'fecha_pedido': self.fecha_pedido.isoformat() if self.fecha_pedido else None,
             'estado': self.estado.value if hasattr(self.estado, 'value') else str(self.estado),
@@ -2,11 +2,113 @@
 import requests
 import os
 import logging
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Optional
 from uuid import UUID
+from urllib3.util.retry import Retry
+from seedwork.infraestructura.resiliencia import (
+    CircuitBreaker, CircuitoAbierto, LatenciasRecientes, PlazoVencido, ejecutar_con_hedging, plazo_actual
+)
+from modulos.ventas.infraestructura.excepciones import ServicioProductosNoDisponible
 
 logger = logging.getLogger(__name__)
 
+# Con menos muestras el percentil no es confiable y no se hace hedging
+MINIMO_MUESTRAS_HEDGING = 20
+
+_sesion = None
+_ejecutor = None
+_ejecutor_hedging = None
+_circuito = None
+_latencias = LatenciasRecientes()
+_hedging = {'lanzados': 0, 'ganados': 0}
+_lock = threading.Lock()
+
+def _crear_adaptador(metodos_reintentables: frozenset) -> HTTPAdapter:
+    reintentos = Retry(
+        total=int(os.getenv('PRODUCTOS_SERVICE_REINTENTOS', '2')),
+        backoff_factor=float(os.getenv('PRODUCTOS_SERVICE_BACKOFF_SEGUNDOS', '0.2')),
+        status_forcelist=(502, 503, 504),
+        allowed_methods=metodos_reintentables,
+        raise_on_status=False
+    )
+    tamano_pool = int(os.getenv('PRODUCTOS_SERVICE_POOL', '20'))
+    return HTTPAdapter(pool_connections=tamano_pool, pool_maxsize=tamano_pool, max_retries=reintentos, pool_block=False)
+
+def obtener_sesion(base_url: str) -> requests.Session:
+    """Sesión compartida por el proceso: reutiliza conexiones keep-alive hacia el servicio de productos.
+    Los errores de conexión se reintentan siempre; los 502/503/504 solo en GET y en la consulta por lote,
+    nunca al reservar o liberar stock, que no son idempotentes."""
+    global _sesion
+    if _sesion is None:
+        with _lock:
+            if _sesion is None:
+                sesion = requests.Session()
+                sesion.mount('http://', _crear_adaptador(Retry.DEFAULT_ALLOWED_METHODS - {'PUT', 'DELETE'}))
+                sesion.mount('https://', _crear_adaptador(Retry.DEFAULT_ALLOWED_METHODS - {'PUT', 'DELETE'}))
+                # requests usa el adaptador con el prefijo más largo: la consulta por lote es un POST de solo lectura
+                sesion.mount(f"{base_url}/api/producto/batch", _crear_adaptador(frozenset({'POST'})))
+                _sesion = sesion
+    return _sesion
+
+def obtener_ejecutor() -> ThreadPoolExecutor:
+    """Pool para consultar en paralelo varios lotes de productos"""
+    global _ejecutor
+    if _ejecutor is None:
+        with _lock:
+            if _ejecutor is None:
+                _ejecutor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv('PRODUCTOS_SERVICE_CONCURRENCIA', '8')),
+                    thread_name_prefix='cliente-productos'
+                )
+    return _ejecutor
+
+def obtener_ejecutor_hedging() -> ThreadPoolExecutor:
+    """Pool propio para las solicitudes con hedging, que también se hacen desde los hilos de obtener_ejecutor()"""
+    global _ejecutor_hedging
+    if _ejecutor_hedging is None:
+        with _lock:
+            if _ejecutor_hedging is None:
+                _ejecutor_hedging = ThreadPoolExecutor(
+                    max_workers=2 * int(os.getenv('PRODUCTOS_SERVICE_CONCURRENCIA', '8')),
+                    thread_name_prefix='cliente-productos-hedging'
+                )
+    return _ejecutor_hedging
+
+def obtener_circuito() -> CircuitBreaker:
+    """Circuit breaker compartido por el proceso para todas las llamadas al servicio de productos"""
+    global _circuito
+    if _circuito is None:
+        with _lock:
+            if _circuito is None:
+                _circuito = CircuitBreaker(
+                    'productos-service',
+                    umbral_fallos=int(os.getenv('PRODUCTOS_SERVICE_CIRCUITO_UMBRAL_FALLOS', '5')),
+                    tiempo_abierto_segundos=float(os.getenv('PRODUCTOS_SERVICE_CIRCUITO_ABIERTO_SEGUNDOS', '30')),
+                    pruebas=int(os.getenv('PRODUCTOS_SERVICE_CIRCUITO_PRUEBAS', '1'))
+                )
+    return _circuito
+
+def _registrar_hedging(lanzado: bool, ganado: bool):
+    if lanzado:
+        with _lock:
+            _hedging['lanzados'] += 1
+            _hedging['ganados'] += int(ganado)
+
+def estadisticas_resiliencia() -> dict:
+    """Estado del circuito, latencias recientes y hedging de las llamadas al servicio de productos"""
+    with _lock:
+        hedging = dict(_hedging)
+    return {
+        'circuito': obtener_circuito().estadisticas(),
+        'latencias': _latencias.estadisticas(),
+        'hedging': {'habilitado': os.getenv('PRODUCTOS_SERVICE_HEDGING', 'false').lower() == 'true', **hedging}
+    }
+
 class ProductoInfo:
     """DTO para información de producto desde el servicio de productos"""
     def __init__(self, id: str, nombre: str, precio: float, stock: int, tipo_producto: str):
@@ -16,69 +118,121 @@ class ProductoInfo:
         self.stock = stock
         self.tipo_producto = tipo_producto
 
+class ReservaInfo:
+    """DTO para una reserva de stock hecha en el servicio de productos"""
+    def __init__(self, reserva_id: str, expira_en: str, items: List[dict]):
+        self.reserva_id = UUID(reserva_id)
+        self.expira_en = expira_en
+        # Precio y nombre por producto, con los valores vigentes al reservar
+        self.productos = {
+            UUID(item['producto_id']): ProductoInfo(
+                id=item['producto_id'],
+                nombre=item.get('nombre'),
+                precio=item['precio_unitario'],
+                stock=None,
+                tipo_producto='GENERICO'
+            )
+            for item in items
+        }
+
 class ClienteProductos:
     """Cliente HTTP para comunicarse con el servicio de productos"""
     
     def __init__(self):
         self.base_url = os.getenv('PRODUCTOS_SERVICE_URL', 'http://productos:5000')
         self.timeout = int(os.getenv('PRODUCTOS_SERVICE_TIMEOUT', '10'))
+        # Debe coincidir con el máximo de ids por lote de /api/producto/batch
+        self.tamano_lote = int(os.getenv('PRODUCTOS_SERVICE_TAMANO_LOTE', '500'))
+        self._sesion = obtener_sesion(self.base_url)
+        self._circuito = obtener_circuito()
+        # Hedging: si una consulta tarda más que el percentil indicado se envía una segunda idéntica
+        self.hedging = os.getenv('PRODUCTOS_SERVICE_HEDGING', 'false').lower() == 'true'
+        self.hedging_percentil = float(os.getenv('PRODUCTOS_SERVICE_HEDGING_PERCENTIL', '95'))
+    
+    def _solicitar(self, metodo: str, url: str, idempotente: bool = False, respetar_plazo: bool = True, **kwargs) -> requests.Response:
+        """Hace una petición a través del circuit breaker, con el timeout acotado por el plazo de la operación
+        en curso. Las peticiones idempotentes pueden usar hedging. Lanza ServicioProductosNoDisponible si
+        el circuito está abierto, se agotó el plazo, hubo un error de conexión o la respuesta es 5xx."""
+        plazo = plazo_actual() if respetar_plazo else None
+        if idempotente and self.hedging:
+            espera = _latencias.percentil(self.hedging_percentil, MINIMO_MUESTRAS_HEDGING)
+            if espera is not None and (plazo is None or espera < plazo.restante()):
+                respuesta, lanzado, ganado = ejecutar_con_hedging(
+                    lambda: self._intentar(metodo, url, plazo, **kwargs), obtener_ejecutor_hedging(), espera
+                )
+                _registrar_hedging(lanzado, ganado)
+                return respuesta
+        return self._intentar(metodo, url, plazo, **kwargs)
+    
+    def _intentar(self, metodo: str, url: str, plazo, **kwargs) -> requests.Response:
+        try:
+            timeout = plazo.timeout(self.timeout) if plazo else self.timeout
+            self._circuito.permitir()
+        except PlazoVencido as e:
+            raise ServicioProductosNoDisponible(f"Se agotó el plazo antes de llamar al servicio de productos: {url}") from e
+        except CircuitoAbierto as e:
+            raise ServicioProductosNoDisponible(str(e), e.reintentar_en) from e
         
-    def validar_producto_existe(self, producto_id: UUID) -> bool:
-        """Valida si un producto existe en el servicio de productos"""
+        # Todo intento permitido se registra como éxito o fallo, si no una prueba del circuito medio abierto quedaría colgada
+        inicio = time.monotonic()
         try:
-            url = f"{self.base_url}/api/producto/{producto_id}"
-            response = requests.get(url, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                logger.info(f"Producto {producto_id} validado exitosamente")
-                return True
-            elif response.status_code == 404:
-                logger.warning(f"Producto {producto_id} no encontrado")
-                return False
-            else:
-                logger.error(f"Error validando producto {producto_id}: {response.status_code}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error de conexión validando producto {producto_id}: {e}")
-            # En caso de error de conexión, asumimos que el producto existe para no bloquear ventas
-            # En un entorno de producción, podrías querer un comportamiento diferente
+            response = self._sesion.request(metodo, url, timeout=timeout, **kwargs)
+        except Exception as e:
+            self._circuito.registrar_fallo()
+            logger.error(f"Error de conexión con el servicio de productos ({metodo} {url}): {e}")
+            raise ServicioProductosNoDisponible(f"Error de conexión con el servicio de productos: {e}") from e
+        _latencias.registrar(time.monotonic() - inicio)
+        
+        if response.status_code >= 500:
+            self._circuito.registrar_fallo()
+            logger.error(f"El servicio de productos respondió {response.status_code} a {metodo} {url}")
+            raise ServicioProductosNoDisponible(f"El servicio de productos respondió {response.status_code}")
+        self._circuito.registrar_exito()
+        return response
+        
+    def validar_producto_existe(self, producto_id: UUID) -> bool:
+        """Valida si un producto existe en el servicio de productos.
+        Si el servicio no está disponible lanza ServicioProductosNoDisponible en lugar de suponer que existe."""
+        url = f"{self.base_url}/api/producto/{producto_id}"
+        response = self._solicitar('GET', url, idempotente=True)
+        
+        if response.status_code == 200:
+            logger.info(f"Producto {producto_id} validado exitosamente")
             return True
+        elif response.status_code == 404:
+            logger.warning(f"Producto {producto_id} no encontrado")
+            return False
+        else:
+            logger.error(f"Error validando producto {producto_id}: {response.status_code}")
+            return False
     
     def obtener_producto(self, producto_id: UUID) -> Optional[ProductoInfo]:
         """Obtiene información completa de un producto"""
-        try:
-            url = f"{self.base_url}/api/producto/{producto_id}"
-            response = requests.get(url, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                data = response.json()
-                producto = ProductoInfo(
-                    id=data['id'],
-                    nombre=data['nombre'],
-                    precio=data['precio'],
-                    stock=data['stock'],
-                    tipo_producto=data.get('tipo_producto', 'GENERICO')
-                )
-                logger.info(f"✅ Producto {producto_id} obtenido: {producto.nombre}")
-                return producto
-            elif response.status_code == 404:
-                logger.warning(f"Producto {producto_id} no encontrado")
-                return None
-            else:
-                logger.error(f"Error obteniendo producto {producto_id}: {response.status_code}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error de conexión obteniendo producto {producto_id}: {e}")
+        url = f"{self.base_url}/api/producto/{producto_id}"
+        response = self._solicitar('GET', url, idempotente=True)
+        
+        if response.status_code == 200:
+            data = response.json()
+            producto = ProductoInfo(
+                id=data['id'],
+                nombre=data['nombre'],
+                precio=data['precio'],
+                stock=data['stock'],
+                tipo_producto=data.get('tipo_producto', 'GENERICO')
+            )
+            logger.info(f"✅ Producto {producto_id} obtenido: {producto.nombre}")
+            return producto
+        elif response.status_code == 404:
+            logger.warning(f"Producto {producto_id} no encontrado")
+            return None
+        else:
+            logger.error(f"Error obteniendo producto {producto_id}: {response.status_code}")
             return None
     
     def validar_productos_existen(self, producto_ids: List[UUID]) -> Dict[UUID, bool]:
         """Valida múltiples productos de una vez"""
-        resultados = {}
-        
-        for producto_id in producto_ids:
-            resultados[producto_id] = self.validar_producto_existe(producto_id)
+        productos = self.obtener_productos(producto_ids)
+        resultados = {producto_id: producto is not None for producto_id, producto in productos.items()}
         
         productos_no_encontrados = [pid for pid, existe in resultados.items() if not existe]
         if productos_no_encontrados:
@@ -87,14 +241,84 @@ class ClienteProductos:
         return resultados
     
     def obtener_productos(self, producto_ids: List[UUID]) -> Dict[UUID, Optional[ProductoInfo]]:
-        """Obtiene información de múltiples productos"""
-        resultados = {}
-        
-        for producto_id in producto_ids:
-            resultados[producto_id] = self.obtener_producto(producto_id)
+        """Obtiene información de múltiples productos con una petición por lote al servicio de productos.
+        Si hay varios lotes se consultan en paralelo, así la latencia es la del lote más lento."""
+        producto_ids = list(dict.fromkeys(producto_ids))
+        resultados = {producto_id: None for producto_id in producto_ids}
+        lotes = [producto_ids[inicio:inicio + self.tamano_lote] for inicio in range(0, len(producto_ids), self.tamano_lote)]
         
+        if len(lotes) == 1:
+            resultados.update(self._obtener_lote(lotes[0]))
+        else:
+            # Cada lote se ejecuta con una copia del contexto para respetar el plazo de la operación
+            futuros = [obtener_ejecutor().submit(contextvars.copy_context().run, self._obtener_lote, lote) for lote in lotes]
+            for futuro in futuros:
+                resultados.update(futuro.result())
         return resultados
     
+    def _obtener_lote(self, lote: List[UUID]) -> Dict[UUID, ProductoInfo]:
+        """Consulta un lote en /api/producto/batch; si el servicio no está disponible lanza
+        ServicioProductosNoDisponible, para no confundir un lote fallido con productos inexistentes"""
+        encontrados = {}
+        url = f"{self.base_url}/api/producto/batch"
+        response = self._solicitar('POST', url, idempotente=True, json={'ids': [str(pid) for pid in lote]})
+        
+        if response.status_code != 200:
+            logger.error(f"Error obteniendo lote de {len(lote)} productos: {response.status_code}")
+            return encontrados
+        
+        data = response.json()
+        for producto_id in lote:
+            producto = data['productos'].get(str(producto_id))
+            if producto:
+                encontrados[producto_id] = ProductoInfo(
+                    id=producto['id'],
+                    nombre=producto['nombre'],
+                    precio=producto['precio'],
+                    stock=producto['stock'],
+                    tipo_producto=producto.get('tipo_producto', 'GENERICO')
+                )
+        if data.get('no_encontrados'):
+            logger.warning(f"Productos no encontrados: {data['no_encontrados']}")
+        logger.info(f"✅ Lote de {len(lote)} productos obtenido en una petición")
+        return encontrados
+    
+    def reservar_stock(self, items: List[dict], pedido_id: UUID = None) -> ReservaInfo:
+        """Reserva en una sola petición el stock de todos los items del pedido y obtiene sus precios.
+        Lanza ValueError si algún producto no existe o no tiene stock suficiente y ServicioProductosNoDisponible
+        si el servicio no responde; no se hace hedging porque reservar no es idempotente."""
+        url = f"{self.base_url}/api/producto/reservas"
+        cuerpo = {'items': [{'producto_id': str(item['producto_id']), 'cantidad': item['cantidad']} for item in items]}
+        if pedido_id:
+            cuerpo['pedido_id'] = str(pedido_id)
+        response = self._solicitar('POST', url, json=cuerpo)
+        
+        if response.status_code == 201:
+            data = response.json()
+            logger.info(f"✅ Reserva {data['reserva_id']} creada para {len(data['items'])} productos")
+            return ReservaInfo(data['reserva_id'], data.get('expira_en'), data['items'])
+        
+        try:
+            error = response.json().get('error')
+        except ValueError:
+            error = None
+        logger.warning(f"Reserva de stock rechazada ({response.status_code}): {error}")
+        raise ValueError(error or f"Error reservando stock: {response.status_code}")
+    
+    def liberar_reserva(self, reserva_id: UUID) -> bool:
+        """Libera una reserva cuyo pedido no se pudo crear; si falla, la reserva expira sola por TTL.
+        Es una compensación, por lo que no se limita al plazo de la operación que falló."""
+        try:
+            url = f"{self.base_url}/api/producto/reservas/{reserva_id}/liberar"
+            response = self._solicitar('POST', url, respetar_plazo=False)
+            if response.status_code == 200:
+                logger.info(f"Reserva {reserva_id} liberada")
+                return True
+            logger.error(f"Error liberando reserva {reserva_id}: {response.status_code}")
+        except ServicioProductosNoDisponible as e:
+            logger.error(f"No se pudo liberar la reserva {reserva_id}: {e}")
+        return False
+    
     def validar_stock_disponible(self, producto_id: UUID, cantidad_solicitada: int) -> bool:
         """Valida si hay stock suficiente para un producto"""
         producto = self.obtener_producto(producto_id)
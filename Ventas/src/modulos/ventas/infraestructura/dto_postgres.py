@@ -37,6 +37,26 @@ class PedidoComando(db.Model):
     # Relación con items
     items = db.relationship('ItemComando', back_populates='pedido', cascade='all, delete-orphan')
 
+class SolicitudPedido(db.Model):
+    """Pedido aceptado en estado PENDIENTE que espera a que un worker lo apruebe o rechace"""
+    __tablename__ = 'solicitudes_pedido'
+    __bind_key__ = 'commands'
+    
+    pedido_id = db.Column(db.UUID, primary_key=True)
+    creada_en = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # No se reclama antes de esta fecha (backoff entre intentos)
+    disponible_desde = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Si el worker que la reclamó muere, otro la retoma cuando vence el lease
+    tomada_en = db.Column(db.DateTime, nullable=True)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    ultimo_error = db.Column(db.Text, nullable=True)
+    procesada_en = db.Column(db.DateTime, nullable=True)
+    motivo_rechazo = db.Column(db.Text, nullable=True)
+    
+    __table_args__ = (
+        db.Index('idx_solicitudes_pendientes', 'disponible_desde', postgresql_where=db.text('procesada_en IS NULL')),
+    )
+
 # =============================================================================
 # MODELOS DE CONSULTAS (DESNORMALIZADOS) - Base de datos de consultas
 # =============================================================================
@@ -92,3 +112,29 @@ class ItemConsulta(db.Model):
         db.Index('idx_items_consulta_producto', 'producto_id'),
         db.Index('idx_items_consulta_cliente', 'pedido_cliente_id'),
     )
+
+# =============================================================================
+# OUTBOX DE EVENTOS - Base de datos de comandos
+# =============================================================================
+
+class EventoOutbox(db.Model):
+    """Evento de dominio pendiente de publicar, escrito en la misma transacción que el pedido"""
+    __tablename__ = 'outbox_eventos'
+    __bind_key__ = 'commands'
+    
+    secuencia = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    evento_id = db.Column(db.UUID, nullable=False, unique=True)
+    tipo_evento = db.Column(db.String(255), nullable=False)
+    agregado_id = db.Column(db.UUID, nullable=True)
+    payload = db.Column(db.Text, nullable=False)
+    creado_en = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    publicado_en = db.Column(db.DateTime, nullable=True)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    ultimo_error = db.Column(db.Text, nullable=True)
+    estacionado_en = db.Column(db.DateTime, nullable=True)
+    
+    # Índices para que el relay lea solo los pendientes en orden
+    __table_args__ = (
+        db.Index('idx_outbox_pendientes', 'secuencia', postgresql_where=db.text('publicado_en IS NULL AND estacionado_en IS NULL')),
+        db.Index('idx_outbox_publicado_en', 'publicado_en'),
+    )
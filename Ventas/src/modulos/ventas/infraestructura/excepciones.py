@@ -1,4 +1,10 @@
 from seedwork.dominio.excepciones import ExcepcionFabrica
 
 class ExcepcionFabrica(ExcepcionFabrica):
-    pass
\ No newline at end of file
+    pass
+
+class ServicioProductosNoDisponible(Exception):
+    """El servicio de productos falló, no respondió dentro del plazo o su circuito está abierto"""
+    def __init__(self, mensaje, reintentar_en: float = None):
+        super().__init__(mensaje)
+        self.reintentar_en = reintentar_en
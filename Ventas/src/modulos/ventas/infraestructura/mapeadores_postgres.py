@@ -37,7 +37,7 @@ class MapeadorPedidoComando(Mapeador):
             items_entidad.append(item_entidad)
         
         return Pedido(
-            id=dto.id,
+            _id=dto.id,
             cliente_id=dto.cliente_id,
             fecha_pedido=dto.fecha_pedido,
             estado=EstadoPedido(dto.estado),
@@ -0,0 +1,151 @@
+# src/modulos/ventas/infraestructura/procesador_pedidos.py
+"""
+Procesador de pedidos pendientes: reclama solicitudes de la tabla solicitudes_pedido y las ejecuta en un
+pool de workers. Varias réplicas pueden ejecutarlo a la vez gracias a FOR UPDATE SKIP LOCKED; una solicitud
+reclamada por un proceso que murió se retoma cuando vence su lease.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, List, Tuple
+from uuid import UUID
+from sqlalchemy import or_, select, update
+
+logger = logging.getLogger(__name__)
+
+MAXIMO_LARGO_ERROR = 1000
+
+
+class ProcesadorPedidosPendientes:
+    """Ejecuta procesar(pedido_id, ultimo_intento) por cada solicitud pendiente. Si procesar lanza una
+    excepción la solicitud se pospone con backoff exponencial; cerrarla (procesada_en) es responsabilidad
+    de quien procesa, en la misma transacción que aprueba o rechaza el pedido."""
+
+    def __init__(self, app, db, modelo, procesar: Callable[[UUID, bool], None], hilos: int = None,
+                 intervalo_segundos: float = None, lease_segundos: float = None, max_intentos: int = None):
+        self.app = app
+        self.db = db
+        self.modelo = modelo
+        self.procesar = procesar
+        self.hilos = hilos or int(os.getenv('PEDIDOS_WORKERS', '4'))
+        self.intervalo_segundos = intervalo_segundos if intervalo_segundos is not None else float(os.getenv('PEDIDOS_INTERVALO_SEGUNDOS', '0.5'))
+        self.lease = timedelta(seconds=lease_segundos if lease_segundos is not None else float(os.getenv('PEDIDOS_LEASE_SEGUNDOS', '120')))
+        self.max_intentos = max_intentos or int(os.getenv('PEDIDOS_MAX_INTENTOS', '5'))
+        self.backoff_inicial_segundos = float(os.getenv('PEDIDOS_BACKOFF_INICIAL_SEGUNDOS', '2'))
+        self.backoff_maximo_segundos = float(os.getenv('PEDIDOS_BACKOFF_MAXIMO_SEGUNDOS', '60'))
+        self._ejecutor = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='procesador-pedidos')
+        # Solo se reclaman tantas solicitudes como workers libres, para no retenerlas mientras esperan turno
+        self._libres = threading.BoundedSemaphore(self.hilos)
+        self._despertar = threading.Event()
+        self._lock = threading.Lock()
+        self._procesados = 0
+        self._pospuestos = 0
+        self._hilo = None
+
+    def _ejecutar(self, sentencia):
+        return self.db.session.execute(sentencia, bind_arguments={'mapper': self.modelo})
+
+    def reclamar(self, limite: int) -> List[Tuple[UUID, int]]:
+        """Marca como tomadas hasta limite solicitudes disponibles y retorna (pedido_id, intento) de cada una"""
+        modelo = self.modelo
+        ahora = datetime.utcnow()
+        try:
+            pendientes = (
+                select(modelo.pedido_id)
+                .where(modelo.procesada_en.is_(None))
+                .where(modelo.disponible_desde <= ahora)
+                .where(or_(modelo.tomada_en.is_(None), modelo.tomada_en < ahora - self.lease))
+                .order_by(modelo.creada_en)
+                .limit(limite)
+                .with_for_update(skip_locked=True)
+            )
+            reclamadas = self._ejecutar(
+                update(modelo)
+                .where(modelo.pedido_id.in_(pendientes.scalar_subquery()))
+                .values(tomada_en=ahora, intentos=modelo.intentos + 1)
+                .returning(modelo.pedido_id, modelo.intentos)
+            ).all()
+            self.db.session.commit()
+            return [(pedido_id, intentos) for pedido_id, intentos in reclamadas]
+        except Exception as e:
+            print(f"[PEDIDOS] Error reclamando solicitudes pendientes: {e}")
+            self.db.session.rollback()
+            return []
+
+    def _procesar(self, pedido_id: UUID, intento: int):
+        try:
+            with self.app.app_context():
+                try:
+                    self.procesar(pedido_id, intento >= self.max_intentos)
+                    with self._lock:
+                        self._procesados += 1
+                except Exception as e:
+                    self.db.session.rollback()
+                    self._posponer(pedido_id, intento, e)
+                finally:
+                    self.db.session.remove()
+        finally:
+            self._libres.release()
+            self._despertar.set()
+
+    def _posponer(self, pedido_id: UUID, intento: int, error: Exception):
+        espera = min(self.backoff_maximo_segundos, self.backoff_inicial_segundos * 2 ** (intento - 1))
+        espera = espera / 2 + random.uniform(0, espera / 2)
+        logger.warning(f"🔁 Pedido {pedido_id} no se pudo procesar (intento {intento}): {error}. Se reintentará en {espera:.1f}s")
+        try:
+            self._ejecutar(
+                update(self.modelo)
+                .where(self.modelo.pedido_id == pedido_id)
+                .values(tomada_en=None, disponible_desde=datetime.utcnow() + timedelta(seconds=espera),
+                        ultimo_error=str(error)[:MAXIMO_LARGO_ERROR])
+            )
+            self.db.session.commit()
+        except Exception as e:
+            # La solicitud se retoma igual cuando venza el lease
+            logger.error(f"❌ No se pudo posponer el pedido {pedido_id}: {e}")
+            self.db.session.rollback()
+        with self._lock:
+            self._pospuestos += 1
+
+    def notificar(self):
+        """Avisa que hay una solicitud nueva para no esperar al siguiente intervalo"""
+        self._despertar.set()
+
+    def iniciar(self) -> threading.Thread:
+        """Inicia el hilo que reclama solicitudes y las reparte entre los workers"""
+        def ejecutar():
+            while True:
+                self._libres.acquire()
+                libres = 1
+                while libres < self.hilos and self._libres.acquire(blocking=False):
+                    libres += 1
+                with self.app.app_context():
+                    try:
+                        reclamadas = self.reclamar(libres)
+                    finally:
+                        self.db.session.remove()
+                for pedido_id, intento in reclamadas:
+                    self._ejecutor.submit(self._procesar, pedido_id, intento)
+                for _ in range(libres - len(reclamadas)):
+                    self._libres.release()
+                if len(reclamadas) < libres:
+                    self._despertar.wait(self.intervalo_segundos)
+                    self._despertar.clear()
+
+        self._hilo = threading.Thread(target=ejecutar, name='procesador-pedidos', daemon=True)
+        self._hilo.start()
+        print(f"[PEDIDOS] Procesador de pedidos pendientes iniciado ({self.hilos} workers)")
+        return self._hilo
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': self.hilos,
+                'procesados': self._procesados,
+                'pospuestos': self._pospuestos
+            }
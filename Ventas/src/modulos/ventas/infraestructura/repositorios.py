@@ -10,12 +10,17 @@ from modulos.ventas.infraestructura.mapeadores_postgres import (
 )
 # Usando modelos PostgreSQL en lugar del modelo SQLAlchemy antiguo
 from modulos.ventas.infraestructura.dto_postgres import (
-    PedidoComando, ItemComando, PedidoConsulta, ItemConsulta
+    PedidoComando, ItemComando, PedidoConsulta, ItemConsulta, EventoOutbox, SolicitudPedido
 )
+from modulos.ventas.dominio.enums import EstadoPedido
+from seedwork.infraestructura.outbox import filas_eventos_outbox, insertar_eventos_outbox
 from config.config.db import db
 from config.config.db_postgres import db as db_postgres
+from sqlalchemy import delete, insert, update
 from uuid import UUID
 from datetime import datetime
+import os
+import uuid
 
 # =============================================================================
 # REPOSITORIOS POSTGRESQL CQRS
@@ -26,67 +31,99 @@ class RepositorioPedidoComandoPostgreSQL(RepositorioPedidoComando):
     
     def __init__(self):
         self._mapeador = MapeadorPedidoComando()
+        # Con PostgreSQL escribe pedido, items, solicitud y outbox en una sola sentencia (CTEs) y deja la
+        # proyección de consultas en la misma sesión, confirmadas con un solo session.commit(). Comandos y
+        # consultas son bases distintas y no hay commit en dos fases: se confirman una tras otra, por lo que
+        # si falla el commit de consultas el pedido queda guardado sin proyección (como cuando falla
+        # _sync_to_queries). A cambio, si la base de consultas no responde al escribir, el pedido se rechaza.
+        self.escritura_combinada = os.getenv('PEDIDOS_ESCRITURA_COMBINADA', 'false').lower() == 'true'
     
-    def agregar(self, pedido: Pedido):
-        """Agrega un pedido a la base de datos de comandos"""
+    def agregar(self, pedido: Pedido, encolar: bool = False):
+        """Agrega un pedido a la base de datos de comandos; con encolar=True además registra, en la misma
+        transacción, la solicitud que el procesador de pedidos pendientes tomará para aprobarlo o rechazarlo"""
+        fila_consulta = self._fila_consulta(pedido)
+        combinada = self._usar_escritura_combinada()
         try:
-            # Crear pedido en base de comandos
-            pedido_modelo = self._mapeador.entidad_a_dto(pedido)
-            db_postgres.session.add(pedido_modelo)
-            db_postgres.session.flush()  # Flush para obtener el ID del pedido
-            
-            # Crear items asociados usando el ID del pedido del modelo
-            for item in pedido.items:
-                item_modelo = ItemComando(
-                    pedido_id=pedido_modelo.id,  # Usar el ID del modelo, no de la entidad
-                    producto_id=item.producto_id,
-                    cantidad=item.cantidad,
-                    precio=item.precio,
-                    total=item.total
-                )
-                db_postgres.session.add(item_modelo)
-            
+            if combinada:
+                db_postgres.session.execute(self._sentencia_combinada(pedido, encolar))
+                self._escribir_consulta(fila_consulta, nuevo=True)
+            else:
+                # Pedido e items con un INSERT cada uno (los items en un solo executemany)
+                db_postgres.session.execute(insert(PedidoComando), [self._fila_pedido(pedido)])
+                filas_items = self._filas_items(pedido)
+                if filas_items:
+                    db_postgres.session.execute(insert(ItemComando), filas_items)
+                if encolar:
+                    db_postgres.session.execute(insert(SolicitudPedido), [{'pedido_id': pedido.id}])
+                
+                # Los eventos del pedido se guardan en el outbox en la misma transacción
+                insertar_eventos_outbox(db_postgres.session, EventoOutbox, [(pedido.id, evento) for evento in pedido.eventos])
             db_postgres.session.commit()
             
-            # Sincronizar con base de consultas
-            self._sync_to_queries(pedido_modelo)
-            
         except Exception as e:
             db_postgres.session.rollback()
             raise e
+        
+        if not combinada:
+            # Sincronizar con base de consultas a partir del pedido en memoria
+            self._sync_to_queries(fila_consulta, nuevo=True)
     
     def actualizar(self, pedido: Pedido):
         """Actualiza un pedido en la base de datos de comandos"""
+        fila_consulta = self._fila_consulta(pedido)
+        combinada = self._usar_escritura_combinada()
         try:
-            # Actualizar pedido
-            pedido_modelo = PedidoComando.query.filter_by(id=pedido.id).first()
-            if pedido_modelo:
-                pedido_modelo.cliente_id = pedido.cliente_id
-                pedido_modelo.fecha_pedido = pedido.fecha_pedido
-                pedido_modelo.estado = pedido.estado.value
-                pedido_modelo.total = pedido.total
-                
-                # Actualizar items (eliminar existentes y crear nuevos)
-                ItemComando.query.filter_by(pedido_id=pedido_modelo.id).delete()
-                for item in pedido.items:
-                    item_modelo = ItemComando(
-                        pedido_id=pedido_modelo.id,  # Usar el ID del modelo
-                        producto_id=item.producto_id,
-                        cantidad=item.cantidad,
-                        precio=item.precio,
-                        total=item.total
-                    )
-                    db_postgres.session.add(item_modelo)
-                
-                db_postgres.session.commit()
-                
-                # Sincronizar con base de consultas
-                self._sync_to_queries(pedido_modelo)
-                
+            actualizados = db_postgres.session.execute(
+                update(PedidoComando)
+                .where(PedidoComando.id == pedido.id)
+                .values(cliente_id=pedido.cliente_id, fecha_pedido=pedido.fecha_pedido,
+                        estado=pedido.estado.value, total=pedido.total)
+            ).rowcount
+            if not actualizados:
+                db_postgres.session.rollback()
+                return
+            
+            # Actualizar items (eliminar existentes y crear nuevos)
+            db_postgres.session.execute(delete(ItemComando).where(ItemComando.pedido_id == pedido.id))
+            filas_items = self._filas_items(pedido)
+            if filas_items:
+                db_postgres.session.execute(insert(ItemComando), filas_items)
+            
+            # Un pedido que deja de estar pendiente cierra su solicitud en la misma transacción
+            if pedido.estado != EstadoPedido.PENDIENTE:
+                db_postgres.session.execute(self._sentencia_cerrar_solicitud(pedido.id, pedido.motivo_rechazo))
+            
+            insertar_eventos_outbox(db_postgres.session, EventoOutbox, [(pedido.id, evento) for evento in pedido.eventos])
+            if combinada:
+                self._escribir_consulta(fila_consulta, nuevo=False)
+            db_postgres.session.commit()
+            
+        except Exception as e:
+            db_postgres.session.rollback()
+            raise e
+        
+        if not combinada:
+            self._sync_to_queries(fila_consulta, nuevo=False)
+    
+    def cerrar_solicitud(self, pedido_id: UUID, motivo_rechazo: str = None):
+        """Marca como procesada la solicitud de un pedido que no hay que procesar (inexistente o ya
+        aprobado o rechazado), para que el procesador no la vuelva a reclamar al vencer su lease"""
+        try:
+            db_postgres.session.execute(self._sentencia_cerrar_solicitud(pedido_id, motivo_rechazo))
+            db_postgres.session.commit()
         except Exception as e:
             db_postgres.session.rollback()
             raise e
     
+    @staticmethod
+    def _sentencia_cerrar_solicitud(pedido_id: UUID, motivo_rechazo: str = None):
+        return (
+            update(SolicitudPedido)
+            .where(SolicitudPedido.pedido_id == pedido_id)
+            .where(SolicitudPedido.procesada_en.is_(None))
+            .values(procesada_en=datetime.utcnow(), motivo_rechazo=motivo_rechazo, tomada_en=None)
+        )
+    
     def eliminar(self, id: UUID):
         """Elimina un pedido de la base de datos de comandos"""
         try:
@@ -106,57 +143,108 @@ class RepositorioPedidoComandoPostgreSQL(RepositorioPedidoComando):
         """Obtiene un pedido por ID desde la base de comandos"""
         pedido_modelo = PedidoComando.query.filter_by(id=id).first()
         if pedido_modelo:
-            return self._mapeador.dto_a_entidad(pedido_modelo)
+            pedido = self._mapeador.dto_a_entidad(pedido_modelo)
+            pedido.motivo_rechazo = self._motivo_rechazo(pedido)
+            return pedido
         return None
     
+    @staticmethod
+    def _motivo_rechazo(pedido: Pedido):
+        if pedido.estado != EstadoPedido.RECHAZADO:
+            return None
+        solicitud = db_postgres.session.get(SolicitudPedido, pedido.id)
+        return solicitud.motivo_rechazo if solicitud else None
+    
     def obtener_todos(self) -> list[Pedido]:
         """Obtiene todos los pedidos desde la base de comandos"""
         pedido_modelos = PedidoComando.query.all()
         return [self._mapeador.dto_a_entidad(pedido_modelo) for pedido_modelo in pedido_modelos]
     
-    def _sync_to_queries(self, pedido_modelo: PedidoComando):
-        """Sincroniza un pedido desde comandos hacia consultas"""
+    def _usar_escritura_combinada(self) -> bool:
+        # Los CTEs que modifican datos son de PostgreSQL; con otros motores se usa la escritura normal
+        return self.escritura_combinada and db_postgres.engines['commands'].dialect.name == 'postgresql'
+    
+    @staticmethod
+    def _fila_pedido(pedido: Pedido) -> dict:
+        return {
+            'id': pedido.id,
+            'cliente_id': pedido.cliente_id,
+            'fecha_pedido': pedido.fecha_pedido,
+            'estado': pedido.estado.value,
+            'total': pedido.total
+        }
+    
+    @staticmethod
+    def _filas_items(pedido: Pedido) -> list:
+        return [{
+            'id': uuid.uuid4(),
+            'pedido_id': pedido.id,
+            'producto_id': item.producto_id,
+            'cantidad': item.cantidad,
+            'precio': item.precio,
+            'total': item.total
+        } for item in pedido.items]
+    
+    @staticmethod
+    def _fila_consulta(pedido: Pedido) -> dict:
+        """Fila desnormalizada de pedidos_consulta construida desde la entidad, sin releer la base de comandos"""
+        return {
+            'id': pedido.id,
+            'cliente_id': pedido.cliente_id,
+            'fecha_pedido': pedido.fecha_pedido,
+            'estado': pedido.estado.value,
+            'total': pedido.total,
+            'cantidad_items': len(pedido.items),
+            'items_detalle': json.dumps([{
+                'producto_id': str(item.producto_id),
+                'cantidad': item.cantidad,
+                'precio': float(item.precio),
+                'total': float(item.total)
+            } for item in pedido.items]),
+            'fecha_ultima_actualizacion': datetime.utcnow()
+        }
+    
+    def _sentencia_combinada(self, pedido: Pedido, encolar: bool):
+        """INSERT del pedido que arrastra como CTEs los de sus items, su solicitud y su outbox: una sola
+        sentencia y un solo viaje a la base de comandos. Las llaves foráneas se verifican al terminar la sentencia."""
+        sentencia = insert(PedidoComando).values(self._fila_pedido(pedido))
+        filas_items = self._filas_items(pedido)
+        if filas_items:
+            sentencia = sentencia.add_cte(insert(ItemComando).values(filas_items).cte('items_nuevos'))
+        if encolar:
+            ahora = datetime.utcnow()
+            sentencia = sentencia.add_cte(insert(SolicitudPedido).values(
+                pedido_id=pedido.id, creada_en=ahora, disponible_desde=ahora, intentos=0
+            ).cte('solicitud_nueva'))
+        filas_outbox = filas_eventos_outbox([(pedido.id, evento) for evento in pedido.eventos])
+        if filas_outbox:
+            ahora = datetime.utcnow()
+            sentencia = sentencia.add_cte(insert(EventoOutbox).values([
+                dict(fila, creado_en=ahora, intentos=0) for fila in filas_outbox
+            ]).cte('outbox_nuevo'))
+        return sentencia
+    
+    @staticmethod
+    def _escribir_consulta(fila: dict, nuevo: bool):
+        """Inserta (pedido nuevo) o actualiza la fila de pedidos_consulta con una sola sentencia; no hace commit"""
+        if nuevo:
+            db_postgres.session.execute(insert(PedidoConsulta), [fila])
+            return
+        valores = {columna: valor for columna, valor in fila.items() if columna != 'id'}
+        actualizados = db_postgres.session.execute(
+            update(PedidoConsulta).where(PedidoConsulta.id == fila['id']).values(**valores)
+        ).rowcount
+        if not actualizados:
+            db_postgres.session.execute(insert(PedidoConsulta), [fila])
+    
+    def _sync_to_queries(self, fila: dict, nuevo: bool = False):
+        """Sincroniza un pedido hacia consultas a partir de la fila construida en memoria"""
         try:
-            # Verificar si ya existe en consultas
-            pedido_consulta_existente = PedidoConsulta.query.filter_by(id=pedido_modelo.id).first()
-            
-            if pedido_consulta_existente:
-                # Actualizar existente
-                pedido_consulta_existente.cliente_id = pedido_modelo.cliente_id
-                pedido_consulta_existente.fecha_pedido = pedido_modelo.fecha_pedido
-                pedido_consulta_existente.estado = pedido_modelo.estado
-                pedido_consulta_existente.total = pedido_modelo.total
-                pedido_consulta_existente.cantidad_items = len(pedido_modelo.items)
-                pedido_consulta_existente.items_detalle = json.dumps([{
-                    'producto_id': str(item.producto_id),
-                    'cantidad': item.cantidad,
-                    'precio': float(item.precio),
-                    'total': float(item.total)
-                } for item in pedido_modelo.items])
-                pedido_consulta_existente.fecha_ultima_actualizacion = datetime.utcnow()
-            else:
-                # Crear nuevo
-                pedido_consulta = PedidoConsulta(
-                    id=pedido_modelo.id,
-                    cliente_id=pedido_modelo.cliente_id,
-                    fecha_pedido=pedido_modelo.fecha_pedido,
-                    estado=pedido_modelo.estado,
-                    total=pedido_modelo.total,
-                    cantidad_items=len(pedido_modelo.items),
-                    items_detalle=json.dumps([{
-                        'producto_id': str(item.producto_id),
-                        'cantidad': item.cantidad,
-                        'precio': float(item.precio),
-                        'total': float(item.total)
-                    } for item in pedido_modelo.items]),
-                    fecha_ultima_actualizacion=datetime.utcnow()
-                )
-                db_postgres.session.add(pedido_consulta)
-            
+            self._escribir_consulta(fila, nuevo)
             db_postgres.session.commit()
             
         except Exception as e:
-            print(f"⚠️ Error sincronizando pedido {pedido_modelo.id} a consultas: {e}")
+            print(f"⚠️ Error sincronizando pedido {fila['id']} a consultas: {e}")
             db_postgres.session.rollback()
 
 class RepositorioPedidoConsultaPostgreSQL(RepositorioPedidoConsulta):
@@ -169,7 +257,10 @@ class RepositorioPedidoConsultaPostgreSQL(RepositorioPedidoConsulta):
         """Obtiene un pedido por ID desde la base de consultas"""
         pedido_modelo = PedidoConsulta.query.filter_by(id=id).first()
         if pedido_modelo:
-            return self._mapeador.dto_a_entidad(pedido_modelo)
+            pedido = self._mapeador.dto_a_entidad(pedido_modelo)
+            # El motivo del rechazo solo se guarda en la solicitud del pedido (base de comandos)
+            pedido.motivo_rechazo = RepositorioPedidoComandoPostgreSQL._motivo_rechazo(pedido)
+            return pedido
         return None
     
     def obtener_todos(self) -> list[Pedido]:
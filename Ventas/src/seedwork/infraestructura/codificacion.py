@@ -0,0 +1,122 @@
+"""Codificación de eventos reusable parte del seedwork del proyecto
+
+En este archivo usted encontrará los codecs con los que se serializan los eventos publicados.
+El codec, el tipo de evento y su versión viajan en los atributos del mensaje, de modo que
+quien consume elige el decodificador sin inspeccionar el contenido; sin atributo se asume JSON.
+Un evento de una versión anterior se lleva a la vigente con los upcasters registrados para
+(tipo_evento, versión), de modo que los manejadores solo conocen el formato actual.
+
+"""
+
+import json
+import os
+from typing import Any, Dict, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+CODEC_JSON = 'json'
+CODEC_MSGPACK = 'msgpack'
+
+# Listas de diccionarios con las mismas llaves (como items_info) se envían por columnas
+# en los codecs binarios, para no repetir las llaves en cada elemento
+COLUMNAS = '_columnas'
+FILAS = '_filas'
+
+
+class CodecJson:
+    nombre = CODEC_JSON
+
+    def codificar(self, datos: Dict[str, Any]) -> bytes:
+        return json.dumps(datos).encode('utf-8')
+
+    def decodificar(self, contenido: bytes) -> Dict[str, Any]:
+        return json.loads(contenido.decode('utf-8'))
+
+
+class CodecMsgpack:
+    nombre = CODEC_MSGPACK
+
+    def codificar(self, datos: Dict[str, Any]) -> bytes:
+        return msgpack.packb({**datos, 'datos': _compactar(datos.get('datos') or {})}, use_bin_type=True)
+
+    def decodificar(self, contenido: bytes) -> Dict[str, Any]:
+        datos = msgpack.unpackb(contenido, raw=False)
+        datos['datos'] = _expandir(datos.get('datos') or {})
+        return datos
+
+
+def _compactar(datos: Dict[str, Any]) -> Dict[str, Any]:
+    compactos = {}
+    for llave, valor in datos.items():
+        if isinstance(valor, list) and valor and all(isinstance(elemento, dict) for elemento in valor):
+            columnas = list(valor[0])
+            if all(list(elemento) == columnas for elemento in valor):
+                valor = {COLUMNAS: columnas, FILAS: [[elemento[columna] for columna in columnas] for elemento in valor]}
+        compactos[llave] = valor
+    return compactos
+
+
+def _expandir(datos: Dict[str, Any]) -> Dict[str, Any]:
+    expandidos = {}
+    for llave, valor in datos.items():
+        if isinstance(valor, dict) and set(valor) == {COLUMNAS, FILAS}:
+            valor = [dict(zip(valor[COLUMNAS], fila)) for fila in valor[FILAS]]
+        expandidos[llave] = valor
+    return expandidos
+
+
+_codecs = {CODEC_JSON: CodecJson()}
+# (tipo_evento, versión) -> función que convierte los datos del evento de esa versión a la siguiente
+_upcasters = {}
+if msgpack is not None:
+    _codecs[CODEC_MSGPACK] = CodecMsgpack()
+
+
+def registrar_codec(codec):
+    """Registra un codec adicional; se identifica por su atributo nombre"""
+    _codecs[codec.nombre] = codec
+
+
+def registrar_upcaster(tipo_evento: str, version: int, upcaster):
+    """Registra la función que lleva un evento tipo_evento de la versión indicada a la siguiente;
+    recibe y retorna el diccionario del evento (formato EventoDominio.to_dict())"""
+    _upcasters[(tipo_evento, version)] = upcaster
+
+
+def obtener_codec(nombre: str = None):
+    """Codec por nombre; sin nombre usa EVENTOS_CODEC y si no está disponible vuelve a JSON"""
+    if nombre is None:
+        nombre = os.getenv('EVENTOS_CODEC', CODEC_JSON)
+        return _codecs.get(nombre, _codecs[CODEC_JSON])
+    codec = _codecs.get(nombre)
+    if codec is None:
+        raise ValueError(f"Codec de eventos no soportado: {nombre}")
+    return codec
+
+
+def codificar_evento(datos: Dict[str, Any], codec=None) -> Tuple[bytes, Dict[str, str]]:
+    """Serializa el resultado de EventoDominio.to_dict() y retorna el contenido y los atributos del mensaje"""
+    codec = codec or obtener_codec()
+    atributos = {
+        'codec': codec.nombre,
+        'tipo_evento': datos.get('tipo_evento', ''),
+        'version': str(datos.get('version', 1))
+    }
+    return codec.codificar(datos), atributos
+
+
+def decodificar_evento(contenido: bytes, atributos: Dict[str, str] = None) -> Dict[str, Any]:
+    """Deserializa un mensaje con el codec indicado en sus atributos (JSON si no lo indica) y le aplica,
+    según su tipo y versión, los upcasters registrados hasta llegar a la versión vigente"""
+    atributos = atributos or {}
+    datos = obtener_codec(atributos.get('codec', CODEC_JSON)).decodificar(contenido)
+    tipo_evento = atributos.get('tipo_evento') or datos.get('tipo_evento')
+    version = int(atributos.get('version') or datos.get('version') or 1)
+    while (tipo_evento, version) in _upcasters:
+        datos = _upcasters[(tipo_evento, version)](datos)
+        version += 1
+        datos['version'] = version
+    return datos
@@ -3,13 +3,78 @@
 import json
 import logging
 import os
+import threading
 from typing import Dict, Any
 from google.cloud import pubsub_v1
+from google.api_core.exceptions import AlreadyExists, NotFound
 from google.auth.exceptions import DefaultCredentialsError
 from seedwork.dominio.eventos import PublicadorEventos, EventoDominio
+from seedwork.infraestructura.codificacion import codificar_evento, obtener_codec
 
 logger = logging.getLogger(__name__)
 
+TOPICS_POR_TIPO_EVENTO = {
+    'ProductoStockActualizado': 'productos-stock-actualizado',
+    'PedidoCreado': 'pedidos-creados'
+}
+TOPIC_POR_DEFECTO = 'productos-stock-actualizado'
+
+
+class RegistroTopics:
+    """Resuelve una sola vez por proceso el topic_path de cada tipo de evento y lo cachea.
+    Si administrar es True verifica con get_topic que el topic exista y solo lo crea si falta;
+    si es False no hace llamadas de administración (los topics se aprovisionan por fuera)"""
+    
+    def __init__(self, publisher, project_id: str, administrar: bool = True):
+        self._publisher = publisher
+        self.project_id = project_id
+        self.administrar = administrar
+        self._paths = {}
+        self._verificados = set()
+        self._lock = threading.Lock()
+    
+    def topic_path(self, tipo_evento: str) -> str:
+        path = self._paths.get(tipo_evento)
+        if path is not None:
+            return path
+        topic_name = TOPICS_POR_TIPO_EVENTO.get(tipo_evento, TOPIC_POR_DEFECTO)
+        path = self._publisher.topic_path(self.project_id, topic_name)
+        if self.administrar:
+            self._asegurar(topic_name, path)
+        self._paths[tipo_evento] = path
+        return path
+    
+    def asegurar_todos(self):
+        """Resuelve (y verifica, si corresponde) todos los topics conocidos; se usa al iniciar"""
+        for tipo_evento in TOPICS_POR_TIPO_EVENTO:
+            self.topic_path(tipo_evento)
+    
+    def _asegurar(self, topic_name: str, path: str):
+        with self._lock:
+            if path in self._verificados:
+                return
+            try:
+                self._publisher.get_topic(request={"topic": path})
+                print(f"ℹ️ PubSub: Topic {topic_name} existe")
+            except NotFound:
+                try:
+                    self._publisher.create_topic(request={"name": path})
+                    print(f"✅ PubSub: Topic {topic_name} creado exitosamente")
+                    logger.info(f"Topic {topic_name} creado exitosamente")
+                except AlreadyExists:
+                    # Otra réplica lo creó entre la verificación y la creación
+                    pass
+            except Exception as e:
+                # Sin permisos de administración se asume que el topic existe; publish fallará si no
+                logger.warning(f"No se pudo verificar el topic {topic_name}: {e}")
+            self._verificados.add(path)
+    
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            'administrar': self.administrar,
+            'resueltos': len(self._paths)
+        }
+
 
 class PublicadorPubSub(PublicadorEventos):
     """Publicador de eventos que envía mensajes a Google Cloud Pub/Sub"""
@@ -20,8 +85,21 @@ class PublicadorPubSub(PublicadorEventos):
         self.use_emulator = os.getenv('USE_PUBSUB_EMULATOR', 'false').lower() == 'true'
         self.emulator_host = emulator_host or os.getenv('PUBSUB_EMULATOR_HOST', 'localhost:8085')
         
+        # El cliente agrupa en lotes lo que el relay del outbox envía seguido
+        self.batch_max_mensajes = int(os.getenv('PUBSUB_BATCH_MAX_MENSAJES', '100'))
+        self.batch_max_bytes = int(os.getenv('PUBSUB_BATCH_MAX_BYTES', str(1024 * 1024)))
+        self.batch_max_latencia = float(os.getenv('PUBSUB_BATCH_MAX_LATENCIA_SEGUNDOS', '0.01'))
+        self._lock = threading.Lock()
+        self._publicados = 0
+        self._fallidos = 0
+        # EVENTOS_CODEC=msgpack reduce el tamaño de los mensajes; JSON si no está disponible
+        self.codec = obtener_codec()
+        
+        # En producción los topics se aprovisionan por fuera y se omiten las llamadas de administración
+        self.administrar_topics = os.getenv('PUBSUB_ADMINISTRAR_TOPICS', 'true').lower() == 'true'
+        
         self._publisher = None
-        self._topics_creados = False
+        self._topics = None
         self._initialize_publisher()
     
     def _initialize_publisher(self):
@@ -36,7 +114,14 @@ class PublicadorPubSub(PublicadorEventos):
                 self._setup_gcp_authentication()
                 logger.info(f"Publicador Pub/Sub inicializado para GCP proyecto: {self.project_id}")
             
-            self._publisher = pubsub_v1.PublisherClient()
+            self._publisher = pubsub_v1.PublisherClient(
+                batch_settings=pubsub_v1.types.BatchSettings(
+                    max_messages=self.batch_max_mensajes,
+                    max_bytes=self.batch_max_bytes,
+                    max_latency=self.batch_max_latencia
+                )
+            )
+            self._topics = RegistroTopics(self._publisher, self.project_id, self.administrar_topics)
             
         except Exception as e:
             logger.warning(f"No se pudo inicializar publicador Pub/Sub: {e}")
@@ -71,7 +156,8 @@ class PublicadorPubSub(PublicadorEventos):
             logger.info("Usando Application Default Credentials (ADC) para GCP")
     
     def publicar(self, evento: EventoDominio):
-        """Publica un evento a Pub/Sub"""
+        """Publica un evento a Pub/Sub y espera la confirmación del broker. Los eventos de dominio se
+        publican desde el outbox con publicar_serializado; este camino queda para publicaciones directas"""
         print(f"PubSub: Iniciando publicación de evento {evento.__class__.__name__}")
         
         if not self._publisher:
@@ -82,70 +168,74 @@ class PublicadorPubSub(PublicadorEventos):
         try:
             print(f"🔧 PubSub: Publicador disponible, procediendo con la publicación")
             
-            # Crear topics si no se han creado
-            if not self._topics_creados:
-                print("📁 PubSub: Creando topics necesarios...")
-                self.crear_topics()
-                self._topics_creados = True
-                print("✅ PubSub: Topics creados exitosamente")
-            else:
-                print("ℹ️ PubSub: Topics ya existen, continuando...")
-            
-            # Determinar el topic basado en el tipo de evento
-            topic_name = self._get_topic_name(evento)
-            topic_path = self._publisher.topic_path(self.project_id, topic_name)
-            print(f"📡 PubSub: Topic seleccionado: {topic_name} -> {topic_path}")
+            # Determinar el topic basado en el tipo de evento (resuelto una vez y cacheado)
+            topic_path = self._topics.topic_path(evento.__class__.__name__)
+            print(f"📡 PubSub: Topic seleccionado: {topic_path}")
             
-            # Serializar el evento
-            mensaje_data = json.dumps(evento.to_dict()).encode('utf-8')
-            print(f"📦 PubSub: Evento serializado, tamaño: {len(mensaje_data)} bytes")
+            # Serializar el evento; el codec viaja en los atributos del mensaje
+            mensaje_data, atributos = codificar_evento(evento.to_dict(), self.codec)
+            print(f"📦 PubSub: Evento serializado ({self.codec.nombre}), tamaño: {len(mensaje_data)} bytes")
             
             # Publicar el mensaje
             print(f"📤 PubSub: Enviando mensaje a Pub/Sub...")
-            future = self._publisher.publish(topic_path, mensaje_data)
-            message_id = future.result()
-            
-            print(f"✅ PubSub: Evento {evento.__class__.__name__} publicado con ID: {message_id}")
-            print(f"📋 PubSub: Datos del evento: {evento.to_dict()}")
-            logger.info(f"✅ Evento {evento.__class__.__name__} publicado con ID: {message_id}")
-            logger.info(f"📋 Datos del evento: {evento.to_dict()}")
+            message_id = self._publisher.publish(topic_path, mensaje_data, **atributos).result()
+            self._registrar_resultado(evento.__class__.__name__, message_id=message_id)
             
         except Exception as e:
+            with self._lock:
+                self._fallidos += 1
             print(f"❌ PubSub: Error publicando evento {evento.__class__.__name__}: {e}")
             logger.warning(f"Error publicando evento {evento.__class__.__name__}: {e}")
     
+    def _registrar_resultado(self, nombre_evento: str, message_id: str = None, error: Exception = None):
+        with self._lock:
+            if error is None:
+                self._publicados += 1
+            else:
+                self._fallidos += 1
+        if error is None:
+            print(f"✅ PubSub: Evento {nombre_evento} publicado con ID: {message_id}")
+            logger.info(f"✅ Evento {nombre_evento} publicado con ID: {message_id}")
+        else:
+            print(f"❌ PubSub: Error publicando evento {nombre_evento}: {error}")
+            logger.warning(f"Error publicando evento {nombre_evento}: {error}")
+    
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores de publicación para monitoreo"""
+        with self._lock:
+            return {
+                'codec': self.codec.nombre,
+                'publicados': self._publicados,
+                'fallidos': self._fallidos,
+                'topics': self._topics.estadisticas() if self._topics else None
+            }
+    
+    @property
+    def disponible(self) -> bool:
+        return self._publisher is not None
+    
+    def publicar_serializado(self, tipo_evento: str, mensaje_data: bytes, atributos: Dict[str, str] = None):
+        """Publica un evento ya serializado (por ejemplo desde el outbox) y retorna el future del cliente;
+        quien llama decide cuándo esperar la confirmación y acota cuántos mensajes deja en vuelo"""
+        if not self._publisher:
+            raise RuntimeError("Publicador Pub/Sub no disponible")
+        return self._publisher.publish(self._topics.topic_path(tipo_evento), mensaje_data, **(atributos or {}))
+    
     def _get_topic_name(self, evento: EventoDominio) -> str:
         """Determina el nombre del topic basado en el tipo de evento"""
-        tipo_evento = evento.__class__.__name__
-        
-        
-        topic_mapping = {
-            'ProductoStockActualizado': 'productos-stock-actualizado',
-            'PedidoCreado': 'pedidos-creados'
-        }
-        
-        return topic_mapping.get(tipo_evento, 'productos-stock-actualizado')
+        return self._get_topic_name_por_tipo(evento.__class__.__name__)
+    
+    def _get_topic_name_por_tipo(self, tipo_evento: str) -> str:
+        """Determina el nombre del topic a partir del nombre del tipo de evento"""
+        return TOPICS_POR_TIPO_EVENTO.get(tipo_evento, TOPIC_POR_DEFECTO)
     
     def crear_topics(self):
-        """Crea los topics necesarios en Pub/Sub"""
+        """Verifica al iniciar que existan los topics necesarios, creando solo los que falten.
+        No hace nada si PUBSUB_ADMINISTRAR_TOPICS=false"""
         if not self._publisher:
             print("Publicador no disponible, no se pueden crear topics")
             logger.warning("Publicador no disponible, no se pueden crear topics")
             return
         
-        topics = [
-            'productos-stock-actualizado',
-            'pedidos-creados'
-        ]
-        
-        print(f"📁 PubSub: Creando {len(topics)} topics...")
-        for topic_name in topics:
-            try:
-                topic_path = self._publisher.topic_path(self.project_id, topic_name)
-                print(f"🔧 PubSub: Creando topic: {topic_name} -> {topic_path}")
-                self._publisher.create_topic(request={"name": topic_path})
-                print(f"✅ PubSub: Topic {topic_name} creado exitosamente")
-                logger.info(f"Topic {topic_name} creado exitosamente")
-            except Exception as e:
-                print(f"⚠️ PubSub: Topic {topic_name} ya existe o error creándolo: {e}")
-                logger.warning(f"Topic {topic_name} ya existe o error creándolo: {e}")
+        print(f"📁 PubSub: Resolviendo {len(set(TOPICS_POR_TIPO_EVENTO.values()))} topics (administrar={self.administrar_topics})...")
+        self._topics.asegurar_todos()
@@ -0,0 +1,193 @@
+"""Resiliencia para llamadas a otros servicios reusable parte del seedwork del proyecto
+
+En este archivo usted encontrará el circuit breaker, el plazo (deadline) que acota el tiempo
+total de una operación de negocio a través de todas sus llamadas, y el hedging: una segunda
+solicitud idéntica cuando la primera tarda más que el percentil configurado.
+
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+CERRADO = 'CERRADO'
+ABIERTO = 'ABIERTO'
+MEDIO_ABIERTO = 'MEDIO_ABIERTO'
+
+
+class CircuitoAbierto(Exception):
+    def __init__(self, nombre: str, reintentar_en: float):
+        super().__init__(f"Circuito {nombre} abierto, se reintentará en {reintentar_en:.1f}s")
+        self.reintentar_en = reintentar_en
+
+
+class PlazoVencido(Exception):
+    def __init__(self, mensaje='El plazo de la operación se agotó'):
+        super().__init__(mensaje)
+
+
+class CircuitBreaker:
+    """Se abre tras umbral_fallos fallos consecutivos y rechaza las llamadas durante tiempo_abierto_segundos.
+    Luego pasa a medio abierto: deja pasar hasta pruebas llamadas a la vez; si una funciona se cierra
+    y si falla vuelve a abrirse."""
+
+    def __init__(self, nombre: str, umbral_fallos: int = 5, tiempo_abierto_segundos: float = 30.0, pruebas: int = 1):
+        self.nombre = nombre
+        self.umbral_fallos = umbral_fallos
+        self.tiempo_abierto_segundos = tiempo_abierto_segundos
+        self.pruebas = pruebas
+        self._estado = CERRADO
+        self._fallos_consecutivos = 0
+        self._abierto_desde = 0.0
+        self._pruebas_en_curso = 0
+        self._lock = threading.Lock()
+        self._aperturas = 0
+        self._rechazadas = 0
+        self._exitos = 0
+        self._fallos = 0
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            return self._estado_actual()
+
+    def _estado_actual(self) -> str:
+        if self._estado == ABIERTO and time.monotonic() - self._abierto_desde >= self.tiempo_abierto_segundos:
+            self._estado = MEDIO_ABIERTO
+            self._pruebas_en_curso = 0
+        return self._estado
+
+    def permitir(self):
+        """Lanza CircuitoAbierto si la llamada no debe hacerse"""
+        with self._lock:
+            estado = self._estado_actual()
+            if estado == CERRADO:
+                return
+            if estado == MEDIO_ABIERTO and self._pruebas_en_curso < self.pruebas:
+                self._pruebas_en_curso += 1
+                return
+            self._rechazadas += 1
+            reintentar_en = max(0.0, self.tiempo_abierto_segundos - (time.monotonic() - self._abierto_desde))
+        raise CircuitoAbierto(self.nombre, reintentar_en)
+
+    def registrar_exito(self):
+        with self._lock:
+            self._exitos += 1
+            self._fallos_consecutivos = 0
+            if self._estado == MEDIO_ABIERTO:
+                self._estado = CERRADO
+                print(f"[CIRCUITO] {self.nombre} cerrado: la llamada de prueba funcionó")
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos += 1
+            self._fallos_consecutivos += 1
+            if self._estado == MEDIO_ABIERTO or (self._estado == CERRADO and self._fallos_consecutivos >= self.umbral_fallos):
+                self._estado = ABIERTO
+                self._abierto_desde = time.monotonic()
+                self._aperturas += 1
+                print(f"[CIRCUITO] {self.nombre} abierto tras {self._fallos_consecutivos} fallos consecutivos")
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'estado': self._estado_actual(),
+                'fallos_consecutivos': self._fallos_consecutivos,
+                'aperturas': self._aperturas,
+                'rechazadas': self._rechazadas,
+                'exitos': self._exitos,
+                'fallos': self._fallos
+            }
+
+
+class Plazo:
+    """Instante límite de una operación; cada llamada usa como timeout el tiempo que le queda"""
+
+    def __init__(self, segundos: float):
+        self.vence = time.monotonic() + segundos
+
+    def restante(self) -> float:
+        return self.vence - time.monotonic()
+
+    def timeout(self, maximo: float) -> float:
+        """Timeout para la próxima llamada; lanza PlazoVencido si ya no queda tiempo"""
+        restante = self.restante()
+        if restante <= 0:
+            raise PlazoVencido()
+        return min(maximo, restante)
+
+
+_plazo_actual = contextvars.ContextVar('plazo_actual', default=None)
+
+
+def plazo_actual() -> Optional[Plazo]:
+    return _plazo_actual.get()
+
+
+@contextmanager
+def con_plazo(segundos: float):
+    """Fija el plazo de las llamadas hechas dentro del bloque; un plazo externo más corto se respeta.
+    Los hilos que ejecuten parte de la operación deben lanzarse con contextvars.copy_context()."""
+    plazo = Plazo(segundos)
+    externo = _plazo_actual.get()
+    if externo is not None and externo.vence < plazo.vence:
+        plazo = externo
+    token = _plazo_actual.set(plazo)
+    try:
+        yield plazo
+    finally:
+        _plazo_actual.reset(token)
+
+
+class LatenciasRecientes:
+    """Ventana de las últimas latencias observadas para estimar percentiles"""
+
+    def __init__(self, tamano: int = 500):
+        self._latencias = deque(maxlen=tamano)
+        self._lock = threading.Lock()
+
+    def registrar(self, segundos: float):
+        with self._lock:
+            self._latencias.append(segundos)
+
+    def percentil(self, percentil: float, minimo_muestras: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._latencias) < max(1, minimo_muestras):
+                return None
+            ordenadas = sorted(self._latencias)
+        return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * percentil / 100))]
+
+    def estadisticas(self) -> Dict[str, Any]:
+        p50, p95, p99 = self.percentil(50), self.percentil(95), self.percentil(99)
+        return {
+            'muestras': len(self._latencias),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'p99_ms': round(p99 * 1000, 1) if p99 is not None else None
+        }
+
+
+def ejecutar_con_hedging(funcion: Callable[[], Any], ejecutor, espera_segundos: float):
+    """Ejecuta funcion en el ejecutor y, si no termina en espera_segundos, lanza una segunda ejecución.
+    Retorna (resultado, hedging_lanzado, gano_hedging) con el primer resultado exitoso; si ambas fallan,
+    propaga el error de la última. Solo debe usarse con operaciones idempotentes."""
+    primera = ejecutor.submit(contextvars.copy_context().run, funcion)
+    terminadas, _ = wait([primera], timeout=espera_segundos)
+    if terminadas:
+        return primera.result(), False, False
+
+    segunda = ejecutor.submit(contextvars.copy_context().run, funcion)
+    pendientes = {primera, segunda}
+    error = None
+    while pendientes:
+        terminadas, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+        for futuro in terminadas:
+            try:
+                return futuro.result(), True, futuro is segunda
+            except Exception as e:
+                error = e
+    raise error
@@ -0,0 +1,90 @@
+import pytest
+
+from seedwork.infraestructura import codificacion
+from seedwork.infraestructura.codificacion import (
+    CODEC_JSON, CODEC_MSGPACK, COLUMNAS, FILAS, _compactar, _expandir, codificar_evento, decodificar_evento,
+    obtener_codec, registrar_upcaster
+)
+
+ITEMS_INFO = [
+    {'producto_id': 'p-1', 'cantidad': 2, 'precio': 1250.5},
+    {'producto_id': 'p-2', 'cantidad': 1, 'precio': 300.0}
+]
+
+
+def crear_evento(**datos):
+    return {'id': 'e-1', 'tipo_evento': 'PedidoCreado', 'version': 1, 'datos': {'pedido_id': 'x', **datos}}
+
+
+@pytest.fixture(autouse=True)
+def upcasters_aislados(monkeypatch):
+    monkeypatch.setattr(codificacion, '_upcasters', {})
+
+
+def test_items_info_se_compacta_por_columnas():
+    compactos = _compactar({'pedido_id': 'x', 'items_info': ITEMS_INFO})
+    assert compactos['pedido_id'] == 'x'
+    assert compactos['items_info'] == {
+        COLUMNAS: ['producto_id', 'cantidad', 'precio'],
+        FILAS: [['p-1', 2, 1250.5], ['p-2', 1, 300.0]]
+    }
+    assert _expandir(compactos) == {'pedido_id': 'x', 'items_info': ITEMS_INFO}
+
+
+def test_listas_heterogeneas_o_vacias_no_se_compactan():
+    heterogeneos = [{'a': 1}, {'b': 2}]
+    datos = {'heterogeneos': heterogeneos, 'vacios': [], 'numeros': [1, 2]}
+    assert _compactar(datos) == datos
+    assert _expandir(datos) == datos
+
+
+def test_json_ida_y_vuelta_con_atributos():
+    evento = crear_evento(items_info=ITEMS_INFO)
+    contenido, atributos = codificar_evento(evento, obtener_codec(CODEC_JSON))
+
+    assert atributos == {'codec': CODEC_JSON, 'tipo_evento': 'PedidoCreado', 'version': '1'}
+    assert decodificar_evento(contenido, atributos) == evento
+    # Sin atributos se asume JSON
+    assert decodificar_evento(contenido) == evento
+
+
+def test_msgpack_ida_y_vuelta_expande_items_info():
+    pytest.importorskip('msgpack')
+    evento = crear_evento(items_info=ITEMS_INFO)
+    contenido, atributos = codificar_evento(evento, obtener_codec(CODEC_MSGPACK))
+
+    assert atributos['codec'] == CODEC_MSGPACK
+    assert decodificar_evento(contenido, atributos) == evento
+
+
+def test_codec_desconocido():
+    with pytest.raises(ValueError):
+        obtener_codec('avro')
+
+
+def test_upcasters_encadenados_hasta_la_version_vigente():
+    def v1_a_v2(datos):
+        datos['datos']['moneda'] = 'COP'
+        return datos
+
+    def v2_a_v3(datos):
+        datos['datos']['total'] = datos['datos'].pop('valor')
+        return datos
+
+    registrar_upcaster('PedidoCreado', 1, v1_a_v2)
+    registrar_upcaster('PedidoCreado', 2, v2_a_v3)
+    contenido, atributos = codificar_evento(crear_evento(valor=10), obtener_codec(CODEC_JSON))
+    evento = decodificar_evento(contenido, atributos)
+
+    assert evento['version'] == 3
+    assert evento['datos'] == {'pedido_id': 'x', 'moneda': 'COP', 'total': 10}
+
+
+def test_upcasters_solo_aplican_a_su_tipo_y_version():
+    registrar_upcaster('PedidoCreado', 1, lambda datos: pytest.fail('no debe aplicarse'))
+    contenido, atributos = codificar_evento({**crear_evento(), 'version': 2}, obtener_codec(CODEC_JSON))
+    assert decodificar_evento(contenido, atributos)['version'] == 2
+
+    contenido, atributos = codificar_evento({**crear_evento(), 'tipo_evento': 'PedidoCancelado'},
+                                            obtener_codec(CODEC_JSON))
+    assert decodificar_evento(contenido, atributos)['version'] == 1
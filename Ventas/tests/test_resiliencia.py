@@ -0,0 +1,143 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from seedwork.infraestructura import resiliencia as modulo_resiliencia
+from seedwork.infraestructura.resiliencia import (
+    ABIERTO, CERRADO, MEDIO_ABIERTO, CircuitBreaker, CircuitoAbierto, PlazoVencido, con_plazo, ejecutar_con_hedging,
+    plazo_actual
+)
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def monotonic(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = RelojFalso()
+    monkeypatch.setattr(modulo_resiliencia, 'time', reloj)
+    return reloj
+
+
+def abrir(circuito: CircuitBreaker):
+    for _ in range(circuito.umbral_fallos):
+        circuito.permitir()
+        circuito.registrar_fallo()
+
+
+def test_se_abre_tras_el_umbral_de_fallos_consecutivos(reloj):
+    circuito = CircuitBreaker('productos', umbral_fallos=3, tiempo_abierto_segundos=10)
+    circuito.registrar_fallo()
+    circuito.registrar_fallo()
+    circuito.registrar_exito()
+    circuito.registrar_fallo()
+    circuito.registrar_fallo()
+    assert circuito.estado == CERRADO
+
+    circuito.registrar_fallo()
+    assert circuito.estado == ABIERTO
+    reloj.ahora += 4
+    with pytest.raises(CircuitoAbierto) as error:
+        circuito.permitir()
+    assert error.value.reintentar_en == pytest.approx(6)
+    assert circuito.estadisticas()['rechazadas'] == 1
+
+
+def test_medio_abierto_solo_deja_pasar_las_pruebas_configuradas(reloj):
+    circuito = CircuitBreaker('productos', umbral_fallos=1, tiempo_abierto_segundos=10, pruebas=2)
+    abrir(circuito)
+    reloj.ahora += 10
+    assert circuito.estado == MEDIO_ABIERTO
+
+    circuito.permitir()
+    circuito.permitir()
+    with pytest.raises(CircuitoAbierto):
+        circuito.permitir()
+
+
+def test_una_prueba_exitosa_cierra_el_circuito(reloj):
+    circuito = CircuitBreaker('productos', umbral_fallos=1, tiempo_abierto_segundos=10)
+    abrir(circuito)
+    reloj.ahora += 10
+    circuito.permitir()
+    circuito.registrar_exito()
+
+    assert circuito.estado == CERRADO
+    circuito.permitir()
+    circuito.permitir()
+
+
+def test_una_prueba_fallida_vuelve_a_abrir_el_circuito(reloj):
+    circuito = CircuitBreaker('productos', umbral_fallos=3, tiempo_abierto_segundos=10)
+    abrir(circuito)
+    reloj.ahora += 10
+    circuito.permitir()
+    circuito.registrar_fallo()
+
+    assert circuito.estado == ABIERTO
+    assert circuito.estadisticas()['aperturas'] == 2
+    with pytest.raises(CircuitoAbierto):
+        circuito.permitir()
+    reloj.ahora += 10
+    assert circuito.estado == MEDIO_ABIERTO
+
+
+def test_el_plazo_vencido_impide_nuevas_llamadas(reloj):
+    with con_plazo(5) as plazo:
+        assert plazo.timeout(10) == 5
+        assert plazo.timeout(2) == 2
+        reloj.ahora += 5
+        with pytest.raises(PlazoVencido):
+            plazo.timeout(10)
+
+
+def test_un_plazo_externo_mas_corto_se_respeta(reloj):
+    with con_plazo(5) as externo:
+        with con_plazo(30) as interno:
+            assert interno is externo
+        with con_plazo(1) as interno:
+            assert interno is not externo
+            assert plazo_actual() is interno
+        assert plazo_actual() is externo
+    assert plazo_actual() is None
+
+
+def test_el_plazo_llega_a_los_hilos_lanzados_con_copy_context():
+    with ThreadPoolExecutor(max_workers=1) as ejecutor:
+        with con_plazo(5) as plazo:
+            assert ejecutor.submit(contextvars.copy_context().run, plazo_actual).result() is plazo
+            # Sin copiar el contexto el hilo no ve el plazo de la operación
+            assert ejecutor.submit(plazo_actual).result() is None
+
+
+def test_el_hedging_propaga_el_plazo_a_ambas_ejecuciones():
+    vistos = []
+    liberar = threading.Event()
+
+    def llamada():
+        vistos.append(plazo_actual())
+        if len(vistos) == 1:
+            liberar.wait(5)
+            return 'primera'
+        return 'segunda'
+
+    with ThreadPoolExecutor(max_workers=2) as ejecutor:
+        with con_plazo(5) as plazo:
+            resultado = ejecutar_con_hedging(llamada, ejecutor, espera_segundos=0.01)
+        liberar.set()
+
+    assert resultado == ('segunda', True, True)
+    assert vistos == [plazo, plazo]
+
+
+def test_el_hedging_no_se_lanza_si_la_primera_responde_a_tiempo():
+    with ThreadPoolExecutor(max_workers=2) as ejecutor:
+        assert ejecutar_con_hedging(lambda: 'ok', ejecutor, espera_segundos=5) == ('ok', False, False)
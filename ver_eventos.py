@@ -1,12 +1,24 @@
 
-import json
+import argparse
 import os
 import signal
 import sys
 from google.cloud import pubsub_v1
 
+# Los codecs de eventos se comparten con los servicios
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Productos', 'src'))
+from seedwork.infraestructura.codificacion import decodificar_evento
+
+TOPICS = [
+    'productos-stock-actualizado',
+    'pedidos-creados'
+]
+
+# Atributos que el consumidor agrega al enviar un mensaje al dead-letter
+ATRIBUTOS_DLQ = ('topic_origen', 'suscripcion_origen', 'intentos', 'error', 'fallido_en')
+
 class EventViewer:
-    def __init__(self):
+    def __init__(self, topics=None):
         self.running = True
         self.subscriber = None
         
@@ -14,10 +26,7 @@ class EventViewer:
         self.use_emulator = os.getenv('USE_PUBSUB_EMULATOR', 'false').lower() == 'true'
         self.emulator_host = os.getenv('PUBSUB_EMULATOR_HOST', 'localhost:8085')
         
-        self.topics = [
-            'productos-stock-actualizado',
-            'pedidos-creados'
-        ]
+        self.topics = topics or TOPICS
         
        
         if not self._setup_authentication():
@@ -60,23 +69,24 @@ class EventViewer:
         self.running = False
         sys.exit(0)
     
+    def imprimir_evento(self, datos_mensaje: bytes, atributos=None, titulo: str = "EVENTO RECIBIDO"):
+        """Imprime un evento serializado con EventoDominio.to_dict(), decodificado según el codec de sus atributos"""
+        data = decodificar_evento(datos_mensaje, dict(atributos or {}))
+        
+        print(f"\n📨 {titulo} - {data.get('tipo_evento', 'Desconocido')}")
+        print(f"🆔 ID del Evento: {data.get('id')}")
+        print(f"📅 Fecha: {data.get('fecha_evento')}")
+        print(f"🔢 Versión: {data.get('version')}")
+        print(f"📋 Datos del Evento:")
+        
+        datos_evento = data.get('datos', {})
+        for key, value in datos_evento.items():
+            print(f"   • {key}: {value}")
+    
     def callback(self, message):
         """Procesa cada mensaje recibido"""
         try:
-           
-            data = json.loads(message.data.decode('utf-8'))
-            
-            print(f"\n📨 EVENTO RECIBIDO - {data.get('tipo_evento', 'Desconocido')}")
-            print(f"🆔 ID del Evento: {data.get('id')}")
-            print(f"📅 Fecha: {data.get('fecha_evento')}")
-            print(f"🔢 Versión: {data.get('version')}")
-            print(f"📋 Datos del Evento:")
-            
-           
-            datos_evento = data.get('datos', {})
-            for key, value in datos_evento.items():
-                print(f"   • {key}: {value}")
-            
+            self.imprimir_evento(message.data, message.attributes)
             print("-" * 60)
             
            
@@ -154,10 +164,103 @@ class EventViewer:
                     future.cancel()
                     future.result()
 
+    def _recibir_dlq(self, subscriber, topic_name: str, maximo: int):
+        """Trae hasta maximo mensajes de la suscripción de dead-letter del topic, sin confirmarlos"""
+        subscription_path = subscriber.subscription_path(self.project_id, f"{topic_name}-dlq-sub")
+        recibidos = []
+        while len(recibidos) < maximo:
+            respuesta = subscriber.pull(
+                request={"subscription": subscription_path, "max_messages": min(100, maximo - len(recibidos))},
+                timeout=10
+            )
+            if not respuesta.received_messages:
+                break
+            recibidos.extend(respuesta.received_messages)
+        return subscription_path, recibidos
+    
+    def inspeccionar_dlq(self, topic_name: str, maximo: int):
+        """Muestra los mensajes del dead-letter y los devuelve a la suscripción sin consumirlos"""
+        with pubsub_v1.SubscriberClient() as subscriber:
+            subscription_path, recibidos = self._recibir_dlq(subscriber, topic_name, maximo)
+            if not recibidos:
+                print(f"✅ No hay mensajes en el dead-letter de {topic_name}")
+                return
+            
+            for recibido in recibidos:
+                atributos = recibido.message.attributes
+                try:
+                    self.imprimir_evento(recibido.message.data, atributos, titulo="EVENTO EN DEAD-LETTER")
+                except Exception as e:
+                    print(f"\n📨 MENSAJE NO DECODIFICABLE: {e}")
+                print(f"📬 Mensaje: {recibido.message.message_id}")
+                print(f"🔁 Intentos: {atributos.get('intentos')} - Falló: {atributos.get('fallido_en')}")
+                print(f"❌ Error: {atributos.get('error')}")
+                print("-" * 60)
+            
+            # Plazo 0: los mensajes vuelven a estar disponibles de inmediato
+            subscriber.modify_ack_deadline(request={
+                "subscription": subscription_path,
+                "ack_ids": [recibido.ack_id for recibido in recibidos],
+                "ack_deadline_seconds": 0
+            })
+            print(f"📋 {len(recibidos)} mensajes en el dead-letter de {topic_name}")
+    
+    def reproducir_dlq(self, topic_name: str, maximo: int, ids: list = None):
+        """Publica nuevamente en el topic original los mensajes del dead-letter y los confirma"""
+        with pubsub_v1.SubscriberClient() as subscriber:
+            publisher = pubsub_v1.PublisherClient()
+            topic_path = publisher.topic_path(self.project_id, topic_name)
+            subscription_path, recibidos = self._recibir_dlq(subscriber, topic_name, maximo)
+            
+            reproducidos, omitidos = [], []
+            for recibido in recibidos:
+                mensaje = recibido.message
+                if ids and mensaje.message_id not in ids:
+                    omitidos.append(recibido.ack_id)
+                    continue
+                atributos = {clave: valor for clave, valor in mensaje.attributes.items() if clave not in ATRIBUTOS_DLQ}
+                try:
+                    publisher.publish(topic_path, mensaje.data, reproducido_desde_dlq='true', **atributos).result(timeout=30)
+                    reproducidos.append(recibido.ack_id)
+                    print(f"♻️ Mensaje {mensaje.message_id} reproducido en {topic_name}")
+                except Exception as e:
+                    omitidos.append(recibido.ack_id)
+                    print(f"❌ Error reproduciendo {mensaje.message_id}: {e}")
+            
+            if reproducidos:
+                subscriber.acknowledge(request={"subscription": subscription_path, "ack_ids": reproducidos})
+            if omitidos:
+                subscriber.modify_ack_deadline(request={
+                    "subscription": subscription_path, "ack_ids": omitidos, "ack_deadline_seconds": 0
+                })
+            print(f"📋 {len(reproducidos)} mensajes reproducidos, {len(omitidos)} sin cambios")
+
 def main():
     """Función principal"""
-    viewer = EventViewer()
-    viewer.start_listening()
+    parser = argparse.ArgumentParser(description="Visualiza eventos de Pub/Sub e inspecciona o reproduce sus dead-letters")
+    comandos = parser.add_subparsers(dest='comando')
+    
+    escuchar = comandos.add_parser('escuchar', help="Escucha continuamente los eventos (por defecto)")
+    escuchar.add_argument('--topic', action='append', dest='topics', choices=TOPICS, help="Topic a escuchar (repetible)")
+    
+    dlq = comandos.add_parser('dlq', help="Muestra los mensajes del dead-letter de un topic sin consumirlos")
+    dlq.add_argument('topic', choices=TOPICS)
+    dlq.add_argument('--max', type=int, default=50, help="Máximo de mensajes a mostrar")
+    
+    reproducir = comandos.add_parser('reproducir', help="Publica de nuevo en su topic los mensajes del dead-letter")
+    reproducir.add_argument('topic', choices=TOPICS)
+    reproducir.add_argument('--max', type=int, default=50, help="Máximo de mensajes a reproducir")
+    reproducir.add_argument('--id', action='append', dest='ids', help="Reproduce solo este message_id (repetible)")
+    
+    args = parser.parse_args()
+    
+    if args.comando == 'dlq':
+        EventViewer().inspeccionar_dlq(args.topic, args.max)
+    elif args.comando == 'reproducir':
+        EventViewer().reproducir_dlq(args.topic, args.max, args.ids)
+    else:
+        viewer = EventViewer(getattr(args, 'topics', None))
+        viewer.start_listening()
 
 if __name__ == "__main__":
     main()